@@ -3,22 +3,39 @@ Pronunciation Alignment Module
 ==============================
 
 Module xử lý việc căn chỉnh (alignment) giữa phoneme target và predicted:
-- Sử dụng thuật toán Dynamic Programming để tìm edit distance
+- Sử dụng thuật toán Dynamic Programming để tìm weighted edit distance
+- Chi phí substitution lấy từ ma trận tương đồng phoneme (theo phone id)
+- Bảng DP được tính bằng NumPy cho nhiều cặp cùng lúc (batch API)
 - Phân loại các loại lỗi: substitution, deletion, insertion
 - Tính toán severity của từng lỗi dựa trên phonetic similarity
 """
 
-from typing import List, Tuple
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
 from data_structures import PhonemeError
-from phoneme_mapper import PhonemeMapper
+from phoneme_mapper import UNK_ID, PhonemeMapper
+
+# Chi phí alignment được nhân với COST_SCALE và làm tròn thành số nguyên để
+# so sánh chính xác khi backtrack. Chi phí deletion/insertion bằng severity tương ứng.
+COST_SCALE = 10
+DELETION_COST = 10    # severity 1.0
+INSERTION_COST = 8    # severity 0.8
+
+# Kernel NumPy tốn một chi phí cố định cho mỗi hàng DP (tương đương khoảng chừng này ô
+# tính bằng Python); batch có ít ô hơn mức đó dùng vòng lặp Python thuần sẽ nhanh hơn
+NUMPY_MIN_CELLS_PER_ROW = 48
 
 
 class PronunciationAligner:
     """
     Lớp xử lý alignment giữa target và predicted phoneme sequences
     
-    Sử dụng thuật toán edit distance với dynamic programming để:
-    - Tìm cách căn chỉnh tối ưu giữa hai chuỗi phoneme
+    Sử dụng thuật toán weighted edit distance với dynamic programming để:
+    - Tìm cách căn chỉnh tối ưu giữa hai chuỗi phoneme (âm gần giống nhau được
+      thay thế với chi phí thấp hơn)
     - Phân loại các loại lỗi phát âm
     - Tính toán mức độ nghiêm trọng của từng lỗi
     """
@@ -31,7 +48,28 @@ class PronunciationAligner:
             phoneme_mapper: Instance của PhonemeMapper để tính similarity
         """
         self.mapper = phoneme_mapper
-    
+        # (sub_cost, sub_cost dạng list các hàng, similarity); thay cả tuple một lần nên
+        # thread khác luôn đọc được ba bảng cùng kích thước
+        self._tables: Optional[Tuple[np.ndarray, List[List[int]], np.ndarray]] = None
+
+    def _cost_tables(self) -> Tuple[np.ndarray, List[List[int]], np.ndarray]:
+        """
+        Snapshot các bảng chi phí: ma trận chi phí substitution (int32, theo phone id), các
+        hàng của nó dạng list (cho kernel Python) và ma trận similarity tương ứng
+
+        Chỉ tính lại khi inventory phone của mapper có thêm phone mới. Người gọi dùng đúng
+        snapshot trả về cho cả lượt tính, không đọc lại thuộc tính của aligner.
+        """
+        similarity = self.mapper.similarity_array()
+        tables = self._tables
+        if tables is None or tables[2].shape[0] != similarity.shape[0]:
+            sub_cost = np.rint(COST_SCALE * (1.0 - similarity)).astype(np.int32)
+            np.fill_diagonal(sub_cost, 0)  # cùng phone = match
+            sub_cost[UNK_ID, UNK_ID] = COST_SCALE  # trừ phone ngoài inventory
+            tables = (sub_cost, sub_cost.tolist(), similarity)
+            self._tables = tables
+        return tables
+
     def align_with_errors(self, target: List[str], predicted: List[str]) -> List[PhonemeError]:
         """
         Căn chỉnh hai chuỗi phoneme và trả về thông tin lỗi chi tiết
@@ -43,32 +81,126 @@ class PronunciationAligner:
         Returns:
             List[PhonemeError]: Danh sách các lỗi phát âm được phát hiện
         """
-        operations = self._get_edit_operations(target, predicted)
+        return self.align_batch([(target, predicted)])[0]
+
+    def align_batch(self, pairs: Sequence[Tuple[List[str], List[str]]]) -> List[List[PhonemeError]]:
+        """
+        Căn chỉnh nhiều cặp (target, predicted) trong một lần gọi
+
+        Args:
+            pairs: Danh sách cặp (target phonemes, predicted phonemes)
+
+        Returns:
+            List[List[PhonemeError]]: Danh sách lỗi cho từng cặp, cùng thứ tự với `pairs`
+        """
+        return self.align_ids_batch([(self.mapper.phone_ids(t), self.mapper.phone_ids(p)) for t, p in pairs], pairs)
+
+    def align_ids_batch(
+        self,
+        id_pairs: Sequence[Tuple[array, array]],
+        originals: Optional[Sequence[Tuple[Optional[Sequence[str]], Optional[Sequence[str]]]]] = None
+    ) -> List[List[PhonemeError]]:
+        """
+        Như align_batch nhưng nhận trực tiếp chuỗi id phone (từ PhonemeMapper)
+
+        Args:
+            id_pairs: Danh sách cặp (target ids, predicted ids)
+            originals: Cặp chuỗi phone gốc (target, predicted; mỗi bên có thể None) cùng độ dài
+                với id, dùng cho expected / actual của lỗi tại các vị trí UNK_ID
+
+        Returns:
+            List[List[PhonemeError]]: Danh sách lỗi cho từng cặp, cùng thứ tự với `id_pairs`
+        """
+        tables = self._cost_tables()
+        operations = self._edit_operations_batch(id_pairs, tables)
+        if originals is None:
+            return [self._operations_to_errors(ops, tables[2]) for ops in operations]
+        return [
+            self._operations_to_errors(ops, tables[2], target, predicted)
+            for ops, (target, predicted) in zip(operations, originals)
+        ]
+
+    def assign_to_words(self, target_per_word: Sequence[Sequence[int]], predicted: Sequence[int]) -> Tuple[List[array], int]:
+        """
+        Chia chuỗi predicted (id phone) theo từ bằng cách align với target nối liền của các từ
+
+        Phone được match/substitute thuộc về từ của target phone tương ứng; phone chèn thêm
+        thuộc về từ của target phone đứng trước. Thứ tự phone được giữ nguyên, nên các chunk
+        nối lại đúng bằng `predicted`.
+
+        Args:
+            target_per_word: Id phone (đã chuẩn hóa) của từng từ
+            predicted: Id phone (đã chuẩn hóa) được dự đoán
+
+        Returns:
+            Tuple: (chunks id phone của từng từ, chỉ số từ cuối cùng có phone được
+                match/substitute, -1 nếu chưa có)
+        """
+        flat_target, word_of = array('H'), []
+        for w, phones in enumerate(target_per_word):
+            flat_target.extend(phones)
+            word_of.extend([w] * len(phones))
+
+        chunks = [array('H') for _ in target_per_word]
+        target_idx, reached = 0, -1
+        for op, _, actual in self._edit_operations_batch([(flat_target, predicted)])[0]:
+            if op in ('M', 'S'):
+                w = word_of[target_idx]
+                chunks[w].append(actual)
+                reached = max(reached, w)
+                target_idx += 1
+            elif op == 'D':
+                target_idx += 1
+            elif op == 'I' and word_of:
+                chunks[word_of[max(0, target_idx - 1)]].append(actual)
+        return chunks, reached
+
+    def _operations_to_errors(
+        self,
+        operations: List[Tuple[str, Optional[int], Optional[int]]],
+        similarity: np.ndarray,
+        target: Optional[Sequence[str]] = None,
+        predicted: Optional[Sequence[str]] = None
+    ) -> List[PhonemeError]:
+        """
+        Chuyển danh sách edit operations (theo phone id) thành PhonemeError
+
+        `target` / `predicted` là chuỗi phone gốc (nếu có): phone UNK_ID lấy tên từ đó.
+        """
+        phones = self.mapper.id_to_phone
         errors = []
         
         target_idx = 0
+        predicted_idx = 0
+
+        def expected_phone(pid: int) -> str:
+            return target[target_idx] if pid == UNK_ID and target is not None else phones[pid]
+
+        def actual_phone(pid: int) -> str:
+            return predicted[predicted_idx] if pid == UNK_ID and predicted is not None else phones[pid]
         
         # Xử lý từng operation để tạo PhonemeError
         for op, expected, actual in operations:
             if op == 'M':  # Match - không có lỗi
                 target_idx += 1
+                predicted_idx += 1
             elif op == 'S':  # Substitution - phát âm sai
-                similarity = self.mapper.get_similarity(expected, actual)
-                severity = 1.0 - similarity  # Càng giống thì severity càng thấp
+                severity = 1.0 - float(similarity[expected, actual])  # Càng giống thì severity càng thấp
                 
                 errors.append(PhonemeError(
                     type='substitution',
                     position=target_idx,
-                    expected=expected,
-                    actual=actual,
+                    expected=expected_phone(expected),
+                    actual=actual_phone(actual),
                     severity=severity
                 ))
                 target_idx += 1
+                predicted_idx += 1
             elif op == 'D':  # Deletion - bỏ sót âm
                 errors.append(PhonemeError(
                     type='deletion',
                     position=target_idx,
-                    expected=expected,
+                    expected=expected_phone(expected),
                     actual=None,
                     severity=1.0  # Deletion luôn nghiêm trọng
                 ))
@@ -78,9 +210,10 @@ class PronunciationAligner:
                     type='insertion',
                     position=max(0, target_idx - 1),
                     expected=None,
-                    actual=actual,
+                    actual=actual_phone(actual),
                     severity=0.8  # Insertion ít nghiêm trọng hơn deletion
                 ))
+                predicted_idx += 1
                 
         return errors
     
@@ -99,51 +232,130 @@ class PronunciationAligner:
                 - 'D': Deletion
                 - 'I': Insertion
         """
+        ops = self._edit_operations_batch([(self.mapper.phone_ids(target), self.mapper.phone_ids(predicted))])[0]
+        result = []
+        i = j = 0
+        for op, e, a in ops:
+            result.append((op, target[i] if e is not None else None, predicted[j] if a is not None else None))
+            i += e is not None
+            j += a is not None
+        return result
+
+    def _edit_operations_batch(
+        self,
+        id_pairs: Sequence[Tuple[Sequence[int], Sequence[int]]],
+        tables: Optional[Tuple[np.ndarray, List[List[int]], np.ndarray]] = None
+    ) -> List[List[Tuple[str, Optional[int], Optional[int]]]]:
+        """
+        Tính bảng DP cho các cặp chuỗi phone id rồi backtrack lấy operations
+
+        Batch nhỏ dùng kernel Python thuần; batch lớn tính bằng NumPy cho cả batch một lần.
+        `tables` là snapshot từ `_cost_tables` (lấy mới nếu không truyền).
+        """
+        if not id_pairs:
+            return []
+        sub_cost, cost_rows, _ = tables if tables is not None else self._cost_tables()
+
+        n_max = max(len(t) for t, _ in id_pairs)
+        total_cells = sum(len(t) * len(p) for t, p in id_pairs)
+        if total_cells <= NUMPY_MIN_CELLS_PER_ROW * (n_max + 4):
+            dp_tables = [self._dp_python(t, p, cost_rows) for t, p in id_pairs]
+        else:
+            dp_tables = self._dp_numpy(id_pairs, sub_cost).tolist()
+
+        return [
+            self._backtrack(table, target, predicted, cost_rows)
+            for table, (target, predicted) in zip(dp_tables, id_pairs)
+        ]
+
+    @staticmethod
+    def _dp_python(target: Sequence[int], predicted: Sequence[int], cost_rows: List[List[int]]) -> List[List[int]]:
+        """Kernel Python thuần: điền bảng DP từng ô (dùng cho chuỗi ngắn)"""
         n, m = len(target), len(predicted)
-        
-        # Tạo bảng DP cho edit distance
-        dp = [[0] * (m + 1) for _ in range(n + 1)]
-        
-        # Khởi tạo base cases
-        for i in range(1, n + 1):
-            dp[i][0] = i  # Deletion cost
-        for j in range(1, m + 1):
-            dp[0][j] = j  # Insertion cost
-            
-        # Fill DP table
+        predicted = list(predicted)  # index list nhanh hơn array('H') trong vòng lặp theo ô
+
+        # Tạo bảng DP cho edit distance, khởi tạo base cases
+        dp = [[j * INSERTION_COST for j in range(m + 1)]]
         for i in range(1, n + 1):
+            prev = dp[i - 1]
+            costs = cost_rows[target[i - 1]]
+            left = i * DELETION_COST
+            row = [left]
             for j in range(1, m + 1):
-                cost = 0 if target[i-1] == predicted[j-1] else 1
-                dp[i][j] = min(
-                    dp[i-1][j] + 1,      # deletion
-                    dp[i][j-1] + 1,      # insertion
-                    dp[i-1][j-1] + cost  # substitution/match
-                )
-        
-        # Backtrack để lấy operations
+                best = prev[j] + DELETION_COST                  # deletion
+                sub = prev[j - 1] + costs[predicted[j - 1]]     # substitution/match
+                if sub < best:
+                    best = sub
+                left += INSERTION_COST                          # insertion
+                if left < best:
+                    best = left
+                left = best
+                row.append(best)
+            dp.append(row)
+        return dp
+
+    @staticmethod
+    def _dp_numpy(id_pairs: Sequence[Tuple[Sequence[int], Sequence[int]]], sub_cost: np.ndarray) -> np.ndarray:
+        """
+        Kernel NumPy: điền bảng DP cho cả batch, mỗi lần một hàng
+
+        Làm việc trên bảng đã trừ chi phí insertion theo cột, E[i, j] = dp[i, j] - j * INSERTION_COST:
+            E[i, j] = min(E[i-1, j] + DELETION_COST,
+                          E[i-1, j-1] + cost[i, j] - INSERTION_COST,
+                          E[i, j-1])
+        Phụ thuộc theo chiều insertion (E[i, j-1]) trở thành prefix-min trong hàng, nên
+        mỗi hàng chỉ cần vài phép toán vector (cộng, minimum, minimum.accumulate) trên
+        toàn batch thay vì duyệt từng ô.
+        """
+        batch = len(id_pairs)
+        n_max = max(len(t) for t, _ in id_pairs)
+        m_max = max(len(p) for _, p in id_pairs)
+
+        target_ids = np.zeros((batch, n_max), dtype=np.intp)
+        predicted_ids = np.zeros((batch, m_max), dtype=np.intp)
+        for b, (t, p) in enumerate(id_pairs):
+            target_ids[b, :len(t)] = t
+            predicted_ids[b, :len(p)] = p
+
+        # shifted[b, i, j] = chi phí thay target[b][i] bằng predicted[b][j], trừ đi INSERTION_COST
+        shifted = sub_cost[target_ids[:, :, None], predicted_ids[:, None, :]] - INSERTION_COST
+
+        table = np.zeros((batch, n_max + 1, m_max + 1), dtype=np.int32)
+        cand = np.empty((batch, m_max + 1), dtype=np.int32)
+        for i in range(1, n_max + 1):
+            prev = table[:, i - 1, :]
+            cand[:, 0] = i * DELETION_COST
+            np.minimum(prev[:, 1:] + DELETION_COST, prev[:, :-1] + shifted[:, i - 1, :], out=cand[:, 1:])
+            np.minimum.accumulate(cand, axis=1, out=table[:, i, :])
+
+        table += np.arange(m_max + 1, dtype=np.int32) * INSERTION_COST
+        return table
+
+    @staticmethod
+    def _backtrack(dp: List[List[int]], target: Sequence[int], predicted: Sequence[int], cost_rows: List[List[int]]) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """Backtrack trên bảng DP để lấy operations (operation, expected_id, actual_id)"""
         operations = []
-        i, j = n, m
+        i, j = len(target), len(predicted)
         
         while i > 0 or j > 0:
             # Kiểm tra operation nào được sử dụng
             if i > 0 and j > 0:
-                cost = 0 if target[i-1] == predicted[j-1] else 1
-                if dp[i][j] == dp[i-1][j-1] + cost:
+                t, p = target[i - 1], predicted[j - 1]
+                if dp[i][j] == dp[i - 1][j - 1] + cost_rows[t][p]:
                     # Substitution hoặc Match
-                    op = 'M' if target[i-1] == predicted[j-1] else 'S'
-                    operations.append((op, target[i-1], predicted[j-1]))
+                    operations.append(('M' if t == p and t != UNK_ID else 'S', t, p))
                     i -= 1
                     j -= 1
                     continue
             
-            if i > 0 and dp[i][j] == dp[i-1][j] + 1:
+            if i > 0 and dp[i][j] == dp[i - 1][j] + DELETION_COST:
                 # Deletion
-                operations.append(('D', target[i-1], None))
+                operations.append(('D', target[i - 1], None))
                 i -= 1
             else:
                 # Insertion
-                operations.append(('I', None, predicted[j-1]))
+                operations.append(('I', None, predicted[j - 1]))
                 j -= 1
                 
         operations.reverse()  # Đảo lại để có thứ tự đúng
-        return operations
\ No newline at end of file
+        return operations
@@ -0,0 +1,105 @@
+"""
+Audio I/O Module
+================
+
+Module load và chuẩn hóa audio hoàn toàn trong bộ nhớ:
+- Nhận đường dẫn file, bytes/buffer của file upload hoặc waveform tensor có sẵn
+- Chuyển về mono, resample về sample rate mục tiêu đúng một lần
+- Cache kernel `torchaudio.transforms.Resample` theo từng cặp sample rate
+- Lỗi decode file audio được báo bằng AudioDecodeError
+"""
+
+import io
+import os
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+import torch
+import torchaudio
+
+# Các dạng audio input được chấp nhận
+AudioInput = Union[str, os.PathLike, bytes, bytearray, memoryview, io.IOBase, torch.Tensor]
+
+
+
+class AudioDecodeError(ValueError):
+    """Không decode được dữ liệu audio (file hỏng hoặc định dạng không hỗ trợ)"""
+
+
+_resamplers: Dict[Tuple[int, int], torchaudio.transforms.Resample] = {}
+_resamplers_lock = threading.Lock()
+
+
+def get_resampler(orig_sr: int, target_sr: int) -> torchaudio.transforms.Resample:
+    """
+    Lấy kernel resample đã cache cho cặp (orig_sr, target_sr)
+
+    Kernel chỉ được tính một lần cho mỗi sample rate nguồn; module Resample không
+    thay đổi state khi forward nên dùng chung giữa các thread được.
+    """
+    key = (int(orig_sr), int(target_sr))
+    resampler = _resamplers.get(key)
+    if resampler is None:
+        with _resamplers_lock:
+            resampler = _resamplers.get(key)
+            if resampler is None:
+                resampler = torchaudio.transforms.Resample(orig_freq=key[0], new_freq=key[1])
+                _resamplers[key] = resampler
+    return resampler
+
+
+def to_mono_resampled(wav: torch.Tensor, sr: int, target_sr: int = 16000) -> torch.Tensor:
+    """
+    Chuẩn hóa waveform về mono 1-D ở `target_sr`
+
+    Args:
+        wav: Tensor (samples,) hoặc (channels, samples)
+        sr: Sample rate hiện tại
+        target_sr: Sample rate mục tiêu
+
+    Returns:
+        torch.Tensor: Waveform 1-D float32
+    """
+    if wav.dim() == 2:
+        # Chuyển stereo thành mono nếu cần
+        wav = wav.mean(dim=0) if wav.size(0) > 1 else wav.squeeze(0)
+    wav = wav.to(torch.float32)
+
+    if sr != target_sr:
+        with torch.no_grad():
+            wav = get_resampler(sr, target_sr)(wav)
+    return wav
+
+
+def load_audio(audio: AudioInput, target_sr: int = 16000, sample_rate: Optional[int] = None, preprocessed: bool = False) -> torch.Tensor:
+    """
+    Load audio từ nhiều nguồn thành waveform mono 1-D ở `target_sr`
+
+    Args:
+        audio: Đường dẫn file, bytes/file-like object chứa file audio (wav, flac...),
+            hoặc waveform tensor (samples,) / (channels, samples)
+        target_sr: Sample rate mục tiêu (Hz)
+        sample_rate: Sample rate của waveform tensor (mặc định coi là `target_sr`);
+            bỏ qua với các dạng input còn lại
+        preprocessed: File đã là mono ở `target_sr`: dùng thẳng kết quả decode, bỏ qua
+            bước chuyển mono / resample (file không đúng như vậy vẫn được chuyển đổi)
+
+    Returns:
+        torch.Tensor: Waveform 1-D
+
+    Raises:
+        AudioDecodeError: nếu không decode được file audio
+    """
+    if isinstance(audio, torch.Tensor):
+        return to_mono_resampled(audio, sample_rate or target_sr, target_sr)
+
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        audio = io.BytesIO(audio)
+
+    try:
+        wav, sr = torchaudio.load(audio)
+    except (RuntimeError, ValueError) as e:  # soundfile / ffmpeg backend báo lỗi decode bằng RuntimeError
+        raise AudioDecodeError(str(e)) from e
+    if preprocessed and sr == target_sr and wav.size(0) == 1:
+        return wav[0]
+    return to_mono_resampled(wav, sr, target_sr)
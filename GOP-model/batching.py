@@ -0,0 +1,237 @@
+"""
+Batching Module
+===============
+
+Module gom các utterance đang chờ thành batch để chạy chung một forward pass:
+- Thu thập request trong tối đa vài mili giây (max_wait_ms)
+- Giới hạn số utterance mỗi batch (max_batch_size)
+- Trả logits của từng utterance về đúng request đang chờ (qua Future)
+- Chia request theo độ dài audio thành các lane riêng (mỗi lane một hàng đợi và một
+  worker thread), để clip dài không nằm chung batch / hàng đợi với clip ngắn
+"""
+
+import bisect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence
+
+import torch
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching scheduler cho CTC model
+
+    Mỗi request gọi `infer()` (hoặc `submit()`) với một waveform 1-D. Một worker
+    thread nền lấy request đầu tiên trong hàng đợi, chờ thêm request khác cho đến
+    khi đủ `max_batch_size` hoặc hết `max_wait_ms`, rồi gọi `forward_fn` một lần
+    cho cả batch. Lỗi của forward pass được chuyển về tất cả request trong batch.
+    """
+
+    def __init__(
+        self,
+        forward_fn: Callable[[List[torch.Tensor]], List[torch.Tensor]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = 'ctc-batcher',
+    ):
+        """
+        Khởi tạo BatchScheduler
+
+        Args:
+            forward_fn: Hàm nhận danh sách waveform, trả về danh sách logits cùng thứ tự
+            max_batch_size: Số utterance tối đa trong một batch
+            max_wait_ms: Thời gian chờ tối đa để gom batch (ms)
+            name: Tên worker thread
+        """
+        self.forward_fn = forward_fn
+        self.name = name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Thống kê
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+
+    def submit(self, waveform: torch.Tensor) -> Future:
+        """
+        Đưa một waveform vào hàng đợi
+
+        Args:
+            waveform: Waveform 1-D
+
+        Returns:
+            Future: Future sẽ chứa logits (frames, vocab) của utterance này
+        """
+        future = Future()
+        # Giữ lock để không có request nào vào hàng đợi sau khi close() đã gửi tín hiệu dừng
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchScheduler đã đóng")
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+            self._queue.put((waveform, future))
+        return future
+
+    def infer(self, waveform: torch.Tensor, timeout: Optional[float] = None) -> torch.Tensor:
+        """Submit rồi chờ logits (blocking)"""
+        return self.submit(waveform).result(timeout=timeout)
+
+    def close(self):
+        """
+        Dừng worker thread; các request đã vào hàng đợi trước đó vẫn được xử lý xong
+
+        Request nào còn lại sau khi worker đã thoát (ví dụ worker dừng vì lỗi) nhận
+        RuntimeError thay vì chờ mãi.
+        """
+        with self._lock:
+            self._closed = True
+            worker, self._worker = self._worker, None
+            if worker is not None:
+                self._queue.put(None)
+        if worker is not None:
+            worker.join()
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("BatchScheduler đã đóng"))
+
+    def stats(self) -> Dict:
+        """Thống kê số batch đã chạy và kích thước batch"""
+        return {
+            'batches': self._batches,
+            'items': self._items,
+            'avg_batch_size': (self._items / self._batches) if self._batches else 0.0,
+            'max_batch_size_seen': self._max_seen,
+            'queue_depth': self._queue.qsize(),
+        }
+
+    def _collect_batch(self, first) -> List:
+        """Gom thêm request cho đến khi đủ batch hoặc hết thời gian chờ"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Tín hiệu dừng: đặt lại để vòng lặp chính thoát sau batch này
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        """Vòng lặp của worker thread"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            # Bỏ qua các request đã bị hủy trong lúc chờ
+            batch = [(wav, fut) for wav, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                outputs = self.forward_fn([wav for wav, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            if len(outputs) != len(batch):
+                error = RuntimeError(f"forward_fn trả về {len(outputs)} logits cho batch {len(batch)} utterance")
+                for _, fut in batch:
+                    fut.set_exception(error)
+                continue
+
+            self._batches += 1
+            self._items += len(batch)
+            self._max_seen = max(self._max_seen, len(batch))
+            for (_, fut), logits in zip(batch, outputs):
+                fut.set_result(logits)
+
+
+class BucketedBatchScheduler:
+    """
+    Nhiều BatchScheduler, mỗi cái phục vụ một khoảng độ dài audio (lane)
+
+    `bucket_seconds=(4, 10)` tạo ba lane: < 4s, 4-10s và >= 10s. Mỗi lane có hàng đợi
+    và worker thread riêng, nên forward pass của một clip dài không chặn các clip
+    ngắn đang chờ, và batch chỉ gồm các utterance có độ dài gần nhau (ít padding).
+    Interface giống BatchScheduler.
+    """
+
+    def __init__(
+        self,
+        forward_fn: Callable[[List[torch.Tensor]], List[torch.Tensor]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        bucket_seconds: Sequence[float] = (4.0, 10.0),
+        sample_rate: int = 16000,
+    ):
+        """
+        Khởi tạo BucketedBatchScheduler
+
+        Args:
+            forward_fn: Hàm nhận danh sách waveform, trả về danh sách logits cùng thứ tự
+            max_batch_size: Số utterance tối đa trong một batch (của mỗi lane)
+            max_wait_ms: Thời gian chờ tối đa để gom batch (ms)
+            bucket_seconds: Các ngưỡng độ dài (giây) chia lane, tăng dần
+            sample_rate: Sample rate của waveform (để đổi số sample ra giây)
+        """
+        self.boundaries = [int(s * sample_rate) for s in sorted(bucket_seconds)]
+        edges = [0.0] + sorted(float(s) for s in bucket_seconds)
+        self.labels = [f"<{edges[i + 1]:g}s" if i == 0 else f"{edges[i]:g}-{edges[i + 1]:g}s"
+                       for i in range(len(edges) - 1)] + [f">={edges[-1]:g}s" if len(edges) > 1 else 'all']
+        self.lanes = [
+            BatchScheduler(forward_fn, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name=f"ctc-batcher[{label}]")
+            for label in self.labels
+        ]
+
+    def lane_for(self, num_samples: int) -> int:
+        """Chỉ số lane cho một utterance có `num_samples` sample"""
+        return bisect.bisect_right(self.boundaries, num_samples)
+
+    def submit(self, waveform: torch.Tensor) -> Future:
+        """Đưa waveform vào lane theo độ dài, trả về Future chứa logits"""
+        return self.lanes[self.lane_for(waveform.shape[-1])].submit(waveform)
+
+    def infer(self, waveform: torch.Tensor, timeout: Optional[float] = None) -> torch.Tensor:
+        """Submit rồi chờ logits (blocking)"""
+        return self.submit(waveform).result(timeout=timeout)
+
+    def close(self):
+        """Dừng worker thread của mọi lane"""
+        for lane in self.lanes:
+            lane.close()
+
+    def stats(self) -> Dict:
+        """Thống kê tổng hợp và theo từng lane"""
+        lanes = {label: lane.stats() for label, lane in zip(self.labels, self.lanes)}
+        batches = sum(s['batches'] for s in lanes.values())
+        items = sum(s['items'] for s in lanes.values())
+        return {
+            'batches': batches,
+            'items': items,
+            'avg_batch_size': (items / batches) if batches else 0.0,
+            'max_batch_size_seen': max(s['max_batch_size_seen'] for s in lanes.values()),
+            'queue_depth': sum(s['queue_depth'] for s in lanes.values()),
+            'lanes': lanes,
+        }
@@ -0,0 +1,160 @@
+"""
+CTC Prefix Beam Search Module
+=============================
+
+Beam search trên output CTC (prefix beam search), thay cho greedy argmax khi cần:
+- Mỗi frame chỉ xét top-k token (cộng blank), chọn trên toàn bộ ma trận log-prob một lần
+- Các phép mở rộng beam được tính theo ma trận (beam x top-k) bằng numpy; các prefix
+  trùng nhau được gộp theo hash (logaddexp), không có vòng lặp Python theo token
+- Tùy chọn bias về chuỗi phone mong đợi: prefix đi đúng theo target (cho phép bỏ qua
+  một phone) được cộng thêm điểm khi xếp hạng beam, xác suất CTC không bị thay đổi
+
+Bias làm kết quả nghiêng về phát âm đúng, nên chỉ nên dùng giá trị nhỏ: với chấm điểm
+phát âm, bias quá lớn sẽ che mất lỗi thật của người học.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Hệ số hash prefix: hash(prefix + c) = hash(prefix) * _HASH_BASE + c + 1 (tràn số int64 là chủ ý)
+_HASH_BASE = np.int64(1000003)
+
+
+def log_softmax(logits: np.ndarray) -> np.ndarray:
+    """Log-softmax theo chiều vocab của ma trận (frames, vocab)"""
+    logits = logits.astype(np.float64, copy=False)
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+
+def ctc_prefix_beam_search(
+    log_probs: np.ndarray,
+    blank_id: int,
+    beam_width: int = 8,
+    token_topk: Optional[int] = None,
+    target_ids: Optional[np.ndarray] = None,
+    target_bias: float = 0.0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    CTC prefix beam search
+
+    Args:
+        log_probs: Log-prob (frames, vocab) - đã qua log_softmax
+        blank_id: Id của CTC blank
+        beam_width: Số prefix giữ lại sau mỗi frame
+        token_topk: Số token (ngoài blank) được xét ở mỗi frame (mặc định = beam_width)
+        target_ids: Chuỗi token id mong đợi (phone của script), dùng cho bias
+        target_bias: Điểm cộng (log) cho mỗi token đi đúng theo target; 0 = không bias
+
+    Returns:
+        Tuple: (token ids, frame bắt đầu, frame kết thúc + 1) của prefix tốt nhất. Frame kết
+        thúc lấy theo frame bắt đầu của token kế tiếp (hoặc frame cuối).
+    """
+    frames, vocab_size = log_probs.shape
+    empty = np.zeros(0, dtype=np.int64)
+    if frames == 0:
+        return empty, empty, empty
+
+    # Top-k token mỗi frame cho cả chuỗi một lần; blank được xét riêng ở mọi frame
+    k = max(1, min(token_topk or beam_width, vocab_size))
+    masked = log_probs.copy()
+    masked[:, blank_id] = -np.inf
+    cand_ids = np.argpartition(-masked, k - 1, axis=1)[:, :k]
+    cand_lps = np.take_along_axis(masked, cand_ids, axis=1)
+
+    use_bias = target_bias > 0 and target_ids is not None and len(target_ids) > 0
+    if use_bias:
+        # Pad hai phần tử để luôn đọc được target[j] và target[j + 1]
+        target = np.concatenate([np.asarray(target_ids, dtype=np.int64), [-2, -2]])
+        target_len = len(target) - 2
+
+    # Trạng thái beam: hash prefix, token cuối, log-prob kết thúc bằng blank / không blank,
+    # vị trí đã khớp trong target, điểm bias, node cuối trong lịch sử (để dựng lại prefix)
+    hashes = np.zeros(1, dtype=np.int64)
+    last = np.full(1, -1, dtype=np.int64)
+    p_blank = np.zeros(1)
+    p_token = np.full(1, -np.inf)
+    matched = np.zeros(1, dtype=np.int64)
+    bonus = np.zeros(1)
+    node = np.full(1, -1, dtype=np.int64)
+    history_parent, history_token, history_frame = [], [], []
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        for t in range(frames):
+            row = log_probs[t]
+            beams = len(hashes)
+            total = np.logaddexp(p_blank, p_token)
+
+            # Giữ nguyên prefix: thêm blank, hoặc lặp lại token cuối (CTC gộp frame lặp)
+            stay_blank = total + row[blank_id]
+            stay_token = np.where(last >= 0, p_token + row[np.maximum(last, 0)], -np.inf)
+
+            # Mở rộng prefix với từng token trong top-k của frame; token trùng token cuối
+            # chỉ mở rộng được từ nhánh kết thúc bằng blank
+            cands, lps = cand_ids[t], cand_lps[t]
+            same = cands[None, :] == last[:, None]
+            ext_score = np.where(same, p_blank[:, None], total[:, None]) + lps[None, :]
+            ext_hash = hashes[:, None] * _HASH_BASE + (cands[None, :] + 1)
+
+            all_hash = np.concatenate([hashes, ext_hash.ravel()])
+            all_blank = np.concatenate([stay_blank, np.full(ext_hash.size, -np.inf)])
+            all_token = np.concatenate([stay_token, ext_score.ravel()])
+
+            # Gộp các entry cùng prefix (stay đứng trước nên được chọn làm đại diện)
+            order = np.argsort(all_hash, kind='stable')
+            sorted_hash = all_hash[order]
+            starts = np.flatnonzero(np.concatenate([[True], sorted_hash[1:] != sorted_hash[:-1]]))
+            merged_blank = np.logaddexp.reduceat(all_blank[order], starts)
+            merged_token = np.logaddexp.reduceat(all_token[order], starts)
+            rep = order[starts]
+
+            # Thông tin của từng entry đại diện: beam cha, token mới (-1 nếu giữ nguyên)
+            is_ext = rep >= beams
+            ext_index = np.where(is_ext, rep - beams, 0)
+            parent = np.where(is_ext, ext_index // k, rep)
+            token = np.where(is_ext, cands[ext_index % k], -1)
+
+            new_matched = matched[parent]
+            new_bonus = bonus[parent]
+            if use_bias:
+                pos = np.minimum(new_matched, target_len)
+                hit_next = is_ext & (token == target[pos])
+                hit_skip = is_ext & ~hit_next & (token == target[pos + 1])
+                new_matched = np.minimum(new_matched + hit_next + 2 * hit_skip, target_len)
+                new_bonus = new_bonus + target_bias * (hit_next | hit_skip)
+
+            score = np.logaddexp(merged_blank, merged_token) + new_bonus
+            if len(score) > beam_width:
+                keep = np.argpartition(-score, beam_width - 1)[:beam_width]
+            else:
+                keep = np.arange(len(score))
+            keep = keep[np.isfinite(score[keep])]
+
+            # Node mới trong lịch sử cho các prefix vừa được mở rộng
+            new_node = node[parent[keep]]
+            ext_keep = np.flatnonzero(is_ext[keep])
+            if len(ext_keep):
+                first_id = len(history_parent)
+                history_parent.extend(new_node[ext_keep].tolist())
+                history_token.extend(token[keep][ext_keep].tolist())
+                history_frame.extend([t] * len(ext_keep))
+                new_node[ext_keep] = np.arange(first_id, first_id + len(ext_keep))
+
+            hashes = sorted_hash[starts][keep]
+            last = np.where(is_ext, token, last[parent])[keep]
+            p_blank, p_token = merged_blank[keep], merged_token[keep]
+            matched, bonus = new_matched[keep], new_bonus[keep]
+            node = new_node
+
+    best = int(np.argmax(np.logaddexp(p_blank, p_token) + bonus))
+    ids, starts = [], []
+    current = int(node[best])
+    while current >= 0:
+        ids.append(history_token[current])
+        starts.append(history_frame[current])
+        current = history_parent[current]
+    ids.reverse()
+    starts.reverse()
+    ends = starts[1:] + [frames]
+    return np.array(ids, dtype=np.int64), np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
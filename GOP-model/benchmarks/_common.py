@@ -0,0 +1,156 @@
+"""
+Tiện ích dùng chung cho các benchmark
+=====================================
+
+- Thêm thư mục GOP-model vào sys.path để import các module chính
+- Sinh audio tổng hợp (không cần file fixture), ghi ra hoặc đọc thư mục fixture wav + txt
+- Đo RSS / peak RSS của process (Linux)
+- Tính percentile, edit distance và in bảng kết quả
+"""
+
+import glob
+import math
+import os
+import sys
+from typing import Dict, List, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DEFAULT_MODEL = "mrrubino/wav2vec2-large-xlsr-53-l2-arctic-phoneme"
+
+# Script mẫu cho các clip tổng hợp khi không có fixture
+SAMPLE_SCRIPTS = [
+    "the quick brown fox jumps over the lazy dog",
+    "she sells sea shells by the sea shore",
+    "how much wood would a woodchuck chuck",
+    "we were away a year ago",
+]
+
+
+def synthetic_waveform(seconds: float, sr: int = 16000, seed: int = 0):
+    """
+    Sinh waveform "giống tiếng nói": chuỗi tone có formant thay đổi, điều biên theo
+    âm tiết, cộng nhiễu nhẹ. Đủ để đo chi phí tính toán, không dùng để đo độ chính xác.
+    """
+    import torch
+
+    gen = torch.Generator().manual_seed(seed)
+    n = max(1, int(seconds * sr))
+    t = torch.arange(n, dtype=torch.float32) / sr
+    f0 = 110.0 + 40.0 * torch.rand(1, generator=gen).item()
+    formants = 300.0 + 2200.0 * torch.rand(3, generator=gen)
+    wav = torch.zeros(n)
+    for k, f in enumerate(formants.tolist()):
+        wav += torch.sin(2 * math.pi * (f + 30.0 * torch.sin(2 * math.pi * 0.7 * t)) * t) / (k + 1)
+    wav *= torch.sin(2 * math.pi * f0 * t) * 0.5 + 0.5
+    syllables = 0.5 + 0.5 * torch.sin(2 * math.pi * 4.0 * t).clamp(min=0)
+    wav = wav * syllables + 0.01 * torch.randn(n, generator=gen)
+    return (wav / wav.abs().max().clamp(min=1e-6) * 0.5).contiguous()
+
+
+def load_fixtures(path: str, clips: int, seed: int = 0):
+    """
+    Danh sách (name, script, waveform 16k) từ thư mục fixture (các cặp name.wav + name.txt),
+    hoặc `clips` clip tổng hợp với các script mẫu nếu không có thư mục
+    """
+    from audio_io import load_audio
+
+    fixtures = []
+    if path:
+        for wav_path in sorted(glob.glob(os.path.join(path, '*.wav'))):
+            txt_path = os.path.splitext(wav_path)[0] + '.txt'
+            if not os.path.exists(txt_path):
+                continue
+            with open(txt_path, 'r', encoding='utf-8') as f:
+                script = f.read().strip()
+            fixtures.append((os.path.basename(wav_path), script, load_audio(wav_path, 16000)))
+        if not fixtures:
+            raise SystemExit(f"No name.wav + name.txt pairs found in {path}")
+        return fixtures
+    for i in range(clips):
+        seconds = 2.0 + (i % 4) * 1.5
+        fixtures.append((f"synthetic-{i}", SAMPLE_SCRIPTS[i % len(SAMPLE_SCRIPTS)], synthetic_waveform(seconds, seed=seed + i)))
+    return fixtures
+
+
+def write_fixtures(path: str, clips: int, seed: int = 0) -> int:
+    """
+    Ghi `clips` clip tổng hợp thành thư mục fixture (name.wav 16k mono + name.txt), không
+    cần TTS: độ dài 1-10 giây, một phần clip có khoảng lặng đầu/cuối để VAD có việc làm
+
+    Returns:
+        int: Số clip đã ghi
+    """
+    import soundfile as sf
+    import torch
+
+    os.makedirs(path, exist_ok=True)
+    for i in range(clips):
+        seconds = 1.0 + (i * 1.7) % 9.0
+        wav = synthetic_waveform(seconds, seed=seed + i)
+        if i % 3 == 2:
+            silence = torch.zeros(int(0.5 * 16000))
+            wav = torch.cat([silence, wav, silence])
+        name = f"clip-{i:03d}"
+        sf.write(os.path.join(path, name + '.wav'), wav.numpy(), 16000, subtype='PCM_16')
+        with open(os.path.join(path, name + '.txt'), 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_SCRIPTS[i % len(SAMPLE_SCRIPTS)] + '\n')
+    return clips
+
+
+def reset_peak_rss() -> bool:
+    """Reset VmHWM của process (Linux >= 4.0); trả về False nếu không hỗ trợ"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def read_status_kb(field: str) -> int:
+    """Một trường (kB) của /proc/self/status, ví dụ VmRSS / VmHWM; 0 nếu không đọc được"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Percentile theo nội suy tuyến tính (q trong khoảng 0-100)"""
+    if not values:
+        return 0.0
+    data = sorted(values)
+    k = (len(data) - 1) * q / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    if lo == hi:
+        return data[int(k)]
+    return data[lo] + (data[hi] - data[lo]) * (k - lo)
+
+
+def edit_distance(a: Sequence, b: Sequence) -> int:
+    """Levenshtein distance giữa hai chuỗi phone"""
+    prev = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        cur = [i]
+        for j, y in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (x != y)))
+        prev = cur
+    return prev[-1]
+
+
+def print_table(rows: List[Dict], columns: List[str]):
+    """In danh sách dict thành bảng căn lề"""
+    def fmt(v):
+        return f"{v:.2f}" if isinstance(v, float) else str(v)
+
+    widths = [max(len(c), *(len(fmt(r.get(c, ''))) for r in rows)) for c in columns]
+    print('  '.join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print('  '.join(fmt(r.get(c, '')).rjust(w) for c, w in zip(columns, widths)))
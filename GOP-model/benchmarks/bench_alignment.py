@@ -0,0 +1,132 @@
+"""
+Benchmark PronunciationAligner
+==============================
+
+So sánh:
+- legacy: DP unit-cost bằng list-of-lists, tra similarity sau khi backtrack (bản cũ)
+- single: `align_with_errors` cho từng cặp (kernel Python cho cặp nhỏ, NumPy cho cặp lớn)
+- batch: `align_batch` cho cả câu một lần (bảng DP NumPy cho cả batch)
+- ids: `align_ids_batch` trên chuỗi id phone có sẵn, như pipeline chấm điểm gọi
+
+Input là các cặp (target, predicted) theo từng từ, sinh ngẫu nhiên từ inventory IPA với
+tỉ lệ lỗi thay thế / bỏ sót / chèn thêm giống output thực tế.
+
+Ví dụ:
+    python benchmarks/bench_alignment.py --sentences 500 --words 12
+"""
+
+import argparse
+import random
+import time
+
+from _common import print_table
+from alignment import PronunciationAligner
+from data_structures import PhonemeError
+from phoneme_mapper import PhonemeMapper
+
+
+def legacy_align_with_errors(mapper: PhonemeMapper, target, predicted):
+    """Bản alignment unit-cost trước khi vector hóa (giữ lại để so sánh tốc độ)"""
+    n, m = len(target), len(predicted)
+    dp = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        dp[i][0] = i
+    for j in range(1, m + 1):
+        dp[0][j] = j
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            cost = 0 if target[i - 1] == predicted[j - 1] else 1
+            dp[i][j] = min(dp[i - 1][j] + 1, dp[i][j - 1] + 1, dp[i - 1][j - 1] + cost)
+
+    operations = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0:
+            cost = 0 if target[i - 1] == predicted[j - 1] else 1
+            if dp[i][j] == dp[i - 1][j - 1] + cost:
+                operations.append(('M' if cost == 0 else 'S', target[i - 1], predicted[j - 1]))
+                i -= 1
+                j -= 1
+                continue
+        if i > 0 and dp[i][j] == dp[i - 1][j] + 1:
+            operations.append(('D', target[i - 1], None))
+            i -= 1
+        else:
+            operations.append(('I', None, predicted[j - 1]))
+            j -= 1
+    operations.reverse()
+
+    errors, target_idx = [], 0
+    for op, expected, actual in operations:
+        if op == 'M':
+            target_idx += 1
+        elif op == 'S':
+            errors.append(PhonemeError('substitution', target_idx, expected, actual,
+                                       1.0 - mapper.get_similarity(expected, actual)))
+            target_idx += 1
+        elif op == 'D':
+            errors.append(PhonemeError('deletion', target_idx, expected, None, 1.0))
+            target_idx += 1
+        else:
+            errors.append(PhonemeError('insertion', max(0, target_idx - 1), None, actual, 0.8))
+    return errors
+
+
+def make_sentences(mapper: PhonemeMapper, count: int, words: int, seed: int):
+    """Sinh các câu, mỗi câu là danh sách cặp (target, predicted) theo từ"""
+    rng = random.Random(seed)
+    inventory = list(mapper.ipa_phones)
+    sentences = []
+    for _ in range(count):
+        pairs = []
+        for _ in range(words):
+            target = [rng.choice(inventory) for _ in range(rng.randint(1, 8))]
+            predicted = []
+            for phone in target:
+                r = rng.random()
+                if r < 0.1:
+                    continue  # deletion
+                predicted.append(rng.choice(inventory) if r < 0.25 else phone)
+                if rng.random() < 0.08:
+                    predicted.append(rng.choice(inventory))  # insertion
+            pairs.append((target, predicted))
+        sentences.append(pairs)
+    return sentences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sentences', type=int, default=300)
+    parser.add_argument('--words', type=int, default=12, help='Số từ mỗi câu')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mapper = PhonemeMapper('.')
+    aligner = PronunciationAligner(mapper)
+    sentences = make_sentences(mapper, args.sentences, args.words, args.seed)
+
+    # Batch API phải cho kết quả giống hệt gọi lần lượt từng cặp
+    for pairs in sentences:
+        assert aligner.align_batch(pairs) == [aligner.align_with_errors(t, p) for t, p in pairs]
+    id_sentences = [[(mapper.phone_ids(t), mapper.phone_ids(p)) for t, p in pairs] for pairs in sentences]
+
+    impls = {
+        'legacy': (lambda pairs: [legacy_align_with_errors(mapper, t, p) for t, p in pairs], sentences),
+        'single': (lambda pairs: [aligner.align_with_errors(t, p) for t, p in pairs], sentences),
+        'batch': (aligner.align_batch, sentences),
+        'ids': (aligner.align_ids_batch, id_sentences),
+    }
+    rows = []
+    n_pairs = sum(len(s) for s in sentences)
+    for name, (fn, inputs) in impls.items():
+        start = time.perf_counter()
+        errors = sum(len(e) for pairs in inputs for e in fn(pairs))
+        elapsed = time.perf_counter() - start
+        rows.append({'impl': name, 'pairs': n_pairs, 'total_ms': elapsed * 1000,
+                     'per_sentence_us': elapsed * 1e6 / len(sentences), 'errors': errors})
+
+    print_table(rows, ['impl', 'pairs', 'total_ms', 'per_sentence_us', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark độ chính xác / latency của các inference backend
+==========================================================
+
+Chạy cùng một tập fixture qua từng backend của CTCDecoder (torch fp32 là chuẩn,
+int8 dynamic quantization, ONNX Runtime) và báo cáo:
+- load_s: thời gian tạo backend (quantize / export + load ONNX lần đầu)
+- p50_ms / p95_ms / rtf: latency forward + decode cho từng utterance
+- logit_diff: sai lệch logits lớn nhất so với torch
+- per: phone error rate của chuỗi phone decode được so với torch
+- score_drift: chênh lệch overall_score (trung bình / lớn nhất) so với torch
+
+Fixture là thư mục chứa các cặp `name.wav` + `name.txt` (script đọc). Không có fixture
+thì dùng audio tổng hợp với vài script mẫu (chỉ có ý nghĩa về latency và độ lệch
+giữa các backend, không phải độ chính xác phát âm thật).
+
+Ví dụ:
+    python benchmarks/bench_backends.py --fixtures fixtures/ --backends torch,int8,onnx
+    python benchmarks/bench_backends.py --model /models/wav2vec2-phoneme --clips 20
+"""
+
+import argparse
+import time
+
+import torch
+
+from _common import DEFAULT_MODEL, edit_distance, load_fixtures, percentile, print_table
+from ctc_decoder import CTCDecoder
+from scorer import PronunciationScorer
+
+def run_backend(scorer: PronunciationScorer, kind: str, model: str, fixtures, repeat: int):
+    """Chạy toàn bộ fixtures với một backend, trả về (row, logits, phones, scores)"""
+    decoder = CTCDecoder(default_backend=kind)
+    t0 = time.perf_counter()
+    decoder.get_backend(model)
+    load_s = time.perf_counter() - t0
+
+    # Warmup một lần để không tính chi phí khởi tạo lazy vào latency
+    decoder.infer_logits(fixtures[0][2], model)
+
+    latencies, logits_out, phones_out, scores_out = [], [], [], []
+    for _, script, wav in fixtures:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            logits = decoder.infer_logits(wav, model)
+            tokens = decoder.decode_logits(logits, model)
+            latencies.append(time.perf_counter() - t0)
+        result = scorer.score_tokens(script, tokens, model)
+        logits_out.append(logits)
+        phones_out.append(result.predicted_ipa.split())
+        scores_out.append(result.overall_score)
+
+    audio_seconds = sum(w.shape[-1] for _, _, w in fixtures) * repeat / 16000
+    row = {
+        'backend': kind,
+        'load_s': load_s,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'rtf': sum(latencies) / audio_seconds,
+    }
+    return row, logits_out, phones_out, scores_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--backends', default='torch,int8,onnx')
+    parser.add_argument('--fixtures', default=None, help='Thư mục chứa các cặp name.wav + name.txt')
+    parser.add_argument('--clips', type=int, default=12, help='Số clip tổng hợp khi không có fixture')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần chạy mỗi clip để đo latency')
+    parser.add_argument('--threads', type=int, default=0, help='torch.set_num_threads (0 = mặc định)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    fixtures = load_fixtures(args.fixtures, args.clips, args.seed)
+    scorer = PronunciationScorer()
+    kinds = [k.strip() for k in args.backends.split(',') if k.strip()]
+    if 'torch' in kinds:
+        kinds.remove('torch')
+    kinds.insert(0, 'torch')  # torch là chuẩn để so sánh
+
+    rows, reference = [], None
+    for kind in kinds:
+        try:
+            row, logits, phones, scores = run_backend(scorer, kind, args.model, fixtures, args.repeat)
+        except ImportError as e:
+            print(f"skip {kind}: {e}")
+            continue
+        if reference is None:
+            reference = (logits, phones, scores)
+        ref_logits, ref_phones, ref_scores = reference
+        errors = sum(edit_distance(r, p) for r, p in zip(ref_phones, phones))
+        drifts = [abs(a - b) for a, b in zip(ref_scores, scores)]
+        row.update({
+            'logit_diff': max(float((a - b).abs().max()) for a, b in zip(ref_logits, logits)),
+            'per': errors / max(1, sum(len(r) for r in ref_phones)),
+            'drift_mean': sum(drifts) / len(drifts),
+            'drift_max': max(drifts),
+        })
+        rows.append(row)
+
+    print(f"{len(fixtures)} clips, model {args.model}, {torch.get_num_threads()} threads")
+    print_table(rows, ['backend', 'load_s', 'p50_ms', 'p95_ms', 'rtf', 'logit_diff', 'per', 'drift_mean', 'drift_max'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark dynamic micro-batching của CTCDecoder
+===============================================
+
+Mô phỏng nhiều request đồng thời (mỗi request một thread) gửi utterance có độ dài
+ngẫu nhiên qua `CTCDecoder.infer_logits`, với các cấu hình batch khác nhau.
+Báo cáo throughput (utterance/s) và latency p50/p99 cho từng cấu hình.
+
+Ví dụ:
+    python benchmarks/bench_batching.py --settings 1:0,4:5,8:10,16:20 --concurrency 16
+    python benchmarks/bench_batching.py --model /models/wav2vec2-phoneme --requests 200
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from _common import DEFAULT_MODEL, percentile, print_table, synthetic_waveform
+from ctc_decoder import CTCDecoder
+
+
+def parse_settings(text: str):
+    """'1:0,8:10' -> [(1, 0.0), (8, 10.0)]"""
+    settings = []
+    for part in text.split(','):
+        size, wait = part.split(':')
+        settings.append((int(size), float(wait)))
+    return settings
+
+
+def run_setting(decoder: CTCDecoder, model: str, clips, concurrency: int, max_batch_size: int, max_wait_ms: float):
+    """Chạy toàn bộ clips với một cấu hình batch, trả về một dòng kết quả"""
+    decoder.enable_batching(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+
+    def one(wav):
+        t0 = time.perf_counter()
+        logits = decoder.infer_logits(wav, model)
+        decoder.decode_logits(logits, model)
+        latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, clips))
+    wall = time.perf_counter() - start
+
+    stats = decoder.batching_stats().get(model, {})
+    decoder.close_batchers()
+    audio_seconds = sum(w.shape[-1] for w in clips) / 16000
+    return {
+        'batch': max_batch_size,
+        'wait_ms': max_wait_ms,
+        'throughput/s': len(clips) / wall,
+        'rtf': wall / audio_seconds,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'avg_batch': float(stats.get('avg_batch_size', 1.0)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='HF model id hoặc thư mục model local')
+    parser.add_argument('--requests', type=int, default=64, help='Số utterance mỗi cấu hình')
+    parser.add_argument('--concurrency', type=int, default=16, help='Số request đồng thời')
+    parser.add_argument('--min-seconds', type=float, default=1.0)
+    parser.add_argument('--max-seconds', type=float, default=4.0)
+    parser.add_argument('--settings', default='1:0,4:5,8:10,16:20', help='Danh sách max_batch_size:max_wait_ms')
+    parser.add_argument('--threads', type=int, default=0, help='torch.set_num_threads (0 = mặc định)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    rng = random.Random(args.seed)
+    clips = [
+        synthetic_waveform(rng.uniform(args.min_seconds, args.max_seconds), seed=i)
+        for i in range(args.requests)
+    ]
+
+    decoder = CTCDecoder()
+    # Warmup: load model và chạy thử một forward pass
+    decoder.forward_batch(clips[:2], args.model)
+
+    rows = [
+        run_setting(decoder, args.model, clips, args.concurrency, size, wait)
+        for size, wait in parse_settings(args.settings)
+    ]
+    print(f"model={args.model} requests={args.requests} concurrency={args.concurrency} "
+          f"clip={args.min_seconds}-{args.max_seconds}s torch_threads={torch.get_num_threads()}")
+    print_table(rows, ['batch', 'wait_ms', 'throughput/s', 'rtf', 'p50_ms', 'p99_ms', 'avg_batch'])
+
+
+if __name__ == '__main__':
+    main()
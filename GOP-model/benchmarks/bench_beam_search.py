@@ -0,0 +1,89 @@
+"""
+Benchmark greedy vs CTC prefix beam search
+==========================================
+
+Chạy model một lần cho mỗi clip, rồi decode cùng logits với các beam width (và target
+bias) khác nhau để chọn giá trị mặc định cho production (GOP_BEAM_WIDTH,
+GOP_BEAM_TARGET_BIAS). Báo cáo:
+- p50_ms / p95_ms: latency của bước decode (không tính forward pass)
+- decode_rtf: thời gian decode / thời lượng audio
+- per_target: phone error rate so với phone của script (với bản ghi đọc đúng, càng thấp
+  càng tốt; với bản ghi có lỗi, bias cao kéo giá trị này xuống một cách "giả")
+- per_greedy: độ lệch so với greedy
+- score: overall_score trung bình
+
+Fixture là thư mục các cặp `name.wav` + `name.txt`. Không có fixture thì dùng audio tổng
+hợp (chỉ có ý nghĩa về latency).
+
+Ví dụ:
+    python benchmarks/bench_beam_search.py --fixtures fixtures/ --beams 1,2,4,8,16,32 --biases 0,1
+    python benchmarks/bench_beam_search.py --model /models/wav2vec2-phoneme --clips 12
+"""
+
+import argparse
+import time
+
+import torch
+
+from _common import DEFAULT_MODEL, edit_distance, load_fixtures, percentile, print_table
+from scorer import PronunciationScorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='HF model id hoặc thư mục model local')
+    parser.add_argument('--fixtures', default=None, help='Thư mục chứa các cặp name.wav + name.txt')
+    parser.add_argument('--clips', type=int, default=12, help='Số clip tổng hợp khi không có fixture')
+    parser.add_argument('--beams', default='1,2,4,8,16,32,50', help='Các beam width cần đo (1 = greedy)')
+    parser.add_argument('--biases', default='0,1', help='Các giá trị target bias cần đo (chỉ áp dụng cho beam > 1)')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần decode mỗi clip để đo latency')
+    parser.add_argument('--threads', type=int, default=0, help='torch.set_num_threads (0 = mặc định)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    fixtures = load_fixtures(args.fixtures, args.clips, args.seed)
+    scorer = PronunciationScorer()
+    decoder = scorer.ctc_decoder
+    logits = [decoder.infer_logits(wav, args.model) for _, _, wav in fixtures]
+    audio_seconds = sum(wav.shape[-1] for _, _, wav in fixtures) / 16000
+
+    beams = [int(b) for b in args.beams.split(',')]
+    biases = [float(b) for b in args.biases.split(',')]
+    configs = [(beam, bias) for beam in beams for bias in (biases if beam > 1 else [0.0])]
+
+    rows, greedy = [], None
+    for beam, bias in configs:
+        latencies, phones, targets, scores = [], [], [], []
+        for (_, script, _), frame_logits in zip(fixtures, logits):
+            target_phones = scorer._bias_targets(script, beam, bias)
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                tokens = decoder.decode_logits(frame_logits, args.model, beam, target_phones, bias)
+                latencies.append(time.perf_counter() - start)
+            result = scorer.score_tokens(script, tokens, args.model)
+            phones.append(result.predicted_ipa.split())
+            targets.append(result.target_ipa.split())
+            scores.append(result.overall_score)
+        if greedy is None:
+            greedy = phones
+
+        rows.append({
+            'beam': beam,
+            'bias': bias,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'decode_rtf': sum(latencies) / args.repeat / audio_seconds,
+            'per_target': sum(edit_distance(t, p) for t, p in zip(targets, phones)) / max(1, sum(len(t) for t in targets)),
+            'per_greedy': sum(edit_distance(g, p) for g, p in zip(greedy, phones)) / max(1, sum(len(g) for g in greedy)),
+            'score': sum(scores) / len(scores),
+        })
+
+    print(f"{len(fixtures)} clips ({audio_seconds:.1f}s audio), model {args.model}")
+    print_table(rows, ['beam', 'bias', 'p50_ms', 'p95_ms', 'decode_rtf', 'per_target', 'per_greedy', 'score'])
+
+
+if __name__ == '__main__':
+    main()
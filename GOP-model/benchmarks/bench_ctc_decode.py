@@ -0,0 +1,128 @@
+"""
+Microbenchmark greedy CTC decode
+================================
+
+So sánh bước decode logits -> phoneme tokens đã vector hóa (bảng vocab tính sẵn,
+collapse bằng tensor ops trên cả batch) với bản cài đặt cũ (dựng lại id2token mỗi lần
+gọi, `argmax().tolist()` rồi collapse và ghép ký tự bằng vòng lặp Python).
+Trước khi đo, kiểm tra hai bản cho kết quả giống hệt nhau trên toàn bộ input sinh ra.
+
+Logits tổng hợp mô phỏng output của model CTC phoneme: phần lớn frame là blank, mỗi
+ký tự IPA kéo dài vài frame, thỉnh thoảng có token ranh giới ('|', ' ') và id không có
+trong tokenizer. Không cần load model.
+
+Ví dụ:
+    python benchmarks/bench_ctc_decode.py --utterances 500 --seconds 5 --batch 8
+"""
+
+import argparse
+import random
+import time
+
+import torch
+
+from _common import print_table
+from ctc_decoder import CTCDecoder, CTCVocab
+
+VOCAB = ['<pad>', '<s>', '</s>', '<unk>', '|', ' '] + list('abdefhijklmnprstuvwzæðŋɑɔəɛɡɪʃʊʌʒθɚː')
+
+
+def legacy_decode(logits: torch.Tensor, vocab: dict, pad_token_id: int):
+    """Bản decode_logits trước khi vector hóa (giữ lại để so sánh)"""
+    vocab = dict(vocab)  # tokenizer.get_vocab() trả về bản sao mới mỗi lần gọi
+    id2token = {i: t for t, i in vocab.items()}
+    blank_id = pad_token_id or vocab.get('<pad>', 0)
+    tokens, prev_id = [], None
+    for token_id in torch.argmax(logits, dim=-1).tolist():
+        if token_id == blank_id or token_id == prev_id:
+            prev_id = token_id
+            continue
+        token = id2token.get(token_id, '')
+        if token:
+            tokens.append(token)
+        prev_id = token_id
+
+    collapsed, current, pending_marker = [], '', False
+    for tk in tokens:
+        if tk == ' ' or tk == '▁' or tk == '|' or tk.isspace():
+            if current:
+                collapsed.append(current)
+                current = ''
+            pending_marker = True
+            continue
+        if current == '':
+            current = '▁' + tk if pending_marker else tk
+            pending_marker = False
+        else:
+            current = current + tk
+    if current:
+        collapsed.append(current)
+    return collapsed
+
+
+def synthetic_logits(frames: int, vocab_size: int, rng: random.Random) -> torch.Tensor:
+    """Logits (frames, vocab_size + 2): blank chiếm đa số, ký tự kéo dài 1-3 frame (CTC "peaky")"""
+    ids = []
+    while len(ids) < frames:
+        ids.extend([0] * rng.randint(0, 6))
+        roll = rng.random()
+        if roll < 0.15:
+            token = rng.choice([4, 5])
+        elif roll < 0.17:
+            token = vocab_size + rng.randint(0, 1)  # id ngoài tokenizer
+        else:
+            token = rng.randint(6, vocab_size - 1)
+        ids.extend([token] * rng.choice([1, 1, 2, 3]))
+    logits = torch.randn(frames, vocab_size + 2) * 0.1
+    logits[torch.arange(frames), torch.tensor(ids[:frames])] += 5.0
+    return logits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utterances', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=5.0, help='Độ dài mỗi utterance (50 frame/giây)')
+    parser.add_argument('--vocab', type=int, default=0, help='Thêm token nhiều ký tự cho đủ kích thước vocab (0 = chỉ ký tự IPA)')
+    parser.add_argument('--batch', type=int, default=8, help='Số utterance mỗi lần gọi bản batch')
+    parser.add_argument('--repeat', type=int, default=5, help='Lấy thời gian nhỏ nhất qua số lần chạy')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tokens = VOCAB + [f"{a}{b}" for a in VOCAB[6:] for b in VOCAB[6:]][:max(0, args.vocab - len(VOCAB))]
+    vocab = {t: i for i, t in enumerate(tokens)}
+    # Bảng vocab tổng hợp gắn trực tiếp vào decoder thay cho model thật
+    decoder = CTCDecoder()
+    decoder._vocabs['synthetic'] = CTCVocab(tokens + [''] * 2, blank_id=0)
+    frames = int(args.seconds * 50)
+    inputs = [synthetic_logits(max(1, int(frames * rng.uniform(0.5, 1.5))), len(tokens), rng) for _ in range(args.utterances)]
+    batches = [inputs[i:i + args.batch] for i in range(0, len(inputs), args.batch)]
+
+    def batched(items):
+        return [tokens for tokens, _ in decoder.decode_logits_batch(items, 'synthetic')]
+
+    expected = [legacy_decode(x, vocab, 0) for x in inputs]
+    assert [decoder.decode_logits(x, 'synthetic') for x in inputs] == expected, "vectorized decode differs from legacy"
+    assert [t for b in batches for t in batched(b)] == expected, "batched decode differs from legacy"
+
+    rows = []
+    for name, run in (
+        ('legacy', lambda: [legacy_decode(x, vocab, 0) for x in inputs]),
+        ('vectorized', lambda: [decoder.decode_logits(x, 'synthetic') for x in inputs]),
+        (f'vectorized x{args.batch}', lambda: [batched(b) for b in batches]),
+    ):
+        elapsed = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = min(elapsed, time.perf_counter() - start)
+        rows.append({'impl': name, 'total_ms': elapsed * 1000, 'us_per_utt': elapsed / len(inputs) * 1e6})
+    for row in rows:
+        row['speedup'] = rows[0]['total_ms'] / row['total_ms']
+
+    print(f"{len(inputs)} utterances, ~{frames} frames each, vocab {len(tokens)}, outputs identical")
+    print_table(rows, ['impl', 'total_ms', 'us_per_utt', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark lexicon index so với đường tra cứu CMUDict cũ
+======================================================
+
+So sánh:
+- Startup: `cmudict.dict()` (parse toàn bộ corpus NLTK) vs mở lexicon index qua mmap
+- Per-request: cách cũ gọi `cmudict.dict()` mỗi request rồi `arpabet_to_ipa_list`
+- Per-lookup: dict lookup + `arpabet_to_ipa_list` vs `PronunciationLexicon.lookup`
+
+Ví dụ:
+    python benchmarks/bench_lexicon.py --lookups 50000
+"""
+
+import argparse
+import random
+import time
+
+from _common import print_table
+from lexicon import PronunciationLexicon, ensure_cmudict
+from phoneme_mapper import PhonemeMapper
+
+
+def timed(fn, repeat: int = 1):
+    """Trả về (kết quả lần cuối, thời gian trung bình mỗi lần tính bằng ms)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=None, help='Đường dẫn lexicon index (mặc định data/cmudict_ipa.idx)')
+    parser.add_argument('--lookups', type=int, default=20000, help='Số lần tra cứu cho phép đo per-lookup')
+    parser.add_argument('--sentence-words', type=int, default=12, help='Số từ mỗi "request" mô phỏng')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ensure_cmudict()
+    from nltk.corpus import cmudict
+
+    mapper = PhonemeMapper('.')
+    cmu, cmu_ms = timed(cmudict.dict)
+    lexicon, build_ms = timed(lambda: PronunciationLexicon.build(mapper, args.index) if args.index else PronunciationLexicon.build(mapper))
+    lexicon, open_ms = timed(lambda: PronunciationLexicon(lexicon.path), repeat=20)
+
+    rng = random.Random(args.seed)
+    vocab = list(cmu)
+    words = [rng.choice(vocab) for _ in range(args.lookups)]
+    sentence = words[:args.sentence_words]
+
+    def legacy_lookup():
+        for w in words:
+            mapper.arpabet_to_ipa_list(cmu[w][0], ignore_stress=True)
+
+    def index_lookup():
+        for w in words:
+            lexicon.lookup(w)
+
+    def legacy_request():
+        d = cmudict.dict()
+        return [mapper.arpabet_to_ipa_list(d[w][0], ignore_stress=True) for w in sentence]
+
+    def index_request():
+        return [lexicon.lookup(w) for w in sentence]
+
+    assert legacy_request() == index_request(), "Lexicon index trả kết quả khác CMUDict"
+
+    _, legacy_lookup_ms = timed(legacy_lookup)
+    _, index_lookup_ms = timed(index_lookup)
+    _, legacy_req_ms = timed(legacy_request, repeat=3)
+    _, index_req_ms = timed(index_request, repeat=200)
+
+    rows = [
+        {'path': 'nltk cmudict.dict()', 'startup_ms': cmu_ms,
+         'lookup_us': legacy_lookup_ms * 1000 / len(words), 'request_ms': legacy_req_ms},
+        {'path': 'lexicon index (mmap)', 'startup_ms': open_ms,
+         'lookup_us': index_lookup_ms * 1000 / len(words), 'request_ms': index_req_ms},
+    ]
+    print(f"entries={len(lexicon)} build_ms={build_ms:.0f} sentence_words={len(sentence)}")
+    print_table(rows, ['path', 'startup_ms', 'lookup_us', 'request_ms'])
+
+
+if __name__ == '__main__':
+    main()
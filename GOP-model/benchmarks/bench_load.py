@@ -0,0 +1,266 @@
+"""
+Load test /score với nhiều mức concurrency
+==========================================
+
+Gửi request /score thật qua HTTP (aiohttp, closed-loop: mỗi client gửi request mới
+ngay khi nhận response) ở từng mức concurrency, với hỗn hợp độ dài clip cấu hình được,
+rồi in đường cong bão hòa: throughput so với latency ở mỗi mức. Dùng để chọn số worker
+(GOP_PREFORK_WORKERS, GOP_WORKERS) và kích thước pod theo số liệu.
+
+Server được chạy theo một trong ba cách:
+- mặc định: uvicorn trong chính process này (thread riêng), dùng `server.app`
+- --workers 1,2,4: với mỗi giá trị, khởi động `prefork.py` với số worker đó trên
+  --port rồi đo (process riêng, giống production)
+- --url: server đang chạy sẵn ở địa chỉ khác
+
+--fake-decoder thay bước decode (forward pass + CTC) bằng token giả, kèm thời gian ngủ
+--fake-rtf x thời lượng audio để mô phỏng model; các stage còn lại (upload, resample,
+target, segment, align, serialize) vẫn chạy thật. Dùng để tách chi phí network /
+framework khỏi chi phí model. Không áp dụng được với --url.
+
+Mỗi mức báo cáo: rps (request thành công / giây), audio_x (giây audio xử lý được mỗi
+giây), p50 / p95 / p99 latency, số request bị từ chối (503) và lỗi khác. Mức có
+throughput cao nhất được đánh dấu '*'. Request gửi `Cache-Control: no-cache` để result
+cache không che mất chi phí thật (bỏ bằng --cache).
+
+Ví dụ:
+    python benchmarks/bench_load.py --concurrency 1,2,4,8,16 --duration 20
+    python benchmarks/bench_load.py --workers 1,2,4 --mix 2:0.6,5:0.3,15:0.1 --output load.json
+    python benchmarks/bench_load.py --fake-decoder --fake-rtf 0.05 --concurrency 1,8,32,64
+    python benchmarks/bench_load.py --url http://10.0.0.5:5005 --concurrency 4,16
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from _common import ROOT, SAMPLE_SCRIPTS, percentile, print_table, synthetic_waveform
+
+# Phone dùng cho output của decoder giả
+FAKE_PHONES = ['h', 'ʌ', 'l', 'oʊ', 'w', 'ɝ', 'd', 'ð', 'ə', 'k', 'ɪ', 's']
+
+
+def install_fake_decoder(server, rtf: float = 0.0):
+    """
+    Thay decode của server bằng bản giả (không load model): khoảng 10 phone mỗi giây
+    audio, ngủ `rtf` x thời lượng audio để mô phỏng thời gian forward pass
+    """
+    decoder = server.scorer.ctc_decoder
+
+    def decode_speech(audio, model_name, target_sr=16000, sample_rate=None, vad='off', timings=None, **kwargs):
+        seconds = audio.shape[-1] / float(sample_rate or target_sr)
+        if rtf > 0:
+            time.sleep(seconds * rtf)
+        count = max(1, int(seconds * 10))
+        tokens = [('▁' if i % 4 == 0 and i else '') + FAKE_PHONES[i % len(FAKE_PHONES)] for i in range(count)]
+        spans = [(i * 5, i * 5 + 2) for i in range(count)]
+        return tokens, spans, None, None
+
+    def run_startup():
+        server.startup.mark_ready()
+        print(server.startup.summary())
+
+    decoder.decode_speech = decode_speech
+    server.run_startup = run_startup
+
+
+def wav_bytes(seconds: float, seed: int) -> bytes:
+    import soundfile as sf
+
+    buf = io.BytesIO()
+    sf.write(buf, synthetic_waveform(seconds, seed=seed).numpy(), 16000, format='WAV', subtype='PCM_16')
+    return buf.getvalue()
+
+
+def parse_mix(spec: str) -> List[Tuple[float, float]]:
+    """'2:0.6,5:0.3,15:0.1' -> [(giây, trọng số)]"""
+    mix = []
+    for part in spec.split(','):
+        seconds, _, weight = part.partition(':')
+        mix.append((float(seconds), float(weight or 1)))
+    return mix
+
+
+async def wait_ready(session, url: str, timeout: float, proc: Optional[subprocess.Popen] = None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            async with session.get(url + '/ready') as resp:
+                if resp.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("server did not become ready")
+
+
+async def run_level(session, url: str, clips, weights, concurrency: int, duration: float, ramp: float, use_cache: bool, seed: int) -> Dict:
+    """Chạy `concurrency` client closed-loop trong `duration` giây; bỏ qua request xong trong `ramp` giây đầu"""
+    import aiohttp
+
+    rng = random.Random(seed)
+    headers = {} if use_cache else {'Cache-Control': 'no-cache'}
+    start = time.perf_counter()
+    stop_at = start + duration
+    results = []  # (thời điểm xong, latency, status, giây audio)
+
+    async def client():
+        while time.perf_counter() < stop_at:
+            seconds, audio = rng.choices(clips, weights)[0]
+            form = aiohttp.FormData()
+            form.add_field('text', SAMPLE_SCRIPTS[rng.randrange(len(SAMPLE_SCRIPTS))])
+            form.add_field('audio', audio, filename='a.wav', content_type='audio/wav')
+            t = time.perf_counter()
+            try:
+                async with session.post(url + '/score', data=form, headers=headers) as resp:
+                    await resp.read()
+                    status = resp.status
+            except Exception:
+                status = -1
+            end = time.perf_counter()
+            results.append((end, end - t, status, seconds))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    window_start = start + ramp
+    measured = [r for r in results if r[0] >= window_start]
+    window = max(1e-9, max((r[0] for r in measured), default=window_start) - window_start)
+    ok = [r for r in measured if r[2] == 200]
+    latencies = [r[1] for r in ok]
+    return {
+        'concurrency': concurrency,
+        'requests': len(measured),
+        'rps': len(ok) / window,
+        'audio_x': sum(r[3] for r in ok) / window,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'rejected': sum(1 for r in measured if r[2] == 503),
+        'errors': sum(1 for r in measured if r[2] not in (200, 503)),
+    }
+
+
+async def sweep(url: str, args, clips, weights, proc: Optional[subprocess.Popen] = None) -> List[Dict]:
+    import aiohttp
+
+    levels = [int(c) for c in args.concurrency.split(',')]
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=max(levels))
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await wait_ready(session, url, args.startup_timeout, proc)
+        rows = []
+        for level in levels:
+            row = await run_level(session, url, clips, weights, level, args.duration, args.ramp, args.cache, args.seed + level)
+            rows.append(row)
+            print(f"concurrency {level}: {row['rps']:.2f} rps, p95 {row['p95_ms']:.0f} ms", file=sys.stderr)
+        return rows
+
+
+def start_in_process(port: int, fake_decoder: bool, fake_rtf: float):
+    """uvicorn chạy `server.app` trên thread nền của process này"""
+    import uvicorn
+
+    import server
+
+    if fake_decoder:
+        install_fake_decoder(server, fake_rtf)
+    config = uvicorn.Config(server.app, host='127.0.0.1', port=port, log_level='warning', lifespan='on')
+    uv = uvicorn.Server(config)
+    threading.Thread(target=uv.run, name='bench-uvicorn', daemon=True).start()
+    return uv
+
+
+def start_prefork(port: int, workers: int, fake_decoder: bool, fake_rtf: float) -> subprocess.Popen:
+    """prefork.py (qua `--serve` của script này để cài được decoder giả trước khi fork)"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port), '--serve-workers', str(workers)]
+    if fake_decoder:
+        cmd += ['--fake-decoder', '--fake-rtf', str(fake_rtf)]
+    return subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL)
+
+
+def serve(port: int, workers: int, fake_decoder: bool, fake_rtf: float):
+    import prefork
+    import server
+
+    if fake_decoder:
+        install_fake_decoder(server, fake_rtf)
+    prefork.serve('127.0.0.1', port, workers, log_level='warning')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=None, help='Server đang chạy sẵn (ví dụ http://127.0.0.1:5005)')
+    parser.add_argument('--workers', default=None, help='Số worker prefork cần đo, ví dụ 1,2,4 (mặc định: uvicorn trong process)')
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help='Các mức số client đồng thời')
+    parser.add_argument('--mix', default='2:0.6,5:0.3,15:0.1', help='Hỗn hợp độ dài clip: giây:trọng số,...')
+    parser.add_argument('--duration', type=float, default=15.0, help='Thời gian chạy mỗi mức (giây)')
+    parser.add_argument('--ramp', type=float, default=2.0, help='Bỏ qua request xong trong số giây đầu của mỗi mức')
+    parser.add_argument('--cache', action='store_true', help='Cho phép result cache (mặc định gửi no-cache)')
+    parser.add_argument('--fake-decoder', action='store_true', help='Thay forward pass + CTC decode bằng token giả')
+    parser.add_argument('--fake-rtf', type=float, default=0.0, help='Thời gian ngủ của decoder giả / thời lượng audio')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Timeout mỗi request (giây)')
+    parser.add_argument('--startup-timeout', type=float, default=600.0)
+    parser.add_argument('--output', default=None, help='Ghi kết quả ra file JSON')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--serve-workers', type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.serve_workers, args.fake_decoder, args.fake_rtf)
+        return
+    if args.url and args.fake_decoder:
+        parser.error("--fake-decoder needs a server started by this script (not --url)")
+
+    mix = parse_mix(args.mix)
+    clips = [(seconds, wav_bytes(seconds, args.seed + i)) for i, (seconds, _) in enumerate(mix)]
+    weights = [weight for _, weight in mix]
+
+    rows = []
+    if args.url:
+        rows = [{'workers': '-', **row} for row in asyncio.run(sweep(args.url.rstrip('/'), args, clips, weights))]
+    elif args.workers:
+        for workers in [int(w) for w in args.workers.split(',')]:
+            proc = start_prefork(args.port, workers, args.fake_decoder, args.fake_rtf)
+            try:
+                level_rows = asyncio.run(sweep(f"http://127.0.0.1:{args.port}", args, clips, weights, proc))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=60)
+            rows.extend({'workers': workers, **row} for row in level_rows)
+    else:
+        uv = start_in_process(args.port, args.fake_decoder, args.fake_rtf)
+        try:
+            rows = [{'workers': 'in-process', **row} for row in asyncio.run(sweep(f"http://127.0.0.1:{args.port}", args, clips, weights))]
+        finally:
+            uv.should_exit = True
+
+    # Đánh dấu mức có throughput cao nhất của mỗi cấu hình worker (điểm bão hòa)
+    for workers in dict.fromkeys(row['workers'] for row in rows):
+        group = [row for row in rows if row['workers'] == workers]
+        best = max(group, key=lambda row: row['rps'])
+        for row in group:
+            row['peak'] = '*' if row is best else ''
+
+    print(f"mix {args.mix}, {args.duration:.0f}s per level{', fake decoder' if args.fake_decoder else ''}")
+    print_table(rows, ['workers', 'concurrency', 'requests', 'rps', 'audio_x', 'p50_ms', 'p95_ms', 'p99_ms', 'rejected', 'errors', 'peak'])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'mix': args.mix, 'duration': args.duration, 'fake_decoder': args.fake_decoder,
+                       'fake_rtf': args.fake_rtf, 'levels': rows}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark latency / bộ nhớ theo độ dài audio
+============================================
+
+Phần 1 - một clip mỗi lần, so sánh forward cả clip (full) với chạy theo cửa sổ
+chồng lấn rồi ghép logits (chunked), cho các độ dài khác nhau:
+- latency_ms, rtf
+- peak_mb: mức tăng peak RSS trong lúc chạy (reset VmHWM qua /proc/self/clear_refs, chỉ Linux)
+- agree: tỉ lệ frame có argmax giống bản full (độ lệch do ghép cửa sổ)
+
+Phần 2 - tải hỗn hợp: một vài clip dài gửi cùng lúc với nhiều clip ngắn, so sánh
+latency của clip ngắn khi dùng một lane chung và khi chia lane theo độ dài.
+
+Ví dụ:
+    python benchmarks/bench_long_audio.py --durations 2,5,10,20,40,60 --chunk 20 --overlap 2
+    python benchmarks/bench_long_audio.py --model /models/wav2vec2-phoneme --long 2 --short 32
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from _common import DEFAULT_MODEL, percentile, print_table, read_status_kb, reset_peak_rss, synthetic_waveform
+from ctc_decoder import CTCDecoder
+
+
+def run_single(decoder: CTCDecoder, model: str, wav: torch.Tensor):
+    """Chạy một clip, trả về (logits, latency giây, peak tăng thêm MB hoặc None)"""
+    can_measure = reset_peak_rss()
+    before = read_status_kb('VmRSS') if can_measure else 0
+    start = time.perf_counter()
+    logits = decoder.infer_logits(wav, model)
+    elapsed = time.perf_counter() - start
+    peak = (read_status_kb('VmHWM') - before) / 1024.0 if can_measure else None
+    return logits, elapsed, peak
+
+
+def duration_sweep(decoder: CTCDecoder, model: str, durations, chunk: float, overlap: float):
+    rows = []
+    for seconds in durations:
+        wav = synthetic_waveform(seconds, seed=int(seconds * 10))
+        decoder.set_chunking(0)
+        full, full_s, full_peak = run_single(decoder, model, wav)
+        decoder.set_chunking(chunk, overlap)
+        chunked, chunk_s, chunk_peak = run_single(decoder, model, wav)
+        agree = (full.argmax(-1) == chunked.argmax(-1)).float().mean().item() if full.shape == chunked.shape else 0.0
+        for mode, elapsed, peak in (('full', full_s, full_peak), ('chunked', chunk_s, chunk_peak)):
+            rows.append({
+                'seconds': seconds, 'mode': mode, 'latency_ms': elapsed * 1000,
+                'rtf': elapsed / seconds, 'peak_mb': peak if peak is not None else '-',
+                'agree': agree if mode == 'chunked' else 1.0,
+            })
+    return rows
+
+
+def mixed_load(decoder: CTCDecoder, model: str, long_clips, short_clips, buckets, batch: int, wait_ms: float, concurrency: int):
+    """Gửi clip dài trước rồi các clip ngắn, trả về latency của từng nhóm"""
+    decoder.enable_batching(max_batch_size=batch, max_wait_ms=wait_ms, bucket_seconds=buckets)
+    latencies = {'long': [], 'short': []}
+
+    def one(item):
+        kind, wav = item
+        start = time.perf_counter()
+        decoder.infer_logits(wav, model)
+        latencies[kind].append(time.perf_counter() - start)
+
+    items = [('long', w) for w in long_clips] + [('short', w) for w in short_clips]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, items))
+    decoder.close_batchers()
+    return {
+        'lanes': ','.join(f"{b:g}" for b in buckets) or 'single',
+        'short_p50_ms': percentile(latencies['short'], 50) * 1000,
+        'short_p95_ms': percentile(latencies['short'], 95) * 1000,
+        'long_max_ms': max(latencies['long'], default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='HF model id hoặc thư mục model local')
+    parser.add_argument('--durations', default='2,5,10,20,40,60', help='Độ dài clip (giây)')
+    parser.add_argument('--chunk', type=float, default=20.0, help='Độ dài cửa sổ (giây)')
+    parser.add_argument('--overlap', type=float, default=2.0, help='Độ chồng lấn (giây)')
+    parser.add_argument('--long', type=int, default=2, help='Số clip dài trong tải hỗn hợp')
+    parser.add_argument('--long-seconds', type=float, default=45.0)
+    parser.add_argument('--short', type=int, default=24, help='Số clip ngắn trong tải hỗn hợp')
+    parser.add_argument('--short-seconds', type=float, default=2.5)
+    parser.add_argument('--buckets', default='4,10', help='Ngưỡng lane (giây) cho cấu hình chia lane')
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--wait-ms', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=0, help='torch.set_num_threads (0 = mặc định)')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    decoder = CTCDecoder()
+    decoder.forward_batch([synthetic_waveform(1.0)], args.model)  # warmup
+
+    durations = [float(d) for d in args.durations.split(',')]
+    print(f"model={args.model} chunk={args.chunk}s overlap={args.overlap}s torch_threads={torch.get_num_threads()}")
+    print_table(duration_sweep(decoder, args.model, durations, args.chunk, args.overlap),
+                ['seconds', 'mode', 'latency_ms', 'rtf', 'peak_mb', 'agree'])
+
+    decoder.set_chunking(args.chunk, args.overlap)
+    long_clips = [synthetic_waveform(args.long_seconds, seed=100 + i) for i in range(args.long)]
+    short_clips = [synthetic_waveform(args.short_seconds, seed=200 + i) for i in range(args.short)]
+    buckets = [float(b) for b in args.buckets.split(',') if b.strip()]
+    rows = [
+        mixed_load(decoder, args.model, long_clips, short_clips, lanes, args.batch, args.wait_ms, args.concurrency)
+        for lanes in ([], buckets)
+    ]
+    print()
+    print(f"mixed load: {args.long} x {args.long_seconds}s + {args.short} x {args.short_seconds}s")
+    print_table(rows, ['lanes', 'short_p50_ms', 'short_p95_ms', 'long_max_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark bộ nhớ của prefork server
+===================================
+
+Khởi động `prefork.py` với 1, 2, 4, 8 worker, gửi vài request chấm điểm để các worker
+chạy forward pass thật, rồi đọc /proc/<pid>/smaps_rollup của process cha và từng worker:
+- rss_mb: RSS trung bình mỗi worker (tính cả các page dùng chung với process khác)
+- pss_mb: PSS trung bình mỗi worker (page dùng chung được chia đều cho các process)
+- shared_mb: phần RSS của worker là page dùng chung
+- total_pss_mb: tổng PSS của process cha + mọi worker = bộ nhớ thực sự bị chiếm
+- no_share_mb: ước lượng nếu mỗi worker tự load model (N x RSS của worker khi chạy 1 worker;
+  cần có 1 trong --workers và đứng đầu)
+
+Chỉ chạy trên Linux (cần /proc).
+
+Ví dụ:
+    GOP_MODEL_DIR=data/model python benchmarks/bench_memory.py --workers 1,2,4,8
+"""
+
+import argparse
+import io
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+from _common import ROOT, print_table, synthetic_waveform
+
+
+def read_smaps(pid: int) -> dict:
+    """RSS / PSS / shared (kB) của một process từ smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    shared = values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)
+    return {'rss': values.get('Rss', 0), 'pss': values.get('Pss', 0), 'shared': shared}
+
+
+def child_pids(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wav_bytes(seconds: float) -> bytes:
+    import torchaudio
+
+    buf = io.BytesIO()
+    torchaudio.save(buf, synthetic_waveform(seconds).unsqueeze(0), 16000, format='wav')
+    return buf.getvalue()
+
+
+def post_score(port: int, audio: bytes, text: str = "the quick brown fox"):
+    """Gửi một request multipart tới /score (chỉ dùng thư viện chuẩn)"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"text\"\r\n\r\n{text}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"a.wav\"\r\n"
+        f"Content-Type: audio/wav\r\n\r\n"
+    ).encode() + audio + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/score", data=body,
+                                 headers={'Content-Type': f"multipart/form-data; boundary={boundary}"})
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        resp.read()
+
+
+def wait_ready(port: int, proc: subprocess.Popen, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("server did not become ready")
+
+
+def measure(workers: int, port: int, requests: int, audio: bytes, timeout: float) -> dict:
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'prefork.py'), '--workers', str(workers),
+         '--port', str(port), '--host', '127.0.0.1', '--log-level', 'warning'],
+        cwd=ROOT, stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port, proc, timeout)
+        deadline = time.time() + timeout
+        while len(child_pids(proc.pid)) < workers and time.time() < deadline:
+            time.sleep(0.2)
+        # Mỗi worker (theo round-robin của kernel) nhận vài request để chạy forward pass thật
+        for _ in range(requests * workers):
+            post_score(port, audio)
+
+        parent = read_smaps(proc.pid)
+        children = [read_smaps(pid) for pid in child_pids(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    n = max(1, len(children))
+    mb = 1024.0
+    return {
+        'workers': len(children),
+        'parent_rss_mb': parent['rss'] / mb,
+        'rss_mb': sum(c['rss'] for c in children) / n / mb,
+        'pss_mb': sum(c['pss'] for c in children) / n / mb,
+        'shared_mb': sum(c['shared'] for c in children) / n / mb,
+        'total_pss_mb': (parent['pss'] + sum(c['pss'] for c in children)) / mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--requests', type=int, default=3, help='Số request mỗi worker trước khi đo')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Độ dài audio của mỗi request')
+    parser.add_argument('--timeout', type=float, default=600.0)
+    args = parser.parse_args()
+
+    audio = wav_bytes(args.seconds)
+    rows, single_rss = [], None
+    for workers in [int(w) for w in args.workers.split(',')]:
+        row = measure(workers, args.port, args.requests, audio, args.timeout)
+        if single_rss is None:
+            single_rss = row['rss_mb'] if workers == 1 else None
+        if single_rss is not None:
+            row['no_share_mb'] = single_rss * workers
+        rows.append(row)
+        print(f"measured {workers} workers", file=sys.stderr)
+
+    print_table(rows, ['workers', 'parent_rss_mb', 'rss_mb', 'pss_mb', 'shared_mb', 'total_pss_mb', 'no_share_mb'])
+
+
+if __name__ == '__main__':
+    main()
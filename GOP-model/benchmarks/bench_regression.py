@@ -0,0 +1,218 @@
+"""
+Benchmark hồi quy cho pipeline chấm điểm
+========================================
+
+Chạy một corpus fixture qua từng stage riêng lẻ và qua toàn bộ pipeline:
+- targets: lexicon / G2P cho script (không qua target cache)
+- tokenize: PhonemeMapper.tokenize_ipa_ids + normalize_ids trên output của model
+- forward: forward pass của model (logits)
+- ctc_decode: greedy CTC decode từ logits
+- align: PronunciationAligner.align_ids_batch cho các cặp (target, predicted) theo từ
+- score_tokens: toàn bộ các stage sau decode
+- end_to_end: PronunciationScorer.score_pronunciation từ waveform
+
+Mỗi stage báo cáo: throughput (item/giây), p50 / p95 / p99 latency (ms), rtf (với stage
+chạy trên audio) và peak RSS (MB, Linux). Kết quả được lưu JSON (--output); với
+--baseline, so sánh với kết quả đã lưu và thoát với mã 1 nếu có stage chậm hơn / tốn bộ
+nhớ hơn quá --tolerance (tương đối; chênh lệch latency dưới --min-delta-ms được bỏ qua
+để tránh nhiễu với các stage chỉ vài chục µs).
+
+Fixture là thư mục các cặp `name.wav` + `name.txt` (tạo bằng --make-fixtures, không cần
+TTS). Không có fixture thì dùng audio tổng hợp sinh trong bộ nhớ.
+
+Ví dụ:
+    python benchmarks/bench_regression.py --make-fixtures fixtures/ --clips 24
+    python benchmarks/bench_regression.py --fixtures fixtures/ --output baseline.json
+    python benchmarks/bench_regression.py --fixtures fixtures/ --baseline baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import torch
+
+from _common import DEFAULT_MODEL, load_fixtures, percentile, print_table, read_status_kb, reset_peak_rss, write_fixtures
+from scorer import PronunciationScorer
+
+STAGES = ('targets', 'tokenize', 'forward', 'ctc_decode', 'align', 'score_tokens', 'end_to_end')
+
+# (tên chỉ số, chiều "tốt hơn") dùng khi so với baseline
+COMPARED = (('p50_ms', 'lower'), ('p95_ms', 'lower'), ('throughput', 'higher'), ('peak_rss_mb', 'lower'))
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS (MB) từ lần reset gần nhất (VmHWM), hoặc của cả process nếu không reset được"""
+    peak_kb = read_status_kb('VmHWM')
+    if peak_kb:
+        return peak_kb / 1024.0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024.0 * 1024.0) if sys.platform == 'darwin' else maxrss / 1024.0
+
+
+def measure(name: str, items: Sequence, run: Callable, repeat: int, warmup: int, audio_seconds: Optional[float] = None) -> Dict:
+    """
+    Chạy `run(item)` cho mọi item, `warmup` lượt bỏ qua rồi `repeat` lượt đo
+
+    Args:
+        audio_seconds: Tổng thời lượng audio của `items` (để tính rtf), None nếu stage
+            không chạy trên audio
+    """
+    for _ in range(warmup):
+        for item in items:
+            run(item)
+    reset_peak_rss()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            t = time.perf_counter()
+            run(item)
+            latencies.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    row = {
+        'stage': name,
+        'items': len(latencies),
+        'throughput': len(latencies) / total if total > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if audio_seconds:
+        row['rtf'] = sum(latencies) / (audio_seconds * repeat)
+    return row
+
+
+def run_stages(args, fixtures) -> List[Dict]:
+    scorer = PronunciationScorer()
+    decoder = scorer.ctc_decoder
+    mapper = scorer.phoneme_mapper
+    model = args.model
+    audio_seconds = sum(wav.shape[-1] for _, _, wav in fixtures) / 16000
+    wavs = [wav for _, _, wav in fixtures]
+
+    # Input của các stage sau được tính trước một lần từ output thật của model
+    logits = [decoder.infer_logits(wav, model) for wav in wavs]
+    tokens = [decoder.decode_logits(x, model) for x in logits]
+    token_strings = [' '.join(t.replace('▁', ' ').replace('|', ' ').strip() for t in toks) for toks in tokens]
+    targets = [scorer.get_script_target_ids(script) for _, script, _ in fixtures]
+    pairs = []
+    for toks, string, (words, _, target_ids) in zip(tokens, token_strings, targets):
+        chunks = scorer.segment_predicted_ids_by_words(toks, mapper.tokenize_ipa_ids(string), len(words), policy='alignment')
+        pairs.append([(t, mapper.normalize_ids(p)) for t, p in zip(target_ids, chunks)])
+
+    runners = {
+        'targets': (lambda c: scorer._get_target_pronunciations(targets[c][0]), None),
+        'tokenize': (lambda c: mapper.normalize_ids(mapper.tokenize_ipa_ids(token_strings[c])), None),
+        'forward': (lambda c: decoder.infer_logits(wavs[c], model), audio_seconds),
+        'ctc_decode': (lambda c: decoder.decode_logits_with_frames(logits[c], model), audio_seconds),
+        'align': (lambda c: scorer.aligner.align_ids_batch(pairs[c]), None),
+        'score_tokens': (lambda c: scorer.score_tokens(fixtures[c][1], tokens[c], model), None),
+        'end_to_end': (lambda c: scorer.score_pronunciation(fixtures[c][1], wavs[c], model_name=model), audio_seconds),
+    }
+    clips = list(range(len(fixtures)))
+    rows = []
+    for stage in args.stages:
+        run, seconds = runners[stage]
+        rows.append(measure(stage, clips, run, args.repeat, args.warmup, seconds))
+    return rows
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[Dict]:
+    """Các chỉ số vượt ngưỡng so với baseline (list rỗng = không có hồi quy)"""
+    base_rows = {row['stage']: row for row in baseline['stages']}
+    regressions = []
+    for row in results['stages']:
+        base = base_rows.get(row['stage'])
+        if base is None:
+            continue
+        for metric, better in COMPARED:
+            old, new = base.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if better == 'lower' else -change > tolerance
+            if worse and metric.endswith('_ms') and new - old < min_delta_ms:
+                worse = False
+            if worse:
+                regressions.append({'stage': row['stage'], 'metric': metric, 'baseline': old, 'current': new, 'change_pct': change * 100})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='HF model id hoặc thư mục model local')
+    parser.add_argument('--fixtures', default=None, help='Thư mục chứa các cặp name.wav + name.txt')
+    parser.add_argument('--make-fixtures', default=None, metavar='DIR', help='Ghi --clips clip tổng hợp vào DIR rồi thoát')
+    parser.add_argument('--clips', type=int, default=12, help='Số clip tổng hợp khi không có fixture')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f'Các stage cần đo ({",".join(STAGES)})')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lượt đo qua toàn bộ corpus')
+    parser.add_argument('--warmup', type=int, default=1, help='Số lượt chạy bỏ qua trước khi đo')
+    parser.add_argument('--threads', type=int, default=0, help='torch.set_num_threads (0 = mặc định)')
+    parser.add_argument('--output', default=None, help='Ghi kết quả ra file JSON')
+    parser.add_argument('--baseline', default=None, help='File JSON kết quả trước đó để so sánh')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Mức chậm đi / tăng bộ nhớ tối đa (tương đối) trước khi báo hồi quy')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help='Bỏ qua chênh lệch latency nhỏ hơn mức này')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        count = write_fixtures(args.make_fixtures, args.clips, args.seed)
+        print(f"Wrote {count} fixtures to {args.make_fixtures}")
+        return
+    args.stages = [s for s in args.stages.split(',') if s]
+    unknown = [s for s in args.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages {unknown}; choose from {list(STAGES)}")
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    fixtures = load_fixtures(args.fixtures, args.clips, args.seed)
+    results = {
+        'meta': {
+            'model': args.model,
+            'fixtures': args.fixtures or f"synthetic:{args.clips}:{args.seed}",
+            'clips': len(fixtures),
+            'audio_seconds': sum(wav.shape[-1] for _, _, wav in fixtures) / 16000,
+            'repeat': args.repeat,
+            'threads': torch.get_num_threads(),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'stages': run_stages(args, fixtures),
+    }
+
+    meta = results['meta']
+    print(f"{meta['clips']} clips ({meta['audio_seconds']:.1f}s audio), model {args.model}, {meta['threads']} threads")
+    print_table(results['stages'], ['stage', 'items', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'rtf', 'peak_rss_mb'])
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for key in ('model', 'fixtures', 'threads'):
+            if baseline['meta'].get(key) != meta[key]:
+                print(f"Warning: baseline {key} {baseline['meta'].get(key)!r} differs from current {meta[key]!r}")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            print_table(regressions, ['stage', 'metric', 'baseline', 'current', 'change_pct'])
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark segmentation policy
+=============================
+
+Chạy model một lần cho mỗi clip, rồi chấm lại cùng logits với từng segmentation policy
+('alignment', 'marker', 'forced') để so sánh chi phí và kết quả. Báo cáo:
+- segment_p50_ms / segment_p95_ms: thời gian chia phone theo từ (với 'forced' gồm cả
+  bước forced alignment)
+- post_p50_ms: tổng thời gian sau decode (tokenize -> score)
+- fallback: số clip 'forced' phải quay về 'alignment' (audio quá ngắn so với script)
+- per_word_diff: tỉ lệ phone dự đoán được gán cho từ khác so với 'forced'
+- score: overall_score trung bình
+
+Ví dụ:
+    python benchmarks/bench_segmentation.py --fixtures fixtures/ --repeat 5
+    python benchmarks/bench_segmentation.py --model /models/wav2vec2-phoneme --clips 12
+"""
+
+import argparse
+
+import torch
+
+from _common import DEFAULT_MODEL, load_fixtures, percentile, print_table
+from scorer import SEGMENTATION_POLICIES, PronunciationScorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='HF model id hoặc thư mục model local')
+    parser.add_argument('--fixtures', default=None, help='Thư mục chứa các cặp name.wav + name.txt')
+    parser.add_argument('--clips', type=int, default=12, help='Số clip tổng hợp khi không có fixture')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần chấm mỗi clip để đo latency')
+    parser.add_argument('--threads', type=int, default=0, help='torch.set_num_threads (0 = mặc định)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    fixtures = load_fixtures(args.fixtures, args.clips, args.seed)
+    scorer = PronunciationScorer()
+    decoder = scorer.ctc_decoder
+    decoded = []
+    for _, _, wav in fixtures:
+        logits = decoder.infer_logits(wav, args.model)
+        tokens, spans = decoder.decode_logits_with_frames(logits, args.model)
+        decoded.append((logits, tokens, spans))
+    clock = scorer._frame_clock(args.model, None)
+
+    chunks, rows = {}, []
+    for policy in SEGMENTATION_POLICIES:
+        segment, post, scores, fallback, policy_chunks = [], [], [], 0, []
+        for (_, script, _), (logits, tokens, spans) in zip(fixtures, decoded):
+            for _ in range(args.repeat):
+                timings = {}
+                result = scorer.score_tokens(
+                    script, tokens, args.model, segmentation_policy=policy, timings=timings,
+                    logits=logits, token_spans=spans, frame_to_seconds=clock,
+                )
+                segment.append(timings['segment'] + timings.get('force_align', 0.0))
+                post.append(sum(timings.values()))
+            scores.append(result.overall_score)
+            fallback += policy == 'forced' and result.metadata['segmentation'] != 'forced'
+            policy_chunks.append([(w.predicted_ipa or '').split() for w in result.words])
+        chunks[policy] = policy_chunks
+        rows.append({
+            'policy': policy,
+            'segment_p50_ms': percentile(segment, 50),
+            'segment_p95_ms': percentile(segment, 95),
+            'post_p50_ms': percentile(post, 50),
+            'fallback': fallback if policy == 'forced' else '',
+            'score': sum(scores) / len(scores),
+        })
+
+    # Phone được gán cho từ khác nhau giữa policy và 'forced' (so theo vị trí trong chuỗi phẳng)
+    for row in rows:
+        moved = total = 0
+        for ours, forced in zip(chunks[row['policy']], chunks['forced']):
+            ours_words = [i for i, ch in enumerate(ours) for _ in ch]
+            forced_words = [i for i, ch in enumerate(forced) for _ in ch]
+            moved += sum(a != b for a, b in zip(ours_words, forced_words))
+            total += max(len(ours_words), len(forced_words))
+        row['per_word_diff'] = moved / max(1, total)
+
+    print(f"{len(fixtures)} clips, model {args.model}")
+    print_table(rows, ['policy', 'segment_p50_ms', 'segment_p95_ms', 'post_p50_ms', 'fallback', 'per_word_diff', 'score'])
+
+
+if __name__ == '__main__':
+    main()
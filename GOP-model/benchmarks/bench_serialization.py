@@ -0,0 +1,158 @@
+"""
+Benchmark serialize kết quả chấm điểm
+=====================================
+
+Dựng PronunciationResult lớn (đoạn văn nhiều từ, tỉ lệ lỗi cao) từ output decoder tổng
+hợp (không cần model), rồi so sánh các cách tạo body JSON của response:
+- to_json+json: dict của to_json qua json thư viện chuẩn (cách JSONResponse render)
+- to_json+orjson: dict của to_json qua orjson (nếu đã cài)
+- encode_result: ghi thẳng từ dataclass trong một lượt
+- to_json_bytes: cách server dùng (orjson nếu có, ngược lại encode_result)
+
+Trước khi đo, kiểm tra mọi cách cho cùng nội dung JSON. Bảng thứ hai so sánh bộ nhớ
+giữ bởi một kết quả khi dùng dataclass có __slots__ và dataclass thường (__dict__).
+
+Ví dụ:
+    python benchmarks/bench_serialization.py --words 2000 --error-rate 0.3
+    python benchmarks/bench_serialization.py --words 500 --timestamps --repeat 50
+"""
+
+import argparse
+import dataclasses
+import json
+import random
+import time
+import tracemalloc
+
+from _common import SAMPLE_SCRIPTS, percentile, print_table
+from data_structures import PhonemeError, PronunciationResult, WordScore
+from scorer import PronunciationScorer
+from serialization import HAS_ORJSON, dumps, encode_result
+
+if HAS_ORJSON:
+    import orjson
+
+
+def make_result(scorer: PronunciationScorer, n_words: int, error_rate: float, timestamps: bool, seed: int) -> PronunciationResult:
+    """Chấm một đoạn văn `n_words` từ với output decoder sinh từ target phone + lỗi ngẫu nhiên"""
+    rng = random.Random(seed)
+    vocabulary = ' '.join(SAMPLE_SCRIPTS).split()
+    script = ' '.join(rng.choice(vocabulary) for _ in range(n_words))
+    _, target_per_word = scorer.get_script_targets(script)
+    inventory = list(scorer.phoneme_mapper.ipa_phones)
+
+    tokens = []
+    for phones in target_per_word:
+        spoken = []
+        for phone in phones:
+            r = rng.random()
+            if r < error_rate / 3:
+                continue  # deletion
+            spoken.append(rng.choice(inventory) if r < error_rate else phone)
+            if rng.random() < error_rate / 4:
+                spoken.append(rng.choice(inventory))  # insertion
+        tokens.append('▁' + ''.join(spoken))
+    result = scorer.score_tokens(script, tokens, 'synthetic', segmentation_policy='marker')
+
+    if timestamps:
+        t = 0.0
+        for word in result.words:
+            phones = word.target_ipa.split()
+            word.start, word.end = t, t + 0.08 * len(phones)
+            word.phones = [(p, t + 0.08 * i, t + 0.08 * (i + 1)) for i, p in enumerate(phones)]
+            t = word.end + 0.05
+    result.metadata['logits_id'] = 'f' * 32
+    return result
+
+
+def stdlib_dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def plain_classes():
+    """PhonemeError / WordScore / PronunciationResult dạng dataclass thường (có __dict__)"""
+    return tuple(
+        dataclasses.make_dataclass('Plain' + cls.__name__, [(f.name, f.type) for f in dataclasses.fields(cls)])
+        for cls in (PhonemeError, WordScore, PronunciationResult)
+    )
+
+
+def rebuild(result: PronunciationResult, error_cls, word_cls, result_cls):
+    """Dựng lại kết quả bằng các class cho trước (chuỗi dùng chung, chỉ tạo object mới)"""
+    words = [
+        word_cls(w.word, w.target_ipa, w.predicted_ipa, w.accuracy, w.label,
+                 [error_cls(e.type, e.position, e.expected, e.actual, e.severity) for e in w.errors],
+                 w.start, w.end, w.phones)
+        for w in result.words
+    ]
+    return result_cls(
+        result.overall_score, result.accuracy, words, [e for w in words for e in w.errors],
+        result.target_ipa, result.predicted_ipa, result.metadata,
+    )
+
+
+def retained_kb(build) -> float:
+    """Bộ nhớ (KB) còn được giữ bởi object do `build()` tạo ra"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    value = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return (after - before) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=1000, help='Số từ của đoạn văn')
+    parser.add_argument('--error-rate', type=float, default=0.3, help='Tỉ lệ phone bị thay thế / bỏ sót')
+    parser.add_argument('--timestamps', action='store_true', help="Thêm start/end và phones như segmentation 'forced'")
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    scorer = PronunciationScorer()
+    result = make_result(scorer, args.words, args.error_rate, args.timestamps, args.seed)
+    n_errors = sum(len(w.errors) for w in result.words)
+
+    impls = {'to_json+json': lambda r: stdlib_dumps(scorer.to_json(r))}
+    if HAS_ORJSON:
+        impls['to_json+orjson'] = lambda r: orjson.dumps(scorer.to_json(r))
+    impls['encode_result'] = encode_result
+    impls['to_json_bytes'] = scorer.to_json_bytes
+
+    # Mọi cách phải cho cùng nội dung; encode_result phải giống từng byte với json thư viện chuẩn
+    reference = stdlib_dumps(scorer.to_json(result))
+    assert encode_result(result) == reference
+    for fn in impls.values():
+        assert json.loads(fn(result)) == json.loads(reference)
+    assert dumps(scorer.to_json(result)) == impls['to_json_bytes'](result)
+
+    rows = []
+    for name, fn in impls.items():
+        fn(result)
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = fn(result)
+            latencies.append(time.perf_counter() - start)
+        p50 = percentile(latencies, 50)
+        rows.append({
+            'impl': name, 'p50_ms': p50 * 1000, 'p95_ms': percentile(latencies, 95) * 1000,
+            'body_kb': len(body) / 1024, 'mb_per_s': len(body) / p50 / 1e6,
+        })
+
+    plain = plain_classes()
+    memory = [
+        {'objects': '__slots__', 'result_kb': retained_kb(lambda: rebuild(result, PhonemeError, WordScore, PronunciationResult))},
+        {'objects': '__dict__', 'result_kb': retained_kb(lambda: rebuild(result, *plain))},
+    ]
+
+    print(f"{len(result.words)} words, {n_errors} errors, orjson {'yes' if HAS_ORJSON else 'no'}")
+    print_table(rows, ['impl', 'p50_ms', 'p95_ms', 'body_kb', 'mb_per_s'])
+    print()
+    print_table(memory, ['objects', 'result_kb'])
+
+
+if __name__ == '__main__':
+    main()
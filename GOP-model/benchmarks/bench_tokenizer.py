@@ -0,0 +1,130 @@
+"""
+Microbenchmark PhonemeMapper.tokenize_ipa
+=========================================
+
+So sánh tokenizer đã biên dịch (regex + một lượt merge/equiv) với bản cài đặt cũ
+(sắp xếp phone list mỗi lần gọi, `startswith` tại từng vị trí, hai lượt merge/equiv),
+và với `tokenize_ipa_ids` (cùng thuật toán, trả về id phone như pipeline dùng).
+Trước khi đo, kiểm tra hai bản cho kết quả giống hệt nhau trên toàn bộ input sinh ra.
+
+Input mô phỏng output của CTC decoder: chuỗi ký tự IPA theo từng từ (có hoặc không
+có dấu ranh giới '▁'), thỉnh thoảng lẫn ký tự lạ và các cặp cần merge/equiv.
+
+Ví dụ:
+    python benchmarks/bench_tokenizer.py --utterances 2000
+"""
+
+import argparse
+import random
+import time
+
+from _common import print_table
+from phoneme_mapper import PhonemeMapper
+
+
+def legacy_tokenize_ipa(mapper: PhonemeMapper, text: str):
+    """Bản cài đặt tokenize_ipa trước khi biên dịch sẵn (giữ lại để so sánh)"""
+    if not text:
+        return []
+    phones = []
+    phones_by_len = sorted(mapper.ipa_phones, key=len, reverse=True)
+    for chunk in text.strip().split():
+        i = 0
+        while i < len(chunk):
+            matched = None
+            for phone in phones_by_len:
+                if chunk.startswith(phone, i):
+                    matched = phone
+                    break
+            if matched:
+                phones.append(matched)
+                i += len(matched)
+            else:
+                phones.append(chunk[i])
+                i += 1
+
+    merged = []
+    i = 0
+    while i < len(phones):
+        if i + 1 < len(phones):
+            pair = (phones[i], phones[i + 1])
+            if pair in mapper.merge_pairs:
+                merged.append(mapper.merge_pairs[pair])
+                i += 2
+                continue
+            rev_pair = (phones[i + 1], phones[i])
+            if rev_pair in mapper.merge_pairs:
+                merged.append(mapper.merge_pairs[rev_pair])
+                i += 2
+                continue
+        merged.append(phones[i])
+        i += 1
+
+    collapsed = []
+    i = 0
+    while i < len(merged):
+        if i + 1 < len(merged):
+            pair = (merged[i], merged[i + 1])
+            if pair in mapper.equiv_pairs:
+                collapsed.append(mapper.equiv_pairs[pair])
+                i += 2
+                continue
+            rev = (merged[i + 1], merged[i])
+            if rev in mapper.equiv_pairs:
+                collapsed.append(mapper.equiv_pairs[rev])
+                i += 2
+                continue
+        collapsed.append(merged[i])
+        i += 1
+    return collapsed
+
+
+def make_utterances(mapper: PhonemeMapper, count: int, seed: int):
+    """Sinh chuỗi giống output decoder: 5-25 từ, mỗi từ 1-8 phone"""
+    rng = random.Random(seed)
+    pieces = list(mapper.ipa_phones) + [a + b for a, b in mapper.merge_pairs] + ['a', 'ɹ', 'ɡ', 'ː', 'ʔ', 'x']
+    utterances = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(5, 25)):
+            word = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 8)))
+            words.append(('▁' if rng.random() < 0.5 else '') + word)
+        sep = ' ' if rng.random() < 0.7 else '  '
+        utterances.append(sep.join(words).replace('▁', '') if rng.random() < 0.5 else sep.join(words))
+    return utterances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utterances', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mapper = PhonemeMapper('.')
+    utterances = make_utterances(mapper, args.utterances, args.seed)
+    # Các token đơn lẻ như khi segment_predicted_by_words gọi tokenize_ipa cho từng token
+    tokens = [tok.replace('▁', '') for u in utterances for tok in u.split()]
+
+    mismatches = [u for u in utterances + tokens if legacy_tokenize_ipa(mapper, u) != mapper.tokenize_ipa(u)]
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} input cho kết quả khác nhau, ví dụ: {mismatches[0]!r}")
+
+    rows = []
+    for label, inputs in (('utterance', utterances), ('per-token', tokens)):
+        impls = (('legacy', lambda t: legacy_tokenize_ipa(mapper, t)), ('compiled', mapper.tokenize_ipa), ('ids', mapper.tokenize_ipa_ids))
+        for name, fn in impls:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for text in inputs:
+                    fn(text)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            rows.append({'input': label, 'impl': name, 'calls': len(inputs),
+                         'total_ms': elapsed * 1000, 'per_call_us': elapsed * 1e6 / len(inputs)})
+
+    print(f"equivalent on {len(utterances) + len(tokens)} inputs")
+    print_table(rows, ['input', 'impl', 'calls', 'total_ms', 'per_call_us'])
+
+
+if __name__ == '__main__':
+    main()
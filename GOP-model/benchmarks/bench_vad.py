@@ -0,0 +1,101 @@
+"""
+Benchmark VAD trước CTC inference
+=================================
+
+Chạy tập fixture qua model với từng chế độ VAD (off / trim / pauses) và báo cáo:
+- audio_s / kept_s / saved: tổng thời lượng audio, phần được đưa vào model, tỉ lệ bỏ được
+- vad_ms: tổng thời gian chạy VAD
+- model_ms / speedup: tổng thời gian forward + decode và mức tăng tốc so với 'off'
+- per: phone error rate của chuỗi phone so với 'off' (độ lệch do cắt audio)
+
+Fixture là thư mục các cặp `name.wav` + `name.txt`. Không có fixture thì dùng clip
+tổng hợp được chèn khoảng lặng ở đầu, cuối và giữa câu (mô phỏng bản ghi của học viên).
+
+Ví dụ:
+    python benchmarks/bench_vad.py --fixtures fixtures/
+    python benchmarks/bench_vad.py --model /models/wav2vec2-phoneme --clips 24 --lead 1.5 --tail 2.0
+"""
+
+import argparse
+import random
+import time
+
+import torch
+
+from _common import DEFAULT_MODEL, edit_distance, load_fixtures, print_table
+from ctc_decoder import CTCDecoder
+from vad import VAD_MODES, detect_speech
+
+
+def with_silence(wav: torch.Tensor, lead: float, tail: float, pause: float, rng: random.Random, sr: int = 16000):
+    """Chèn khoảng lặng (nhiễu nền nhỏ) ở đầu, cuối và một khoảng nghỉ ở giữa"""
+    def silence(seconds):
+        return torch.randn(int(seconds * sr)) * 0.002
+
+    cut = int(wav.shape[-1] * rng.uniform(0.3, 0.7))
+    return torch.cat([
+        silence(lead * rng.uniform(0.5, 1.5)), wav[:cut],
+        silence(pause * rng.uniform(0.5, 1.5)), wav[cut:],
+        silence(tail * rng.uniform(0.5, 1.5)),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='HF model id hoặc thư mục model local')
+    parser.add_argument('--fixtures', default=None, help='Thư mục chứa các cặp name.wav + name.txt')
+    parser.add_argument('--clips', type=int, default=16, help='Số clip tổng hợp khi không có fixture')
+    parser.add_argument('--lead', type=float, default=1.0, help='Khoảng lặng đầu (giây, clip tổng hợp)')
+    parser.add_argument('--tail', type=float, default=1.5, help='Khoảng lặng cuối (giây, clip tổng hợp)')
+    parser.add_argument('--pause', type=float, default=1.2, help='Khoảng nghỉ giữa câu (giây, clip tổng hợp)')
+    parser.add_argument('--threads', type=int, default=0, help='torch.set_num_threads (0 = mặc định)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    rng = random.Random(args.seed)
+    clips = [wav for _, _, wav in load_fixtures(args.fixtures, args.clips, args.seed)]
+    if not args.fixtures:
+        clips = [with_silence(wav, args.lead, args.tail, args.pause, rng) for wav in clips]
+
+    decoder = CTCDecoder()
+    decoder.forward_batch([clips[0]], args.model)  # warmup
+
+    rows, reference = [], None
+    audio_s = sum(w.shape[-1] for w in clips) / 16000
+    for mode in VAD_MODES:
+        vad_s = model_s = 0.0
+        kept, phones = 0, []
+        for wav in clips:
+            t0 = time.perf_counter()
+            regions = detect_speech(wav, 16000, mode)
+            t1 = time.perf_counter()
+            logits = decoder.infer_logits(regions.waveform, args.model)
+            tokens = decoder.decode_logits(logits, args.model)
+            t2 = time.perf_counter()
+            vad_s += t1 - t0
+            model_s += t2 - t1
+            kept += regions.kept_samples
+            phones.append(tokens)
+        if reference is None:
+            reference = (model_s, phones)
+        errors = sum(edit_distance(r, p) for r, p in zip(reference[1], phones))
+        rows.append({
+            'mode': mode,
+            'audio_s': audio_s,
+            'kept_s': kept / 16000,
+            'saved': 1.0 - kept / 16000 / audio_s,
+            'vad_ms': vad_s * 1000,
+            'model_ms': model_s * 1000,
+            'speedup': reference[0] / (vad_s + model_s),
+            'per': errors / max(1, sum(len(r) for r in reference[1])),
+        })
+
+    print(f"{len(clips)} clips, model {args.model}, {torch.get_num_threads()} threads")
+    print_table(rows, ['mode', 'audio_s', 'kept_s', 'saved', 'vad_ms', 'model_ms', 'speedup', 'per'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""
+Caching Module
+==============
+
+Module cache dùng chung cho pipeline chấm điểm:
+- LRU cache có giới hạn số phần tử (và TTL tùy chọn), an toàn khi dùng từ nhiều thread
+- Cache trên đĩa (mỗi key một file) có TTL và giới hạn dung lượng
+- Cache nhiều tầng: bộ nhớ trước, đĩa sau (hit ở đĩa được đưa lên bộ nhớ)
+- Key theo nội dung: hash nhanh (xxhash) của audio bytes + script + tham số
+- Đếm hit / miss / eviction để theo dõi hiệu quả cache
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+try:
+    import xxhash
+except ImportError:  # xxhash là tùy chọn, fallback sang blake2b của hashlib
+    xxhash = None
+
+_MISSING = object()
+
+# Key của content_key (128-bit) và uuid4().hex: 32 ký tự hex thường
+_KEY_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def is_cache_key(key: Any) -> bool:
+    """`key` có đúng dạng key của content_key (32 ký tự hex thường) không"""
+    return isinstance(key, str) and _KEY_RE.fullmatch(key) is not None
+
+
+def content_key(*parts: Union[bytes, str, int, float, None]) -> str:
+    """
+    Hash nội dung của nhiều phần (audio bytes, script, tên model, tham số) thành key hex
+
+    Mỗi phần được prefix bằng độ dài nên ('ab', 'c') và ('a', 'bc') cho key khác nhau.
+    """
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if part is None:
+            data = b''
+        elif isinstance(part, (bytes, bytearray, memoryview)):
+            data = bytes(part) if not isinstance(part, bytes) else part
+        else:
+            data = str(part).encode('utf-8')
+        h.update(len(data).to_bytes(8, 'little'))
+        h.update(data)
+    return h.hexdigest()
+
+
+class LRUCache:
+    """
+    LRU cache thread-safe với giới hạn số phần tử
+
+    Phần tử ít được dùng gần đây nhất sẽ bị loại khi cache đầy.
+    `maxsize <= 0` tắt cache (mọi lần get đều là miss, put không lưu gì).
+    Với `ttl` (giây), phần tử hết hạn được coi là miss và bị xóa khi được đọc tới.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Khởi tạo LRUCache
+
+        Args:
+            maxsize: Số phần tử tối đa
+            ttl: Thời gian sống của mỗi phần tử (giây), None = không hết hạn
+        """
+        self.maxsize = int(maxsize)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._data = OrderedDict()
+        self._expires: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Lấy giá trị theo key (đánh dấu là vừa được dùng), trả về `default` nếu không có"""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING and self.ttl is not None and self._expires[key] <= time.monotonic():
+                del self._data[key]
+                del self._expires[key]
+                self.expirations += 1
+                value = _MISSING
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Lưu giá trị, loại phần tử cũ nhất nếu vượt quá `maxsize`"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self._expires.pop(evicted, None)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Lấy giá trị từ cache, nếu chưa có thì gọi `compute()` và lưu lại
+
+        `compute()` chạy ngoài lock, nên hai thread cùng miss một key có thể
+        cùng tính (kết quả giống nhau, chỉ tốn thêm một lần tính).
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Xóa toàn bộ phần tử (giữ nguyên counters)"""
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    def stats(self) -> Dict:
+        """Kích thước và hit / miss / eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+class DiskCache:
+    """
+    Cache bytes trên đĩa, mỗi key (chuỗi hex) một file
+
+    File được ghi qua file tạm + os.replace nên không bao giờ đọc phải file dở dang,
+    và nhiều process (prefork worker) dùng chung một thư mục được. Hết hạn theo mtime;
+    khi tổng dung lượng vượt `max_bytes`, các file cũ nhất bị xóa.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, ttl: Optional[float] = None, prune_every: int = 64):
+        """
+        Khởi tạo DiskCache
+
+        Args:
+            directory: Thư mục lưu file cache
+            max_bytes: Tổng dung lượng tối đa (byte)
+            ttl: Thời gian sống của mỗi file (giây), None = không hết hạn
+            prune_every: Kiểm tra dung lượng sau mỗi bấy nhiêu lần put
+        """
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.prune_every = max(1, int(prune_every))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        # Key có thể đến từ client (logits_id): chỉ nhận chuỗi hex để không thoát khỏi thư mục cache
+        if not is_cache_key(key):
+            raise ValueError(f"Invalid disk cache key {key!r}")
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Đọc bytes theo key, None nếu không có hoặc đã hết hạn"""
+        path = self._path(key)
+        try:
+            if self.ttl is not None and os.path.getmtime(path) + self.ttl <= time.time():
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Ghi bytes theo key (ghi đè nếu đã có)"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._puts += 1
+            should_prune = self._puts % self.prune_every == 0
+        if should_prune:
+            self.prune()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if '.tmp.' in name:
+                    continue  # file đang được ghi
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+    def prune(self):
+        """Xóa file hết hạn, rồi xóa file cũ nhất cho đến khi dưới `max_bytes`"""
+        now = time.time()
+        entries = []
+        for path, mtime, size in self._entries():
+            if self.ttl is not None and mtime + self.ttl <= now:
+                self._remove(path)
+            else:
+                entries.append((mtime, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            self.evictions += 1
+        except OSError:
+            pass
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'directory': self.directory,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """
+    Cache hai tầng: LRUCache trong bộ nhớ trước, DiskCache (tùy chọn) sau
+
+    Giá trị trong bộ nhớ là object Python; tầng đĩa lưu bytes qua `serialize` /
+    `deserialize`. Hit ở tầng đĩa được đưa lên tầng bộ nhớ.
+    """
+
+    def __init__(
+        self,
+        memory: LRUCache,
+        disk: Optional[DiskCache] = None,
+        serialize: Callable[[Any], bytes] = None,
+        deserialize: Callable[[bytes], Any] = None,
+    ):
+        """
+        Khởi tạo TieredCache
+
+        Args:
+            memory: Tầng bộ nhớ
+            disk: Tầng đĩa (None = chỉ dùng bộ nhớ)
+            serialize: Hàm chuyển giá trị thành bytes cho tầng đĩa
+            deserialize: Hàm ngược của `serialize`
+        """
+        if disk is not None and (serialize is None or deserialize is None):
+            raise ValueError("serialize/deserialize are required with a disk tier")
+        self.memory = memory
+        self.disk = disk
+        self.serialize = serialize
+        self.deserialize = deserialize
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.maxsize > 0 or self.disk is not None
+
+    def get(self, key: str) -> Tuple[Any, Optional[str]]:
+        """
+        Tìm key qua các tầng
+
+        Returns:
+            Tuple: (giá trị, tên tầng 'memory' / 'disk'), hoặc (None, None) nếu miss
+        """
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value, 'memory'
+        if self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                try:
+                    value = self.deserialize(data)
+                except Exception:
+                    return None, None
+                self.memory.put(key, value)
+                return value, 'disk'
+        return None, None
+
+    def put(self, key: str, value: Any):
+        """Lưu giá trị vào mọi tầng"""
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, self.serialize(value))
+
+    def stats(self) -> Dict:
+        body = {'memory': self.memory.stats()}
+        if self.disk is not None:
+            body['disk'] = self.disk.stats()
+        return body
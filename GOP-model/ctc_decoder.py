@@ -3,16 +3,192 @@ CTC Decoder Module
 ==================
 
 Module xử lý việc decode audio thành phoneme sử dụng CTC-based models:
-- Load và cache các model từ HuggingFace
-- Xử lý audio input (resampling, normalization)
-- Decode CTC logits thành phoneme sequence
+- Load và cache các model từ HuggingFace Hub hoặc thư mục model đã lưu sẵn (không truy cập Hub)
+- Xử lý audio input từ file, bytes hoặc waveform tensor (resampling, normalization)
+- Forward pass theo batch (padding + attention mask), tùy chọn dynamic micro-batching
+  với các lane theo độ dài audio
+- Audio dài được chạy theo cửa sổ chồng lấn rồi ghép logits (bộ nhớ không tăng theo độ dài)
+- Inference backend chọn được theo từng model (PyTorch fp32, int8 quantized, ONNX Runtime)
+- Tùy chọn cắt khoảng lặng (VAD) trước khi chạy model
+- Decode CTC logits thành phoneme sequence (collapse bằng tensor ops trên cả batch, kèm
+  khoảng frame của từng phoneme; bảng vocab tính sẵn theo model), hoặc prefix beam search
+  với tùy chọn bias về chuỗi phone mong đợi
 - Fallback mechanism khi decode chính thất bại
 """
 
+import os
+import threading
+import numpy as np
 import torch
-import torchaudio
-from typing import List, Tuple
-from transformers import pipeline, AutoProcessor, AutoModelForCTC
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from audio_io import AudioInput, load_audio
+from batching import BucketedBatchScheduler
+from beam_search import ctc_prefix_beam_search, log_softmax
+from forced_alignment import ctc_forced_align, group_spans
+from inference_backends import BACKENDS, InferenceBackend, create_backend
+from metrics import FALLBACK_DECODES, stage_timer
+from vad import SpeechRegions, detect_speech
+
+
+# Token đánh dấu ranh giới (khoảng trắng / word delimiter) giữa các phoneme
+BOUNDARY_TOKENS = (' ', '\u2581', '|')
+
+
+class CTCVocab:
+    """
+    Bảng tra vocab của một model, tính một lần khi load model
+
+    Attributes:
+        id2token: Token theo id ('' với id không có trong tokenizer)
+        blank_id: Id của CTC blank (pad token)
+        boundary_ids: Các id là ranh giới giữa phoneme (khoảng trắng, '▁', '|')
+    """
+
+    # Loại token theo id: bỏ qua (rỗng / ngoài tokenizer), ranh giới, ký tự phoneme
+    DROP, BOUNDARY, CHAR = 0, 1, 2
+
+    def __init__(self, id2token: List[str], blank_id: int):
+        self.id2token = id2token
+        self.blank_id = blank_id
+        self.boundary_ids = frozenset(i for i, t in enumerate(id2token) if t and (t in BOUNDARY_TOKENS or t.isspace()))
+        self.kinds = np.array(
+            [self.DROP if not t else self.BOUNDARY if i in self.boundary_ids else self.CHAR for i, t in enumerate(id2token)] + [self.DROP],
+            dtype=np.int8,
+        )
+        self._char_ids: Optional[Dict[str, int]] = None  # token ký tự -> id, tạo khi cần (encode_phones)
+        self._max_char_len = 1
+
+    def output_chars(self) -> List[str]:
+        """Các ký tự có thể xuất hiện trong token decode (trừ ranh giới và khoảng trắng)"""
+        chars = {ch for i, t in enumerate(self.id2token) if self.kinds[i] == self.CHAR for ch in t}
+        return sorted(ch for ch in chars if not ch.isspace() and ch not in BOUNDARY_TOKENS)
+
+    def encode_phones(self, phones: List[str]) -> np.ndarray:
+        """
+        Chuỗi phone IPA -> token id của model (khớp token dài nhất trước, ký tự không có
+        trong vocab bị bỏ qua), dùng làm target cho bias của beam search
+        """
+        if self._char_ids is None:
+            self._char_ids = {t: i for i, t in enumerate(self.id2token) if self.kinds[i] == self.CHAR}
+            self._max_char_len = max((len(t) for t in self._char_ids), default=1)
+        ids = []
+        for phone in phones:
+            phone = phone.replace('▁', '')
+            i = 0
+            while i < len(phone):
+                for size in range(min(self._max_char_len, len(phone) - i), 0, -1):
+                    token_id = self._char_ids.get(phone[i:i + size])
+                    if token_id is not None:
+                        ids.append(token_id)
+                        i += size
+                        break
+                else:
+                    i += 1
+        return np.array(ids, dtype=np.int64)
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, vocab_size: int = 0) -> 'CTCVocab':
+        vocab = tokenizer.get_vocab()
+        id2token = [''] * max(vocab_size, max(vocab.values(), default=-1) + 1)
+        for token, i in vocab.items():
+            id2token[i] = token
+        blank_id = tokenizer.pad_token_id or vocab.get('<pad>', 0)
+        return cls(id2token, blank_id)
+
+    def group(self, ids: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Ghép các token ký tự (đã collapse) thành phoneme: token ranh giới tách phoneme và
+        thành marker '▁' ở đầu phoneme kế tiếp
+
+        Args:
+            ids: Token id sau collapse
+            starts, ends: Khoảng frame [start, end) của từng token
+
+        Returns:
+            Tuple: (phonemes, khoảng frame của từng phoneme)
+        """
+        kinds = self.kinds[np.minimum(ids, len(self.kinds) - 1)]
+        keep = kinds != self.DROP
+        ids, starts, ends, kinds = ids[keep], starts[keep], ends[keep], kinds[keep]
+        if ids.size == 0:
+            return [], []
+
+        # Ký tự đứng ngay sau ranh giới (hoặc đầu chuỗi) mở một phoneme mới
+        after_boundary = np.empty(ids.size, dtype=bool)
+        after_boundary[0] = False
+        np.equal(kinds[:-1], self.BOUNDARY, out=after_boundary[1:])
+        is_char = kinds == self.CHAR
+        opens = is_char & after_boundary
+        opens[0] = is_char[0]
+
+        chars = ids[is_char].tolist()
+        if not chars:
+            return [], []
+        first = opens[is_char].nonzero()[0]
+        last = np.empty_like(first)
+        last[:-1] = first[1:] - 1
+        last[-1] = len(chars) - 1
+        marked = after_boundary[is_char][first].tolist()
+
+        id2token = self.id2token
+        text = [id2token[i] for i in chars]
+        tokens = [
+            ('▁' if marker else '') + ''.join(text[lo:hi + 1])
+            for lo, hi, marker in zip(first.tolist(), last.tolist(), marked)
+        ]
+        spans = list(zip(starts[is_char][first].tolist(), ends[is_char][last].tolist()))
+        return tokens, spans
+
+
+def ctc_collapse(ids: List[np.ndarray], blank_id: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    CTC collapse cho cả batch: gộp các frame lặp liên tiếp rồi bỏ blank
+
+    Các hàng được nối thành một dãy, ngăn cách bởi một frame sentinel (-1) để run không
+    nối qua ranh giới hàng, rồi tìm run (như `unique_consecutive`) và lọc blank bằng mask
+    trên cả batch một lần. Dùng numpy thay cho torch: với vài trăm frame, chi phí
+    dispatch mỗi op của torch trên CPU còn lớn hơn chính phép tính.
+
+    Args:
+        ids: Argmax của logits cho từng utterance, mỗi phần tử là mảng 1-D (frames,)
+        blank_id: Id của CTC blank
+
+    Returns:
+        List: (token ids, frame bắt đầu, frame kết thúc + 1) của từng token cho từng utterance
+    """
+    rows = ids
+    if len(rows) == 1:
+        flat = rows[0]
+    else:
+        sentinel = np.full(1, -1, dtype=rows[0].dtype)
+        flat = np.concatenate([part for row in rows for part in (row, sentinel)][:-1])
+    if flat.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return [(empty, empty, empty) for _ in rows]
+
+    # Run bắt đầu ở frame 0 và ở mọi frame khác frame trước; kết thúc ở run kế tiếp
+    change = np.empty(flat.size, dtype=bool)
+    change[0] = True
+    np.not_equal(flat[1:], flat[:-1], out=change[1:])
+    starts = change.nonzero()[0]
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:]
+    ends[-1] = flat.size
+    keys = flat[starts]
+
+    keep = (keys != blank_id) & (keys >= 0)
+    keys, starts, ends = keys[keep], starts[keep], ends[keep]
+    if len(rows) == 1:
+        return [(keys, starts, ends)]
+
+    # Vị trí trong dãy nối -> frame trong từng hàng
+    row_offsets = np.cumsum([0] + [row.size + 1 for row in rows[:-1]])
+    run_rows = np.searchsorted(row_offsets, starts, side='right') - 1
+    starts = starts - row_offsets[run_rows]
+    ends = ends - row_offsets[run_rows]
+    bounds = np.searchsorted(run_rows, np.arange(len(rows) + 1)).tolist()
+    return [(keys[lo:hi], starts[lo:hi], ends[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
 
 
 class CTCDecoder:
@@ -25,148 +201,581 @@ class CTCDecoder:
     - Xử lý CTC collapse và filtering
     """
     
-    def __init__(self):
-        """Khởi tạo CTCDecoder với model cache rỗng"""
+    def __init__(self, default_backend: str = 'torch', on_vocab_loaded: Optional[Callable[[CTCVocab], None]] = None):
+        """
+        Khởi tạo CTCDecoder với model cache rỗng
+
+        Args:
+            default_backend: Inference backend cho các model chưa được chỉ định riêng ('torch', 'int8', 'onnx')
+            on_vocab_loaded: Hàm được gọi với bảng vocab của mỗi model khi model được load
+        """
+        if default_backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend {default_backend!r}, expected one of {BACKENDS}")
         self._model_cache = {}
+        self._vocabs: Dict[str, CTCVocab] = {}
+        self._on_vocab_loaded = on_vocab_loaded
+        self._load_lock = threading.Lock()
+        self.default_backend = default_backend
+        self._backend_kinds: Dict[str, str] = {}
+        self._backends: Dict[str, InferenceBackend] = {}
+        self._backends_lock = threading.Lock()
+        self._batch_config = None  # (max_batch_size, max_wait_ms, bucket_seconds) khi bật micro-batching
+        self.chunk_seconds = 0.0   # > 0: audio dài hơn được chạy theo cửa sổ (xem set_chunking)
+        self.chunk_overlap_seconds = 0.0
+        self._batchers = {}
+        self._batchers_lock = threading.Lock()
     
     def get_model_components(self, model_name: str) -> Tuple:
         """
         Load và cache model components
-        
+
+        `model_name` là thư mục local (ví dụ model đã bake bằng `python startup.py --bake`)
+        thì chỉ đọc file local, không gọi tới HuggingFace Hub.
+
         Args:
-            model_name: Tên model từ HuggingFace Hub
+            model_name: Tên model từ HuggingFace Hub hoặc đường dẫn thư mục model
             
         Returns:
             Tuple: (processor, model)
         """
         if model_name in self._model_cache:
             return self._model_cache[model_name]
-            
-        # Load model components
-        processor = AutoProcessor.from_pretrained(model_name)
-        model = AutoModelForCTC.from_pretrained(model_name)
-        model.eval()  # Chuyển sang evaluation mode
-        
-        # Cache để sử dụng lại
-        self._model_cache[model_name] = (processor, model)
+
+        with self._load_lock:
+            if model_name in self._model_cache:
+                return self._model_cache[model_name]
+
+            # transformers import rất nặng, chỉ import khi thực sự load model
+            from transformers import AutoProcessor, AutoModelForCTC
+
+            local_files_only = os.path.isdir(model_name)
+            processor = AutoProcessor.from_pretrained(model_name, local_files_only=local_files_only)
+            model = AutoModelForCTC.from_pretrained(model_name, local_files_only=local_files_only)
+            model.eval()  # Chuyển sang evaluation mode
+
+            # Cache để sử dụng lại; bảng vocab cho CTC decode tính một lần theo model
+            self._vocabs[model_name] = CTCVocab.from_tokenizer(processor.tokenizer, getattr(model.config, 'vocab_size', 0))
+            if self._on_vocab_loaded is not None:
+                self._on_vocab_loaded(self._vocabs[model_name])
+            self._model_cache[model_name] = (processor, model)
         return processor, model
     
-    def decode_audio(self, audio_path: str, model_name: str, target_sr: int = 16000) -> List[str]:
+    def set_backend(self, model_name: str, kind: str):
+        """
+        Chọn inference backend cho một model (backend cũ của model đó bị bỏ)
+
+        Args:
+            model_name: Tên model
+            kind: 'torch', 'int8' hoặc 'onnx'
+        """
+        if kind not in BACKENDS:
+            raise ValueError(f"Unknown inference backend {kind!r}, expected one of {BACKENDS}")
+        with self._backends_lock:
+            self._backend_kinds[model_name] = kind
+            self._backends.pop(model_name, None)
+
+    def get_backend(self, model_name: str) -> InferenceBackend:
+        """Lấy (hoặc tạo) inference backend của một model"""
+        backend = self._backends.get(model_name)
+        if backend is not None:
+            return backend
+        processor, model = self.get_model_components(model_name)
+        with self._backends_lock:
+            backend = self._backends.get(model_name)
+            if backend is None:
+                kind = self.backend_kind(model_name)
+                uses_mask = getattr(processor.feature_extractor, "return_attention_mask", True)
+                backend = create_backend(kind, model, model_name, uses_mask)
+                self._backends[model_name] = backend
+        return backend
+
+    def after_fork(self):
+        """
+        Gọi trong process con sau fork: bỏ các backend không fork-safe (tạo lại lazily)
+        và các batch scheduler (thread của process cha không tồn tại trong process con)
+        """
+        with self._backends_lock:
+            self._backends = {name: b for name, b in self._backends.items() if b.fork_safe}
+        self._batchers_lock = threading.Lock()
+        self._batchers = {}
+
+    def backend_kind(self, model_name: str) -> str:
+        """Tên backend được chọn cho model (kể cả khi backend chưa được tạo)"""
+        return self._backend_kinds.get(model_name, self.default_backend)
+
+    def backend_names(self) -> Dict[str, str]:
+        """Backend đang dùng cho từng model đã load"""
+        return {model_name: backend.name for model_name, backend in self._backends.items()}
+
+    def enable_batching(self, max_batch_size: int = 8, max_wait_ms: float = 10.0, bucket_seconds: Tuple[float, ...] = (4.0, 10.0)):
+        """
+        Bật dynamic micro-batching cho forward pass
+
+        Các request đồng thời sẽ được gom lại trong tối đa `max_wait_ms` mili giây
+        (hoặc đến khi đủ `max_batch_size` utterance) rồi chạy chung một forward pass.
+        Request được chia lane theo độ dài (`bucket_seconds`), mỗi lane gom batch riêng.
+
+        Args:
+            max_batch_size: Số utterance tối đa trong một batch
+            max_wait_ms: Thời gian chờ tối đa để gom batch (ms)
+            bucket_seconds: Các ngưỡng độ dài (giây) chia lane; rỗng = một lane
+        """
+        self.close_batchers()
+        self._batch_config = (max_batch_size, max_wait_ms, tuple(bucket_seconds)) if max_batch_size > 1 else None
+
+    def set_chunking(self, chunk_seconds: float = 20.0, overlap_seconds: float = 2.0):
+        """
+        Chạy audio dài hơn `chunk_seconds` theo các cửa sổ chồng lấn nhau
+
+        Mỗi cửa sổ dài `chunk_seconds`, hai cửa sổ liền nhau chồng lên nhau
+        `overlap_seconds`; khi ghép, mỗi cửa sổ bỏ nửa vùng chồng lấn ở hai đầu
+        (nơi thiếu context) nên mọi frame đều lấy từ cửa sổ có context hai phía.
+
+        Args:
+            chunk_seconds: Độ dài cửa sổ (giây); <= 0 để tắt
+            overlap_seconds: Độ dài vùng chồng lấn (giây)
         """
-        Decode audio file thành phoneme sequence
+        if chunk_seconds > 0 and overlap_seconds >= chunk_seconds:
+            raise ValueError("overlap_seconds must be smaller than chunk_seconds")
+        self.chunk_seconds = max(0.0, float(chunk_seconds))
+        self.chunk_overlap_seconds = max(0.0, float(overlap_seconds))
+
+    def close_batchers(self):
+        """Dừng tất cả batch scheduler đang chạy"""
+        for batcher in self._batchers.values():
+            batcher.close()
+        self._batchers = {}
+
+    def _get_batcher(self, model_name: str, target_sr: int) -> BucketedBatchScheduler:
+        """Lấy (hoặc tạo) batch scheduler (có lane theo độ dài) cho một model"""
+        key = (model_name, target_sr)
+        with self._batchers_lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                max_batch_size, max_wait_ms, bucket_seconds = self._batch_config
+                batcher = BucketedBatchScheduler(
+                    lambda wavs: self.forward_batch(wavs, model_name, target_sr),
+                    max_batch_size=max_batch_size,
+                    max_wait_ms=max_wait_ms,
+                    bucket_seconds=bucket_seconds,
+                    sample_rate=target_sr,
+                )
+                self._batchers[key] = batcher
+            return batcher
+
+    def batching_stats(self) -> Dict[str, Dict]:
+        """Thống kê của các batch scheduler (số batch, kích thước batch trung bình...)"""
+        return {model_name: b.stats() for (model_name, _), b in self._batchers.items()}
+
+    def load_waveform(self, audio: AudioInput, target_sr: int = 16000, sample_rate: Optional[int] = None) -> torch.Tensor:
+        """
+        Load audio thành waveform mono 1-D ở sample rate mục tiêu
+
+        Args:
+            audio: Đường dẫn file, bytes/buffer của file audio hoặc waveform tensor
+            target_sr: Sample rate mục tiêu (Hz)
+            sample_rate: Sample rate của waveform tensor (mặc định = target_sr)
+
+        Returns:
+            torch.Tensor: Waveform 1-D
+        """
+        return load_audio(audio, target_sr, sample_rate)
+
+    def forward_batch(self, waveforms: List[torch.Tensor], model_name: str, target_sr: int = 16000) -> List[torch.Tensor]:
+        """
+        Chạy một forward pass cho nhiều utterance cùng lúc
+
+        Các waveform được pad tới cùng độ dài kèm attention mask, sau đó logits
+        của từng utterance được cắt lại theo số frame thực tế của nó.
+
+        Args:
+            waveforms: Danh sách waveform 1-D (cùng sample rate `target_sr`)
+            model_name: Tên model để sử dụng
+            target_sr: Sample rate của waveform (Hz)
+
+        Returns:
+            List[torch.Tensor]: Logits (frames, vocab) cho từng utterance, theo đúng thứ tự
+        """
+        processor, model = self.get_model_components(model_name)
+        backend = self.get_backend(model_name)
+
+        inputs = processor(
+            [w.numpy() for w in waveforms],
+            sampling_rate=target_sr,
+            return_tensors="pt",
+            padding=True,
+            return_attention_mask=True,
+        )
+        attention_mask = inputs.get("attention_mask")
+        if not getattr(processor.feature_extractor, "return_attention_mask", True):
+            # Model dùng group-norm feature extractor: không truyền attention mask (theo khuyến nghị của HF)
+            inputs.pop("attention_mask", None)
+
+        logits = backend(inputs["input_values"], inputs.get("attention_mask"))
+
+        if len(waveforms) == 1:
+            return [logits[0]]
+
+        # Số frame output thực tế của từng utterance
+        input_lengths = torch.tensor([w.shape[-1] for w in waveforms])
+        if hasattr(model, "_get_feat_extract_output_lengths"):
+            output_lengths = model._get_feat_extract_output_lengths(input_lengths).tolist()
+        else:
+            max_len = attention_mask.shape[-1] if attention_mask is not None else int(input_lengths.max())
+            output_lengths = [int(round(logits.shape[1] * int(n) / max_len)) for n in input_lengths]
+
+        return [logits[i, :output_lengths[i]] for i in range(len(waveforms))]
+
+    def infer_logits(self, waveform: torch.Tensor, model_name: str, target_sr: int = 16000) -> torch.Tensor:
+        """
+        Forward pass cho một utterance, gom batch với các request khác nếu bật batching
+
+        Audio dài hơn `chunk_seconds` (nếu bật chunking) được chạy theo cửa sổ.
+
+        Args:
+            waveform: Waveform 1-D ở sample rate `target_sr`
+            model_name: Tên model để sử dụng
+            target_sr: Sample rate của waveform (Hz)
+
+        Returns:
+            torch.Tensor: Logits (frames, vocab)
+        """
+        if self._needs_chunking(waveform, target_sr):
+            return self._infer_chunked(waveform, model_name, target_sr)
+        if self._batch_config:
+            return self._get_batcher(model_name, target_sr).infer(waveform)
+        return self.forward_batch([waveform], model_name, target_sr)[0]
+
+    def _needs_chunking(self, waveform: torch.Tensor, target_sr: int) -> bool:
+        return self.chunk_seconds > 0 and waveform.shape[-1] > self.chunk_seconds * target_sr
+
+    def _chunk_windows(self, num_samples: int, frame_samples: int, target_sr: int) -> List[Tuple[int, int, int, Optional[int]]]:
+        """
+        Chia audio thành các cửa sổ chồng lấn, căn theo biên frame của model
+
+        Returns:
+            List: (start_sample, end_sample, keep_from, keep_to) cho từng cửa sổ, trong đó
+            [keep_from, keep_to) là các frame (tính trong cửa sổ) được giữ lại khi ghép
+            (keep_to = None: giữ đến hết)
+        """
+        chunk_frames = max(2, int(round(self.chunk_seconds * target_sr / frame_samples)))
+        overlap_frames = min(chunk_frames - 1, int(round(self.chunk_overlap_seconds * target_sr / frame_samples)))
+        stride = chunk_frames - overlap_frames
+
+        starts = [0]
+        while (starts[-1] + chunk_frames) * frame_samples < num_samples:
+            starts.append(starts[-1] + stride)
+
+        # Biên ghép giữa cửa sổ i-1 và i: giữa vùng chồng lấn
+        cuts = [0] + [start + overlap_frames // 2 for start in starts[1:]]
+        windows = []
+        for i, start in enumerate(starts):
+            end_sample = min(num_samples, (start + chunk_frames) * frame_samples)
+            keep_to = cuts[i + 1] - start if i + 1 < len(starts) else None
+            windows.append((start * frame_samples, end_sample, cuts[i] - start, keep_to))
+        return windows
+
+    def _infer_chunked(self, waveform: torch.Tensor, model_name: str, target_sr: int) -> torch.Tensor:
+        """Forward audio dài theo cửa sổ chồng lấn rồi ghép logits"""
+        _, model = self.get_model_components(model_name)
+        frame_samples = int(getattr(model.config, 'inputs_to_logits_ratio', 320))
+        windows = self._chunk_windows(waveform.shape[-1], frame_samples, target_sr)
+        segments = [waveform[start:end] for start, end, _, _ in windows]
+
+        if self._batch_config:
+            # Các cửa sổ cùng độ dài nên được gom batch với nhau trong cùng một lane
+            batcher = self._get_batcher(model_name, target_sr)
+            outputs = [f.result() for f in [batcher.submit(seg) for seg in segments]]
+        else:
+            # Từng cửa sổ một để bộ nhớ không phụ thuộc độ dài audio
+            outputs = [self.forward_batch([seg], model_name, target_sr)[0] for seg in segments]
+
+        pieces = [logits[keep_from:keep_to] for logits, (_, _, keep_from, keep_to) in zip(outputs, windows)]
+        return torch.cat(pieces, dim=0)
+
+    def seconds_per_frame(self, model_name: str, target_sr: int = 16000) -> float:
+        """Độ dài (giây) của một frame logits"""
+        _, model = self.get_model_components(model_name)
+        return int(getattr(model.config, 'inputs_to_logits_ratio', 320)) / float(target_sr)
+
+    def get_vocab(self, model_name: str) -> 'CTCVocab':
+        """Bảng vocab đã tính sẵn của model (load model nếu chưa load)"""
+        vocab = self._vocabs.get(model_name)
+        if vocab is None:
+            self.get_model_components(model_name)
+            vocab = self._vocabs[model_name]
+        return vocab
+
+    def decode_logits(
+        self,
+        logits: torch.Tensor,
+        model_name: str,
+        beam_width: int = 1,
+        target_phones: Optional[List[str]] = None,
+        target_bias: float = 0.0
+    ) -> List[str]:
+        """
+        CTC decoding từ logits của một utterance (greedy, hoặc prefix beam search khi beam_width > 1)
+
+        Args:
+            logits: Tensor (frames, vocab)
+            model_name: Tên model (để lấy tokenizer)
+            beam_width: Số beam; <= 1 là greedy argmax
+            target_phones: Chuỗi phone mong đợi của script (IPA), dùng cho bias của beam search
+            target_bias: Điểm cộng (log) cho mỗi token đi đúng theo target; 0 = không bias
+
+        Returns:
+            List[str]: Danh sách phoneme tokens
+        """
+        return self.decode_logits_with_frames(logits, model_name, beam_width, target_phones, target_bias)[0]
+
+    def decode_logits_with_frames(
+        self,
+        logits: torch.Tensor,
+        model_name: str,
+        beam_width: int = 1,
+        target_phones: Optional[List[str]] = None,
+        target_bias: float = 0.0
+    ) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        Như `decode_logits`, kèm khoảng frame [start, end) của từng phoneme
+
+        Returns:
+            Tuple: (tokens, spans) - spans[i] là (frame đầu, frame cuối + 1) của tokens[i]
+        """
+        if beam_width <= 1:
+            return self.decode_logits_batch([logits], model_name)[0]
+
+        vocab = self.get_vocab(model_name)
+        log_probs = log_softmax(logits.detach().cpu().float().numpy())
+        target_ids = vocab.encode_phones(target_phones) if target_phones and target_bias > 0 else None
+        ids, starts, ends = ctc_prefix_beam_search(
+            log_probs, vocab.blank_id, beam_width=beam_width, target_ids=target_ids, target_bias=target_bias
+        )
+        return vocab.group(ids, starts, ends)
+
+    def force_align(
+        self,
+        logits: torch.Tensor,
+        model_name: str,
+        target_phones: List[str]
+    ) -> Optional[List[Optional[Tuple[int, int]]]]:
+        """
+        CTC forced alignment của chuỗi phone mong đợi lên logits
+
+        Args:
+            logits: Tensor (frames, vocab)
+            model_name: Tên model (để lấy vocab)
+            target_phones: Chuỗi phone IPA mong đợi
+
+        Returns:
+            List: Khoảng frame [start, end) của từng phone (None nếu phone không có ký tự
+            nào trong vocab của model), hoặc None nếu không căn được
+        """
+        vocab = self.get_vocab(model_name)
+        encoded = [vocab.encode_phones([phone]) for phone in target_phones]
+        targets = np.concatenate(encoded) if encoded else np.zeros(0, dtype=np.int64)
+        aligned = ctc_forced_align(log_softmax(logits.detach().cpu().float().numpy()), targets, vocab.blank_id)
+        if aligned is None:
+            return None
+        return group_spans(aligned[0], aligned[1], [len(ids) for ids in encoded])
+
+    def decode_logits_batch(
+        self,
+        logits: Union[torch.Tensor, List[torch.Tensor]],
+        model_name: str,
+        lengths: Optional[List[int]] = None
+    ) -> List[Tuple[List[str], List[Tuple[int, int]]]]:
+        """
+        Greedy CTC decoding cho nhiều utterance cùng lúc
+
+        Argmax và bước collapse (gộp frame lặp, bỏ blank) chạy bằng tensor ops trên cả
+        batch; chỉ bước ghép ký tự thành phoneme (số token đã nhỏ) chạy bằng Python.
+
+        Args:
+            logits: Tensor (batch, frames, vocab) đã pad, hoặc list các tensor (frames, vocab)
+            model_name: Tên model (để lấy vocab)
+            lengths: Số frame hợp lệ của từng utterance (khi truyền tensor đã pad)
+
+        Returns:
+            List: (tokens, spans) cho từng utterance, spans tính theo frame của logits
+        """
+        vocab = self.get_vocab(model_name)
+        # argmax theo vocab trên numpy view (không copy với logits float32 trên CPU):
+        # nhanh hơn nhiều lần torch.argmax theo chiều cuối trên CPU
+        if isinstance(logits, torch.Tensor):
+            ids = logits.detach().cpu().numpy().argmax(-1)
+            rows = [ids[i, :lengths[i]] if lengths is not None else ids[i] for i in range(ids.shape[0])]
+        else:
+            rows = [item.detach().cpu().numpy().argmax(-1) for item in logits]
+        if not rows:
+            return []
+        return [vocab.group(*row) for row in ctc_collapse(rows, vocab.blank_id)]
+
+    def decode_audio(self, audio: AudioInput, model_name: str, target_sr: int = 16000, sample_rate: Optional[int] = None, vad: str = 'off') -> List[str]:
+        """
+        Decode audio thành phoneme sequence
         
         Args:
-            audio_path: Đường dẫn file audio
+            audio: Đường dẫn file, bytes/buffer của file audio hoặc waveform tensor
             model_name: Tên model để sử dụng
             target_sr: Sample rate mục tiêu (Hz)
+            sample_rate: Sample rate của waveform tensor (mặc định = target_sr)
+            vad: Cắt khoảng lặng trước khi chạy model ('off', 'trim', 'pauses')
             
         Returns:
             List[str]: Danh sách phoneme tokens
         """
+        return self.decode_speech(audio, model_name, target_sr, sample_rate, vad)[0]
+
+    def decode_speech(
+        self,
+        audio: AudioInput,
+        model_name: str,
+        target_sr: int = 16000,
+        sample_rate: Optional[int] = None,
+        vad: str = 'off',
+        beam_width: int = 1,
+        target_phones: Optional[List[str]] = None,
+        target_bias: float = 0.0,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Tuple[List[str], Optional[List[Tuple[int, int]]], Optional[SpeechRegions], Optional[torch.Tensor]]:
+        """
+        Như `decode_audio`, kèm khoảng frame của từng token, các đoạn audio gốc đã được đưa
+        vào model sau VAD và logits
+
+        Args:
+            beam_width, target_phones, target_bias: Xem `decode_logits`
+            timings: Dict nhận thời gian (ms) của các bước load_audio, vad, forward, ctc_decode
+
+        Returns:
+            Tuple: (tokens, spans, SpeechRegions, logits (frames, vocab)) - spans,
+            SpeechRegions và logits là None nếu phải dùng fallback
+        """
         try:
-            processor, model = self.get_model_components(model_name)
-            
-            # Load và preprocess audio
-            wav, sr = torchaudio.load(audio_path)
-            
-            # Chuyển stereo thành mono nếu cần
-            if wav.dim() == 2 and wav.size(0) > 1:
-                wav = wav.mean(dim=0, keepdim=True)
-                
-            # Resample nếu sample rate khác target
-            if sr != target_sr:
-                wav = torchaudio.functional.resample(wav, sr, target_sr)
-                
-            wav = wav.squeeze(0)  # Remove batch dimension
-            
-            # Chuẩn bị input cho model
-            inputs = processor(wav.numpy(), sampling_rate=target_sr, return_tensors="pt")
-            
-            # Forward pass qua model
-            with torch.no_grad():
-                outputs = model(**inputs)
-                logits = outputs.logits.squeeze(0)
-                
-            # Prepare for CTC decoding
-            vocab = processor.tokenizer.get_vocab()
-            id2token = {i: t for t, i in vocab.items()}
-            blank_id = processor.tokenizer.pad_token_id or vocab.get('<pad>', 0)
-            
-            # Greedy CTC decoding
-            pred_ids = torch.argmax(logits, dim=-1).tolist()
-            
-            # CTC collapse - loại bỏ repeated tokens và blank tokens
-            tokens = []
-            prev_id = None
-            
-            for token_id in pred_ids:
-                # Skip blank tokens và repeated tokens
-                if token_id == blank_id or token_id == prev_id:
-                    prev_id = token_id
-                    continue
-                    
-                token = id2token.get(token_id, '')
-                if token:
-                    tokens.append(token)
-                prev_id = token_id
-                
-            # Lọc ra các special tokens không mong muốn - giữ lại markers như '▁' và '|' vì
-            # chúng biểu thị ranh giới chunk/word do một số tokenizer sử dụng.
-            tokens = [t for t in tokens if t is not None]
-
-            # Collapse character-level tokens into phoneme tokens and convert spaces
-            # (or separate marker tokens) into leading '▁' markers on the next phoneme.
-            def _collapse(tokens_list: List[str]) -> List[str]:
-                collapsed = []
-                current = ''
-                pending_marker = False
-                for tk in tokens_list:
-                    if not tk:
-                        continue
-                    # treat explicit space-like tokens or single-space strings as boundaries
-                    if tk == ' ' or tk == '\u2581' or tk == '▁' or tk == '|' or tk.isspace():
-                        if current:
-                            collapsed.append(current)
-                            current = ''
-                        pending_marker = True
-                        continue
-                    # Normal token character (could be multi-char)
-                    if current == '':
-                        if pending_marker:
-                            current = '▁' + tk
-                            pending_marker = False
-                        else:
-                            current = tk
-                    else:
-                        current = current + tk
-
-                if current:
-                    collapsed.append(current)
-                return collapsed
-
-            tokens = _collapse(tokens)
-            return tokens
+            # Load và preprocess audio, bỏ khoảng lặng trước khi gọi processor
+            with stage_timer(timings, 'load_audio'):
+                wav = self.load_waveform(audio, target_sr, sample_rate)
+            with stage_timer(timings, 'vad'):
+                regions = detect_speech(wav, target_sr, vad)
+
+            with stage_timer(timings, 'forward'):
+                logits = self.infer_logits(regions.waveform, model_name, target_sr)
+            with stage_timer(timings, 'ctc_decode'):
+                tokens, spans = self.decode_logits_with_frames(logits, model_name, beam_width, target_phones, target_bias)
+            return tokens, spans, regions, logits
             
         except Exception as e:
             # Nếu method chính thất bại, dùng fallback
             print(f"CTC decoding failed, using fallback: {e}")
-            return self._fallback_decode(audio_path, model_name)
+            FALLBACK_DECODES.inc()
+            return self._fallback_decode(audio, model_name, target_sr, sample_rate), None, None, None
     
-    def _fallback_decode(self, audio_path: str, model_name: str) -> List[str]:
+    def decode_batch(
+        self,
+        audios: List[AudioInput],
+        model_name: str,
+        target_sr: int = 16000,
+        sample_rate: Optional[int] = None,
+        max_batch_size: int = 8
+    ) -> List[Union[List[str], Exception]]:
+        """
+        Decode nhiều audio với các forward pass theo batch
+
+        Utterance được sắp theo độ dài rồi chia thành batch tối đa `max_batch_size`
+        để giảm padding (hoặc gửi qua BatchScheduler nếu đang bật micro-batching).
+        Item nào lỗi (load audio hoặc forward) được decode lại riêng qua `decode_audio`
+        (có fallback), nên một file hỏng không làm hỏng cả batch.
+
+        Args:
+            audios: Danh sách audio (đường dẫn, bytes hoặc waveform tensor)
+            model_name: Tên model để sử dụng
+            target_sr: Sample rate mục tiêu (Hz)
+            sample_rate: Sample rate của các waveform tensor (mặc định = target_sr)
+            max_batch_size: Số utterance tối đa mỗi forward pass
+
+        Returns:
+            List: Tokens cho từng audio theo đúng thứ tự, hoặc Exception nếu item đó thất bại
+        """
+        results: List = [None] * len(audios)
+        waveforms = {}
+        for i, audio in enumerate(audios):
+            try:
+                waveforms[i] = self.load_waveform(audio, target_sr, sample_rate)
+            except Exception:
+                pass
+
+        logits = {}
+        # Audio dài chạy theo cửa sổ, không đưa vào batch với các clip khác
+        for i in [i for i, wav in waveforms.items() if self._needs_chunking(wav, target_sr)]:
+            try:
+                logits[i] = self._infer_chunked(waveforms.pop(i), model_name, target_sr)
+            except Exception:
+                pass
+
+        if self._batch_config:
+            batcher = self._get_batcher(model_name, target_sr)
+            futures = {i: batcher.submit(wav) for i, wav in waveforms.items()}
+            for i, future in futures.items():
+                try:
+                    logits[i] = future.result()
+                except Exception:
+                    pass
+        else:
+            order = sorted(waveforms, key=lambda i: waveforms[i].shape[-1])
+            for start in range(0, len(order), max(1, max_batch_size)):
+                group = order[start:start + max(1, max_batch_size)]
+                try:
+                    outputs = self.forward_batch([waveforms[i] for i in group], model_name, target_sr)
+                except Exception as e:
+                    print(f"Batched forward failed, decoding items separately: {e}")
+                    continue
+                logits.update(zip(group, outputs))
+
+        decoded = {}
+        if logits:
+            try:
+                decoded = dict(zip(logits, (tokens for tokens, _ in self.decode_logits_batch(list(logits.values()), model_name))))
+            except Exception:
+                pass
+
+        for i, audio in enumerate(audios):
+            try:
+                if i in decoded:
+                    results[i] = decoded[i]
+                else:
+                    results[i] = self.decode_audio(audio, model_name, target_sr, sample_rate)
+            except Exception as e:
+                results[i] = e
+        return results
+
+    def _fallback_decode(self, audio: AudioInput, model_name: str, target_sr: int = 16000, sample_rate: Optional[int] = None) -> List[str]:
         """
         Fallback decoding sử dụng transformers pipeline
         
         Args:
-            audio_path: Đường dẫn file audio
+            audio: Đường dẫn file, bytes/buffer của file audio hoặc waveform tensor
             model_name: Tên model
+            target_sr: Sample rate mục tiêu (Hz)
+            sample_rate: Sample rate của waveform tensor (mặc định = target_sr)
             
         Returns:
             List[str]: Danh sách tokens (có thể kém chính xác hơn)
         """
         try:
-            # Sử dụng pipeline wrapper
+            # Sử dụng pipeline wrapper; pipeline nhận đường dẫn, bytes hoặc raw waveform
+            from transformers import pipeline
+
             pipe = pipeline(model=model_name)
-            result = pipe(audio_path)
+            if isinstance(audio, torch.Tensor):
+                wav = load_audio(audio, target_sr, sample_rate)
+                audio = {"raw": wav.numpy(), "sampling_rate": target_sr}
+            elif isinstance(audio, (bytearray, memoryview)):
+                audio = bytes(audio)
+            elif hasattr(audio, 'read'):
+                audio.seek(0)
+                audio = audio.read()
+            result = pipe(audio)
             
             # Xử lý kết quả tùy thuộc vào format trả về
             if isinstance(result, dict):
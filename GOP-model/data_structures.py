@@ -6,13 +6,16 @@ File này chứa các dataclass chính để lưu trữ kết quả và thông t
 - PhonemeError: Lưu thông tin lỗi phoneme
 - WordScore: Điểm số cho từng từ
 - PronunciationResult: Kết quả tổng thể của việc chấm điểm
+
+Các dataclass dùng __slots__ (không có __dict__ cho từng instance): một kết quả của đoạn
+văn dài có thể chứa hàng nghìn PhonemeError.
 """
 
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 
-@dataclass
+@dataclass(slots=True)
 class PhonemeError:
     """
     Cấu trúc lưu trữ thông tin lỗi phát âm phoneme
@@ -31,7 +34,7 @@ class PhonemeError:
     severity: float
 
 
-@dataclass
+@dataclass(slots=True)
 class WordScore:
     """
     Kết quả chấm điểm cho từng từ riêng biệt
@@ -43,6 +46,10 @@ class WordScore:
         accuracy: Độ chính xác (0.0-1.0)
         label: Nhãn chất lượng (1=excellent, 2=good, 3=needs_work)
         errors: Danh sách các lỗi phoneme trong từ này
+        start: Thời điểm bắt đầu của từ trong audio (giây, chỉ có với segmentation 'forced')
+        end: Thời điểm kết thúc của từ trong audio (giây)
+        phones: Thời gian của từng target phone: [(phone, start, end)], start/end là None
+            nếu phone không căn được
     """
     word: str
     target_ipa: str
@@ -50,9 +57,12 @@ class WordScore:
     accuracy: float
     label: int
     errors: List[PhonemeError]
+    start: Optional[float] = None
+    end: Optional[float] = None
+    phones: Optional[List[Tuple[str, Optional[float], Optional[float]]]] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class PronunciationResult:
     """
     Kết quả tổng thể của việc đánh giá phát âm
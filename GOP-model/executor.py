@@ -0,0 +1,135 @@
+"""
+Execution Layer Module
+======================
+
+Module chạy các tác vụ CPU-bound (decode audio, inference, alignment) ngoài event loop:
+- Thread pool có giới hạn số worker và độ dài hàng đợi
+- Giới hạn số torch intra-op thread cho mỗi worker
+- Thread pool và cấu hình torch thread chỉ được tạo khi có tác vụ đầu tiên
+  (an toàn khi tạo executor trước rồi fork worker process)
+- Backpressure: từ chối ngay (QueueFullError) khi hàng đợi đầy
+- Thống kê queue depth cho health/readiness endpoint
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import torch
+
+
+class QueueFullError(Exception):
+    """Hàng đợi của ScoringExecutor đã đầy, request nên được thử lại sau"""
+
+
+class ScoringExecutor:
+    """
+    Bounded thread pool cho pipeline chấm điểm
+
+    Tổng số tác vụ đang chạy + đang chờ không vượt quá `max_workers + max_queue`.
+    Khi vượt ngưỡng, `submit()` raise QueueFullError thay vì xếp hàng vô hạn.
+
+    Lưu ý: số torch thread là cấu hình toàn process, nhưng mỗi thread gọi torch op
+    sẽ dùng tối đa `torch_threads` thread intra-op, nên tổng CPU sử dụng xấp xỉ
+    `max_workers * torch_threads`.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 8, torch_threads: Optional[int] = None):
+        """
+        Khởi tạo ScoringExecutor
+
+        Args:
+            max_workers: Số worker thread chạy song song
+            max_queue: Số tác vụ tối đa được phép chờ khi tất cả worker đang bận
+            torch_threads: Số torch intra-op thread cho mỗi worker (None/0 = mặc định của torch)
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.torch_threads = torch_threads or None
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._rejected = 0
+        self._completed = 0
+
+    @property
+    def capacity(self) -> int:
+        """Tổng số tác vụ tối đa (đang chạy + đang chờ)"""
+        return self.max_workers + self.max_queue
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        """
+        Tạo thread pool (và áp dụng số torch thread) ở lần submit đầu tiên
+
+        Việc dùng torch intra-op thread pool trước khi fork làm process con bị treo
+        (OpenMP), nên không làm gì với thread lúc khởi tạo.
+        """
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.torch_threads:
+                        torch.set_num_threads(self.torch_threads)
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='gop-worker')
+        return self._pool
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Đưa một tác vụ vào pool
+
+        Raises:
+            QueueFullError: nếu pool đã đủ `capacity` tác vụ
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise QueueFullError(f"Scoring queue is full ({self._in_flight}/{self.capacity})")
+            self._in_flight += 1
+
+        try:
+            future = self._ensure_pool().submit(self._run, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Phiên bản async của `submit()`: chờ kết quả mà không block event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict:
+        """Số tác vụ đang chạy / đang chờ và các counter"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'torch_threads': self.torch_threads or torch.get_num_threads(),
+                'running': self._running,
+                'queue_depth': self._in_flight - self._running,
+                'capacity': self.capacity,
+                'completed': self._completed,
+                'rejected': self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Dừng pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+
+    def _run(self, fn: Callable, args, kwargs):
+        """Wrapper đếm số tác vụ đang chạy"""
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _on_done(self, _future: Future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
@@ -0,0 +1,133 @@
+"""
+CTC Forced Alignment Module
+===========================
+
+Căn chỉnh chuỗi token mong đợi (phone của script) với log-prob CTC theo từng frame:
+- Viterbi trên trellis CTC (blank, y1, blank, y2, ..., blank), vector hóa theo trạng
+  thái bằng numpy - mỗi frame chỉ vài phép tính trên mảng 2N+1 phần tử
+- Trả về khoảng frame [start, end) của từng token target; từ đó suy ra thời gian của
+  từng phone và từng từ trong script
+- Thời gian theo frame được dùng để chia phone dự đoán (greedy / beam search) vào các
+  từ của script (segmentation policy 'forced')
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def ctc_forced_align(log_probs: np.ndarray, targets: np.ndarray, blank_id: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Viterbi forced alignment
+
+    Args:
+        log_probs: Log-prob (frames, vocab) - đã qua log_softmax
+        targets: Chuỗi token id mong đợi (không chứa blank)
+        blank_id: Id của CTC blank
+
+    Returns:
+        Tuple (starts, ends): frame bắt đầu và frame kết thúc + 1 của từng token target,
+        hoặc None nếu không căn được (audio quá ngắn so với số token, hoặc không có target)
+    """
+    frames = log_probs.shape[0]
+    count = len(targets)
+    if count == 0 or frames == 0:
+        return None
+    # CTC cần ít nhất một frame mỗi token, thêm một blank giữa hai token giống nhau liền kề
+    repeats = int(np.count_nonzero(targets[1:] == targets[:-1]))
+    if frames < count + repeats:
+        return None
+
+    states = 2 * count + 1
+    extended = np.full(states, blank_id, dtype=np.int64)
+    extended[1::2] = targets
+    # Được nhảy qua blank (s - 2 -> s) khi s là token và khác token trước đó
+    can_skip = np.zeros(states, dtype=bool)
+    can_skip[3::2] = targets[1:] != targets[:-1]
+
+    emit = log_probs[:, extended]
+    score = np.full(states, -np.inf)
+    score[:2] = emit[0, :2]
+    # 0 = ở lại trạng thái cũ, 1 = từ s - 1, 2 = từ s - 2
+    back = np.zeros((frames, states), dtype=np.int8)
+    prev1 = np.empty(states)
+    prev2 = np.empty(states)
+    for t in range(1, frames):
+        prev1[0] = -np.inf
+        prev1[1:] = score[:-1]
+        prev2[:2] = -np.inf
+        prev2[2:] = score[:-2]
+        prev2[~can_skip] = -np.inf
+
+        step = (prev1 > score).astype(np.int8)
+        best = np.maximum(score, prev1)
+        use_skip = prev2 > best
+        step[use_skip] = 2
+        score = np.where(use_skip, prev2, best) + emit[t]
+        back[t] = step
+
+    # Kết thúc ở token cuối hoặc blank cuối
+    state = states - 1 if score[-1] >= score[-2] else states - 2
+    if not np.isfinite(score[state]):
+        return None
+    path = np.empty(frames, dtype=np.int64)
+    for t in range(frames - 1, -1, -1):
+        path[t] = state
+        state -= back[t, state]
+
+    # Frame của token n là các frame ở trạng thái 2n + 1 (liên tiếp theo cấu trúc trellis)
+    token_frames = path % 2 == 1
+    token_index = path[token_frames] // 2
+    frame_index = np.flatnonzero(token_frames)
+    starts = np.full(count, -1, dtype=np.int64)
+    ends = np.full(count, -1, dtype=np.int64)
+    first = np.concatenate([[True], token_index[1:] != token_index[:-1]])
+    last = np.concatenate([token_index[1:] != token_index[:-1], [True]])
+    starts[token_index[first]] = frame_index[first]
+    ends[token_index[last]] = frame_index[last] + 1
+    return starts, ends
+
+
+def group_spans(starts: np.ndarray, ends: np.ndarray, sizes: List[int]) -> List[Optional[Tuple[int, int]]]:
+    """
+    Gộp khoảng frame của các token liên tiếp thành khoảng của từng nhóm (phone hoặc từ)
+
+    Args:
+        starts, ends: Khoảng frame của từng token
+        sizes: Số token của từng nhóm theo thứ tự (nhóm 0 token nhận None)
+
+    Returns:
+        List: (start, end) hoặc None cho từng nhóm
+    """
+    spans, offset = [], 0
+    for size in sizes:
+        if size:
+            spans.append((int(starts[offset]), int(ends[offset + size - 1])))
+        else:
+            spans.append(None)
+        offset += size
+    return spans
+
+
+def assign_by_time(token_spans: List[Tuple[int, int]], word_spans: List[Optional[Tuple[int, int]]]) -> List[int]:
+    """
+    Gán từng token dự đoán cho một từ theo thời gian: ranh giới giữa hai từ liền kề
+    (có thời gian) là điểm giữa khoảng trống giữa chúng; token thuộc từ chứa điểm giữa
+    khoảng frame của nó
+
+    Args:
+        token_spans: Khoảng frame [start, end) của từng token dự đoán
+        word_spans: Khoảng frame của từng từ (None với từ không căn được)
+
+    Returns:
+        List[int]: Chỉ số từ cho từng token
+    """
+    timed = [i for i, span in enumerate(word_spans) if span is not None]
+    if not timed:
+        return [0] * len(token_spans)
+    boundaries = np.array([
+        (word_spans[a][1] + word_spans[b][0]) / 2.0 for a, b in zip(timed[:-1], timed[1:])
+    ])
+    mids = np.array([(start + end) / 2.0 for start, end in token_spans])
+    slots = np.searchsorted(boundaries, mids, side='right') if len(mids) else np.zeros(0, dtype=np.int64)
+    return [timed[slot] for slot in slots.tolist()]
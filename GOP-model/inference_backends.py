@@ -0,0 +1,167 @@
+"""
+Inference Backends Module
+=========================
+
+Các backend chạy forward pass của CTC model trên CPU, cùng một interface logits:
+- torch: model PyTorch fp32 như khi load từ HuggingFace
+- int8: model PyTorch được dynamic quantize (các lớp Linear chạy int8)
+- onnx: model được export sang ONNX và chạy bằng ONNX Runtime
+
+Backend nhận `input_values` (và `attention_mask` nếu model dùng) đã qua processor,
+trả về logits tensor float32 (batch, frames, vocab).
+ONNX Runtime là dependency tùy chọn: `pip install onnx onnxruntime`.
+"""
+
+import os
+import re
+from typing import Optional
+
+import torch
+
+BACKENDS = ('torch', 'int8', 'onnx')
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'onnx')
+
+
+class InferenceBackend:
+    """Interface chung: gọi với input đã qua processor, trả về logits (batch, frames, vocab)"""
+
+    name = 'base'
+    # False nếu backend giữ thread pool riêng, không dùng được trong process con sau fork
+    fork_safe = True
+
+    def __call__(self, input_values: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """Forward pass eager PyTorch"""
+
+    name = 'torch'
+
+    def __init__(self, model: torch.nn.Module):
+        self.model = model
+
+    def __call__(self, input_values: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model(input_values=input_values, attention_mask=attention_mask).logits
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    Dynamic int8 quantization: weight của các lớp Linear được lượng tử hóa sẵn,
+    activation được lượng tử hóa lúc chạy. Feature encoder (Conv1d) vẫn chạy fp32.
+    """
+
+    name = 'int8'
+
+    def __init__(self, model: torch.nn.Module):
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        quantized.eval()
+        super().__init__(quantized)
+
+
+class _CTCLogitsWrapper(torch.nn.Module):
+    """Bọc model HuggingFace để export chỉ trả về logits"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values, attention_mask=None):
+        return self.model(input_values=input_values, attention_mask=attention_mask).logits
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    Chạy model bằng ONNX Runtime (CPUExecutionProvider)
+
+    Model được export một lần (trục batch và số sample là dynamic) rồi lưu vào
+    `onnx_dir`; các lần khởi động sau chỉ load file .onnx đã có.
+    """
+
+    name = 'onnx'
+    fork_safe = False  # ONNX Runtime tạo thread pool khi tạo session
+
+    def __init__(self, model: torch.nn.Module, model_name: str, uses_attention_mask: bool, onnx_dir: Optional[str] = None):
+        """
+        Khởi tạo OnnxBackend
+
+        Args:
+            model: Model PyTorch (chỉ dùng để export khi chưa có file .onnx)
+            model_name: Tên model, dùng để đặt tên file
+            uses_attention_mask: Model có nhận attention_mask hay không
+            onnx_dir: Thư mục lưu file .onnx (mặc định env GOP_ONNX_DIR hoặc data/onnx)
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("ONNX backend requires onnxruntime: pip install onnx onnxruntime") from e
+
+        onnx_dir = onnx_dir or os.getenv('GOP_ONNX_DIR', DEFAULT_ONNX_DIR)
+        safe_name = re.sub(r'[^\w.-]+', '_', model_name.strip('/'))
+        suffix = '_mask' if uses_attention_mask else ''
+        self.path = os.path.join(onnx_dir, f"{safe_name}{suffix}.onnx")
+        self.uses_attention_mask = uses_attention_mask
+        if not os.path.exists(self.path):
+            self.export(model, self.path, uses_attention_mask)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = torch.get_num_threads()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def export(model: torch.nn.Module, path: str, uses_attention_mask: bool):
+        """Export model sang ONNX (ghi file tạm rồi đổi tên để tránh file dở dang)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        wrapper = _CTCLogitsWrapper(model).eval()
+        dummy = torch.randn(1, 16000)
+        args = (dummy, torch.ones_like(dummy, dtype=torch.long)) if uses_attention_mask else (dummy,)
+        input_names = ['input_values', 'attention_mask'] if uses_attention_mask else ['input_values']
+        dynamic_axes = {name: {0: 'batch', 1: 'samples'} for name in input_names}
+        dynamic_axes['logits'] = {0: 'batch', 1: 'frames'}
+
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapper, args, tmp_path,
+                input_names=input_names,
+                output_names=['logits'],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+            )
+        os.replace(tmp_path, path)
+
+    def __call__(self, input_values: torch.Tensor, attention_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        feeds = {'input_values': input_values.numpy()}
+        if 'attention_mask' in self._input_names:
+            if attention_mask is None:
+                attention_mask = torch.ones_like(input_values, dtype=torch.long)
+            feeds['attention_mask'] = attention_mask.to(torch.long).numpy()
+        logits = self.session.run(['logits'], feeds)[0]
+        return torch.from_numpy(logits)
+
+
+def create_backend(kind: str, model: torch.nn.Module, model_name: str, uses_attention_mask: bool) -> InferenceBackend:
+    """
+    Tạo backend theo tên
+
+    Args:
+        kind: 'torch', 'int8' hoặc 'onnx'
+        model: Model PyTorch đã load (eval mode)
+        model_name: Tên model
+        uses_attention_mask: Model có nhận attention_mask hay không
+
+    Returns:
+        InferenceBackend
+    """
+    if kind == 'torch':
+        return TorchBackend(model)
+    if kind == 'int8':
+        return QuantizedTorchBackend(model)
+    if kind == 'onnx':
+        return OnnxBackend(model, model_name, uses_attention_mask)
+    raise ValueError(f"Unknown inference backend {kind!r}, expected one of {BACKENDS}")
@@ -0,0 +1,243 @@
+"""
+Pronunciation Lexicon Module
+============================
+
+Module quản lý từ điển phát âm (CMUDict) dưới dạng index nhị phân đã biên dịch sẵn:
+- Biên dịch CMUDict (đã chuyển ARPAbet -> IPA qua PhonemeMapper) thành một file index
+- Load index bằng mmap trong vài mili giây, các worker process dùng chung page cache
+- Tra cứu bằng binary search, trả về trực tiếp danh sách phoneme IPA
+
+Cấu trúc file (byte order của máy build, các section được căn lề 4 byte):
+    magic (8) | header: version, n_words, n_phones, len(phone_table), len(words_blob), len(pron_blob) (u32 x 6)
+    | fingerprint (16) | phone_table (JSON) | word_offsets (u32 x n_words+1) | words_blob (UTF-8, đã sắp xếp)
+    | pron_offsets (u32 x n_words+1) | pron_blob (u16 phone id)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from phoneme_mapper import PhonemeMapper
+
+MAGIC = b'GOPLEX1\0'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('=6I')
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cmudict_ipa.idx')
+
+
+def _pad4(n: int) -> int:
+    return (4 - n % 4) % 4
+
+
+def ensure_cmudict():
+    """Đảm bảo CMUDict đã được download từ NLTK"""
+    import nltk
+    try:
+        from nltk.corpus import cmudict
+        cmudict.ensure_loaded()
+    except LookupError:
+        print("Downloading CMUDict...")
+        nltk.download('cmudict', quiet=True)
+
+
+def mapping_fingerprint(mapper: PhonemeMapper) -> bytes:
+    """Fingerprint của bảng ARPAbet -> IPA, dùng để phát hiện index đã cũ"""
+    payload = json.dumps(
+        {'version': FORMAT_VERSION, 'byteorder': sys.byteorder, 'arpabet_to_ipa': mapper.arpabet_to_ipa},
+        sort_keys=True,
+    )
+    return hashlib.md5(payload.encode('utf-8')).digest()
+
+
+class PronunciationLexicon:
+    """
+    Từ điển phát âm chỉ đọc, map trực tiếp từ file index
+
+    Chức năng chính:
+    - Biên dịch CMUDict thành file index (`build`)
+    - Load index qua mmap (constructor, `load_or_build`)
+    - Tra cứu phoneme IPA của một từ (`lookup`)
+    """
+
+    def __init__(self, path: str):
+        """
+        Mở file index đã biên dịch
+
+        Args:
+            path: Đường dẫn file index
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buf = memoryview(self._mm)
+        if bytes(buf[:8]) != MAGIC:
+            raise ValueError(f"File không phải lexicon index: {path}")
+        version, n_words, n_phones, table_len, words_len, pron_len = _HEADER.unpack_from(buf, 8)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Lexicon index version {version} không được hỗ trợ")
+
+        pos = 8 + _HEADER.size
+        self.fingerprint = bytes(buf[pos:pos + 16])
+        pos += 16
+        self.phones: List[str] = json.loads(bytes(buf[pos:pos + table_len]).decode('utf-8'))
+        pos += table_len + _pad4(table_len)
+        self._word_offsets = buf[pos:pos + 4 * (n_words + 1)].cast('I')
+        pos += 4 * (n_words + 1)
+        self._words = buf[pos:pos + words_len]
+        pos += words_len + _pad4(words_len)
+        self._pron_offsets = buf[pos:pos + 4 * (n_words + 1)].cast('I')
+        pos += 4 * (n_words + 1)
+        self._prons = buf[pos:pos + pron_len].cast('H')
+        self._n_words = n_words
+
+    def __len__(self) -> int:
+        return self._n_words
+
+    def __contains__(self, word: str) -> bool:
+        return self._find(word) >= 0
+
+    def _word_at(self, i: int) -> bytes:
+        return bytes(self._words[self._word_offsets[i]:self._word_offsets[i + 1]])
+
+    def _find(self, word: str) -> int:
+        """Binary search theo UTF-8 bytes; trả về -1 nếu không có"""
+        key = word.encode('utf-8')
+        lo, hi = 0, self._n_words
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n_words and self._word_at(lo) == key:
+            return lo
+        return -1
+
+    def lookup_ids(self, word: str) -> Optional[memoryview]:
+        """Phone id (chỉ số trong `self.phones`) của từ, None nếu không có trong từ điển"""
+        i = self._find(word)
+        if i < 0:
+            return None
+        return self._prons[self._pron_offsets[i]:self._pron_offsets[i + 1]]
+
+    def lookup(self, word: str) -> Optional[List[str]]:
+        """
+        Tra cứu phát âm IPA của một từ (phát âm đầu tiên trong CMUDict, bỏ stress)
+
+        Args:
+            word: Từ cần tra (chữ thường)
+
+        Returns:
+            Optional[List[str]]: Danh sách phoneme IPA, None nếu không có trong từ điển
+        """
+        ids = self.lookup_ids(word)
+        if ids is None:
+            return None
+        phones = self.phones
+        return [phones[i] for i in ids]
+
+    def close(self):
+        """Giải phóng mmap"""
+        self._word_offsets.release()
+        self._words.release()
+        self._pron_offsets.release()
+        self._prons.release()
+        self._mm.close()
+
+    @staticmethod
+    def compile(entries: Iterable[Tuple[str, List[str]]], path: str, fingerprint: bytes = b'\0' * 16):
+        """
+        Ghi danh sách (word, ipa_phones) thành file index
+
+        File được ghi ra file tạm rồi `os.replace`, nên nhiều process cùng build
+        không làm hỏng index.
+        """
+        entries = sorted((w.encode('utf-8'), phones) for w, phones in entries)
+
+        phone_ids: Dict[str, int] = {}
+        word_offsets, pron_offsets = array('I', [0]), array('I', [0])
+        words_blob, prons = bytearray(), array('H')
+        for key, phones in entries:
+            words_blob += key
+            word_offsets.append(len(words_blob))
+            for p in phones:
+                prons.append(phone_ids.setdefault(p, len(phone_ids)))
+            pron_offsets.append(len(prons))
+
+        table = json.dumps(list(phone_ids), ensure_ascii=False).encode('utf-8')
+        prons_bytes = prons.tobytes()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER.pack(FORMAT_VERSION, len(entries), len(phone_ids), len(table), len(words_blob), len(prons_bytes)))
+            f.write(fingerprint)
+            f.write(table + b'\0' * _pad4(len(table)))
+            f.write(word_offsets.tobytes())
+            f.write(bytes(words_blob) + b'\0' * _pad4(len(words_blob)))
+            f.write(pron_offsets.tobytes())
+            f.write(prons_bytes)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def build(cls, mapper: PhonemeMapper, path: str = DEFAULT_INDEX_PATH) -> 'PronunciationLexicon':
+        """
+        Biên dịch CMUDict của NLTK thành file index IPA
+
+        Args:
+            mapper: PhonemeMapper dùng để chuyển ARPAbet -> IPA
+            path: Đường dẫn file index đầu ra
+
+        Returns:
+            PronunciationLexicon: Lexicon đã load từ file vừa build
+        """
+        ensure_cmudict()
+        from nltk.corpus import cmudict
+
+        entries = (
+            (word, mapper.arpabet_to_ipa_list(prons[0], ignore_stress=True))
+            for word, prons in cmudict.dict().items()
+            if prons
+        )
+        cls.compile(entries, path, mapping_fingerprint(mapper))
+        return cls(path)
+
+    @classmethod
+    def load_or_build(cls, mapper: PhonemeMapper, path: Optional[str] = None) -> 'PronunciationLexicon':
+        """
+        Load index nếu đã có và khớp với bảng mapping hiện tại, nếu không thì build lại
+
+        Args:
+            mapper: PhonemeMapper dùng để chuyển ARPAbet -> IPA
+            path: Đường dẫn file index (mặc định: env GOP_LEXICON_PATH hoặc data/cmudict_ipa.idx)
+        """
+        path = path or os.getenv('GOP_LEXICON_PATH') or DEFAULT_INDEX_PATH
+        if os.path.exists(path):
+            try:
+                lexicon = cls(path)
+                if lexicon.fingerprint == mapping_fingerprint(mapper):
+                    return lexicon
+                lexicon.close()
+            except ValueError as e:
+                print(f"Lexicon index không hợp lệ, build lại: {e}")
+        return cls.build(mapper, path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Biên dịch CMUDict thành lexicon index IPA")
+    parser.add_argument('--output', default=os.getenv('GOP_LEXICON_PATH') or DEFAULT_INDEX_PATH)
+    parser.add_argument('--data-path', default='.')
+    args = parser.parse_args()
+
+    lex = PronunciationLexicon.build(PhonemeMapper(args.data_path), args.output)
+    print(f"Wrote {len(lex)} entries ({len(lex.phones)} phones) to {args.output}")
@@ -0,0 +1,229 @@
+"""
+Metrics Module
+==============
+
+Instrumentation nhẹ cho pipeline chấm điểm, không cần thư viện ngoài:
+- Counter và Histogram có label, an toàn khi dùng từ nhiều thread (mỗi lần ghi chỉ
+  một lock + bisect)
+- `stage_timer`: đo thời gian một stage, ghi vào dict timings của request (để trả về
+  trong metadata) và vào histogram theo stage
+- Collector: hàm trả về các giá trị tại thời điểm scrape (kích thước hàng đợi, thống kê
+  cache) thay vì phải cập nhật liên tục
+- Xuất toàn bộ registry theo Prometheus text format (version 0.0.4)
+
+Mỗi process có registry riêng: với prefork, mỗi lần scrape /metrics chỉ thấy số liệu
+của worker trả lời request đó.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket mặc định (giây) cho latency từ vài ms (tokenize, align) đến vài chục giây (audio dài)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+AUDIO_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+RTF_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+# (tên metric, type, help, [(labels, giá trị)]) do collector trả về
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{k}="' + str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for k, v in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+    """Counter tăng dần, có label"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Counter không label luôn được xuất (kể cả khi = 0) để rate() có điểm bắt đầu
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Histogram với bucket cố định (cumulative khi xuất), có label"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Mỗi label set: [count theo bucket (+ bucket +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        entry = self._values.get(key)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self.name + '_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, cumulative
+
+
+class MetricsRegistry:
+    """Tập các metric và collector của process, xuất theo Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], List[Family]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS, labelnames: Sequence[str] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name!r} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[Family]]):
+        """Thêm hàm được gọi mỗi lần render, trả về list (name, type, help, samples)"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Toàn bộ metric theo Prometheus text format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in list(self._collectors):
+            try:
+                families = collector()
+            except Exception as e:
+                # Một collector lỗi không được làm hỏng cả lần scrape
+                lines.append(f"# collector error: {e}".replace('\n', ' '))
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'gop_stage_duration_seconds', 'Duration of each scoring pipeline stage', labelnames=('stage',)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'gop_request_duration_seconds', 'HTTP request latency', labelnames=('endpoint', 'status')
+)
+AUDIO_SECONDS = REGISTRY.histogram(
+    'gop_audio_duration_seconds', 'Duration of scored audio', buckets=AUDIO_BUCKETS
+)
+REAL_TIME_FACTOR = REGISTRY.histogram(
+    'gop_real_time_factor', 'Scoring time divided by audio duration', buckets=RTF_BUCKETS
+)
+FALLBACK_DECODES = REGISTRY.counter(
+    'gop_fallback_decodes_total', 'Utterances decoded with the transformers pipeline fallback'
+)
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str):
+    """
+    Đo thời gian của một stage: ghi vào histogram STAGE_SECONDS và (nếu có) vào
+    `timings[stage]` theo ms
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(elapsed * 1000, 3)
+
+
+def cache_families(caches: Dict[str, Dict]) -> List[Family]:
+    """
+    Chuyển thống kê cache (`stats()` của LRUCache / DiskCache / TieredCache) thành metric:
+    hits / misses / evictions (counter) và size (gauge), label theo cache và tầng
+    """
+    hits, misses, evictions, sizes = [], [], [], []
+    for cache, stats in caches.items():
+        tiers = {tier: stats[tier] for tier in ('memory', 'disk') if isinstance(stats.get(tier), dict)}
+        for tier, tier_stats in (tiers or {'memory': stats}).items():
+            labels = {'cache': cache, 'tier': tier}
+            hits.append((labels, tier_stats.get('hits', 0)))
+            misses.append((labels, tier_stats.get('misses', 0)))
+            evictions.append((labels, tier_stats.get('evictions', 0)))
+            if 'size' in tier_stats:
+                sizes.append((labels, tier_stats['size']))
+    return [
+        ('gop_cache_hits_total', 'counter', 'Cache hits', hits),
+        ('gop_cache_misses_total', 'counter', 'Cache misses', misses),
+        ('gop_cache_evictions_total', 'counter', 'Cache evictions', evictions),
+        ('gop_cache_entries', 'gauge', 'Entries currently held in memory', sizes),
+    ]
@@ -6,11 +6,26 @@ Module xử lý việc mapping và chuẩn hóa phoneme:
 - Chuyển đổi giữa ARPAbet và IPA
 - Tokenize chuỗi IPA
 - Tính độ tương đồng giữa các phoneme
+- Inventory phone -> id (số nguyên nhỏ): chuỗi phone trong pipeline là array('H') các id,
+  chuẩn hóa và độ tương đồng là bảng tra theo id; chuỗi ký tự chỉ được tạo lại khi xuất kết quả.
+  Inventory cố định (file data + vocab của decoder); phone khác dùng chung id UNK_ID
 """
 
 import json
 import os
-from typing import List, Dict, Tuple
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Phone ngoài inventory (từ giữ nguyên khi G2P thất bại, token ARPAbet lạ '[XX]'...) dùng
+# chung một id: không match với phone nào, kể cả chính nó. Chuỗi gốc được giữ ở phía caller
+UNK_ID = 0
+UNK_PHONE = '[UNK]'
+# Giới hạn inventory: ma trận tương đồng K x K và id vừa array('H')
+MAX_PHONES = 4096
 
 
 class PhonemeMapper:
@@ -81,6 +96,12 @@ class PhonemeMapper:
                 
         # Tạo ma trận tương đồng phoneme
         self._build_similarity_matrix()
+
+        # Inventory phone -> id (dùng cho tokenizer, chuẩn hóa, ma trận tương đồng và alignment theo id)
+        self._build_phone_inventory()
+
+        # Biên dịch tokenizer một lần
+        self._compile_tokenizer()
     
     def _build_similarity_matrix(self):
         """
@@ -112,6 +133,114 @@ class PhonemeMapper:
         if not hasattr(self, 'merge_pairs'):
             self.merge_pairs = {}
     
+    def _build_phone_inventory(self):
+        """
+        Khởi tạo inventory phone -> id với các phoneme đã biết từ file data
+
+        Ký tự trong vocab của decoder được thêm qua `register_phones` khi load model. Phone
+        không có trong inventory (từ text của client) không được thêm, mà map sang UNK_ID.
+        """
+        self._inventory_lock = threading.Lock()
+        self._phone_to_id: Dict[str, int] = {}
+        self.id_to_phone: List[str] = []
+        # _normalize_table[id] = id của phone sau normalize_ipa_variants
+        self._normalize_table = array('H')
+        self._similarity_array = np.zeros((0, 0), dtype=np.float32)
+
+        known = list(self.ipa_phones)
+        known += [p for p in self.arpabet_to_ipa.values() if p]
+        known += list(self.merge_pairs.values()) + list(self.equiv_pairs.values())
+        known += list(self.normalize_ipa_variants_map.keys()) + list(self.normalize_ipa_variants_map.values())
+        for group_pair in self.similarity:
+            known += list(group_pair)
+        self.register_phones([UNK_PHONE] + known)
+
+    def register_phones(self, phones: Iterable[str]) -> int:
+        """
+        Thêm các phone vào inventory cố định (file data khi khởi tạo, vocab decoder khi load model)
+
+        Returns:
+            int: Số phone không thêm được vì inventory đã đủ MAX_PHONES
+        """
+        dropped = 0
+        with self._inventory_lock:
+            for phone in phones:
+                if self._intern(phone) == UNK_ID and phone != UNK_PHONE:
+                    dropped += 1
+        if dropped:
+            print(f"Phone inventory full ({MAX_PHONES}): {dropped} phones map to {UNK_PHONE}")
+        return dropped
+
+    def phone_id(self, phone: str) -> int:
+        """Id của một phone trong inventory, UNK_ID nếu không có"""
+        return self._phone_to_id.get(phone, UNK_ID)
+
+    def _intern(self, phone: str) -> int:
+        """Thêm phone (và dạng chuẩn hóa của nó) vào inventory; gọi khi đang giữ _inventory_lock"""
+        pid = self._phone_to_id.get(phone)
+        if pid is not None:
+            return pid
+        normalized = self.normalize_ipa_variants_map.get(phone, phone)
+        if len(self.id_to_phone) + (normalized != phone) >= MAX_PHONES:
+            return UNK_ID
+        pid = len(self.id_to_phone)
+        self._normalize_table.append(pid)
+        self.id_to_phone.append(phone)
+        self._phone_to_id[phone] = pid
+        if normalized != phone:
+            self._normalize_table[pid] = self._intern(normalized)
+        return pid
+
+    def phone_ids(self, phones: List[str]) -> array:
+        """Chuyển danh sách phone thành chuỗi id (array('H')); phone ngoài inventory thành UNK_ID"""
+        lookup = self._phone_to_id
+        return array('H', [lookup.get(p, UNK_ID) for p in phones])
+
+    def phones_from_ids(self, ids, originals: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Chuyển chuỗi id về danh sách phone (chỉ dùng khi xuất kết quả)
+
+        Args:
+            ids: Chuỗi id phone
+            originals: Chuỗi phone gốc cùng độ dài với `ids`; vị trí UNK_ID lấy phone gốc ở đây
+        """
+        phones = self.id_to_phone
+        if originals is None:
+            return [phones[i] for i in ids]
+        return [originals[k] if i == UNK_ID else phones[i] for k, i in enumerate(ids)]
+
+    def normalize_ids(self, ids: array) -> array:
+        """normalize_ipa_variants trên chuỗi id: một lần tra bảng cho mỗi phone"""
+        table = self._normalize_table
+        return array('H', [table[i] for i in ids])
+
+    def similarity_array(self) -> np.ndarray:
+        """
+        Ma trận tương đồng (K x K, float32) theo phone id: `S[i, j] = get_similarity(phone_i, phone_j)`
+
+        Ma trận được tính một lần và chỉ bổ sung hàng/cột cho các phone mới thêm vào inventory.
+        """
+        size = len(self.id_to_phone)
+        matrix = self._similarity_array
+        if matrix.shape[0] >= size:
+            return matrix
+        with self._inventory_lock:
+            matrix = self._similarity_array
+            size = len(self.id_to_phone)
+            old = matrix.shape[0]
+            if old >= size:
+                return matrix
+            grown = np.zeros((size, size), dtype=np.float32)
+            grown[:old, :old] = matrix
+            phones = self.id_to_phone[:size]
+            for i in range(size):
+                for j in range(old if i < old else 0, size):
+                    grown[i, j] = self.get_similarity(phones[i], phones[j])
+                    grown[j, i] = self.get_similarity(phones[j], phones[i])
+            grown[UNK_ID, UNK_ID] = 0.0  # hai phone ngoài inventory không được coi là giống nhau
+            self._similarity_array = grown
+            return grown
+
     def get_similarity(self, p1: str, p2: str) -> float:
         """
         Tính độ tương đồng giữa hai phoneme
@@ -139,6 +268,29 @@ class PhonemeMapper:
         # fallback to similarity matrix on canonical forms
         return self.similarity.get((p1c, p2c), self.similarity.get((p1, p2), 0.0))  # Mặc định: không tương đồng
     
+    def _compile_tokenizer(self):
+        """
+        Biên dịch sẵn các bảng dùng cho tokenize_ipa (chạy một lần khi load mapping)
+        """
+        # Regex alternation theo độ dài giảm dần: re thử các nhánh theo thứ tự nên luôn
+        # match phoneme dài nhất trước; '\S' là fallback một ký tự khi không match được
+        phones_by_len = sorted(self.ipa_phones, key=len, reverse=True)
+        self._phone_pattern = re.compile('|'.join(re.escape(p) for p in phones_by_len if p) + r'|\S')
+
+        # Bảng tra merge/equiv cho cả hai chiều; chiều thuận được ưu tiên khi trùng.
+        # Khóa là cặp id gói thành một int (a << 16 | b), giá trị là id của phone kết quả
+        self._merge_lookup = self._pair_table(self.merge_pairs)
+        self._equiv_lookup = self._pair_table(self.equiv_pairs)
+
+    def _pair_table(self, pairs: Dict[Tuple[str, str], str]) -> Dict[int, int]:
+        """Bảng (id_a << 16 | id_b) -> id cho cả hai chiều của các cặp phone"""
+        table = {}
+        for (a, b), v in pairs.items():
+            table[self.phone_id(b) << 16 | self.phone_id(a)] = self.phone_id(v)
+        for (a, b), v in pairs.items():
+            table[self.phone_id(a) << 16 | self.phone_id(b)] = self.phone_id(v)
+        return table
+
     def tokenize_ipa(self, text: str) -> List[str]:
         """
         Tokenize chuỗi IPA thành danh sách các phoneme
@@ -150,74 +302,59 @@ class PhonemeMapper:
         Returns:
             List[str]: Danh sách các phoneme
         """
+        ids = self.tokenize_ipa_ids(text)
+        if UNK_ID not in ids:
+            return self.phones_from_ids(ids)
+        # Phone ngoài inventory không tham gia merge / equiv, nên chúng ra theo đúng thứ tự
+        # trong kết quả regex
+        lookup = self._phone_to_id
+        unknown = iter([p for p in self._phone_pattern.findall(text) if p not in lookup])
+        phones = self.id_to_phone
+        return [next(unknown) if i == UNK_ID else phones[i] for i in ids]
+
+    def tokenize_ipa_ids(self, text: str) -> array:
+        """
+        Như tokenize_ipa nhưng trả về chuỗi id phone (array('H'))
+
+        Args:
+            text: Chuỗi IPA cần tokenize
+
+        Returns:
+            array: Id của các phoneme
+        """
         if not text:
-            return []
-            
-        phones = []
-        # Sắp xếp phoneme theo độ dài giảm dần để match từ dài nhất trước
-        phones_by_len = sorted(self.ipa_phones, key=len, reverse=True)
-        
-        # Xử lý từng chunk (được phân tách bởi space)
-        for chunk in text.strip().split():
-            i = 0
-            while i < len(chunk):
-                matched = None
-                
-                # Tìm phoneme dài nhất match từ vị trí i
-                for phone in phones_by_len:
-                    if chunk.startswith(phone, i):
-                        matched = phone
-                        break
-                
-                if matched:
-                    phones.append(matched)
-                    i += len(matched)
-                else:
-                    # Nếu không match được, thêm ký tự đơn lẻ
-                    phones.append(chunk[i])
-                    i += 1
-                    
-        # Sau khi token hóa thô, áp dụng các luật merge 
-        merged = []
-        i = 0
-        while i < len(phones):
-            if i + 1 < len(phones):
-                pair = (phones[i], phones[i+1])
-                # Nếu có cặp merge, gộp
-                if pair in self.merge_pairs:
-                    merged.append(self.merge_pairs[pair])
-                    i += 2
-                    continue
-                # Thử đảo cặp
-                rev_pair = (phones[i+1], phones[i])
-                if rev_pair in self.merge_pairs:
-                    merged.append(self.merge_pairs[rev_pair])
-                    i += 2
-                    continue
-
-            # Nếu không merge được, thêm phone hiện tại
-            merged.append(phones[i])
-            i += 1
-
-        # Tiếp: collapse các cặp theo equiv_pairs
-        collapsed = []
-        i = 0
-        while i < len(merged):
-            if i + 1 < len(merged):
-                pair = (merged[i], merged[i+1])
-                if pair in self.equiv_pairs:
-                    collapsed.append(self.equiv_pairs[pair])
-                    i += 2
-                    continue
-                rev = (merged[i+1], merged[i])
-                if rev in self.equiv_pairs:
-                    collapsed.append(self.equiv_pairs[rev])
-                    i += 2
-                    continue
-
-            collapsed.append(merged[i])
-            i += 1
+            return array('H')
+
+        # Token hóa thô bằng regex đã biên dịch (khoảng trắng là ranh giới chunk)
+        lookup = self._phone_to_id
+        phones = [lookup.get(p, UNK_ID) for p in self._phone_pattern.findall(text)]
+        merge_lookup = self._merge_lookup
+        equiv_lookup = self._equiv_lookup
+
+        # Một lượt duyệt duy nhất: áp dụng luật merge, rồi đưa ngay phone vừa merge
+        # qua bước collapse equiv_pairs (giữ một phone chờ để ghép cặp với phone kế tiếp)
+        collapsed = array('H')
+        pending = None
+        i, n = 0, len(phones)
+        while i < n:
+            phone = phones[i]
+            if i + 1 < n and (phone << 16 | phones[i + 1]) in merge_lookup:
+                phone = merge_lookup[phone << 16 | phones[i + 1]]
+                i += 2
+            else:
+                i += 1
+
+            if pending is None:
+                pending = phone
+            elif (pending << 16 | phone) in equiv_lookup:
+                collapsed.append(equiv_lookup[pending << 16 | phone])
+                pending = None
+            else:
+                collapsed.append(pending)
+                pending = phone
 
+        if pending is not None:
+            collapsed.append(pending)
         return collapsed
 
     def normalize_ipa_variants(self, phones: List[str]) -> List[str]:
@@ -0,0 +1,134 @@
+"""
+Prefork Serving Module
+======================
+
+Chạy nhiều worker process dùng chung một bản model trong bộ nhớ:
+- Process cha import server, load model + backend + warmup và dữ liệu read-only (lexicon, cache)
+- `gc.freeze()` để GC không ghi vào các object đã có, giữ trang bộ nhớ ở trạng thái shared
+- Fork N worker, mỗi worker chạy uvicorn trên cùng một listening socket
+- Các page bộ nhớ (weights của model...) được chia sẻ copy-on-write giữa các worker
+- Process cha giám sát và fork lại worker bị chết
+
+Process cha chỉ dùng một torch intra-op thread khi warmup (OpenMP thread pool không
+sống sót qua fork); số thread của từng worker được áp dụng khi worker nhận request đầu tiên.
+
+Ví dụ:
+    python prefork.py --workers 4 --port 5005
+    GOP_PREFORK_WORKERS=4 python prefork.py
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+
+def _bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Tạo listening socket dùng chung cho tất cả worker"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(server_module, sock: socket.socket, log_level: str):
+    """Chạy trong process con: khôi phục signal mặc định rồi chạy uvicorn trên socket dùng chung"""
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server_module.scorer.ctc_decoder.after_fork()
+
+    config = uvicorn.Config(server_module.app, log_level=log_level, lifespan='on')
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str = '0.0.0.0', port: int = 5005, workers: int = 2, log_level: str = 'info'):
+    """
+    Load mọi thứ trong process cha rồi fork `workers` worker process
+
+    Args:
+        host: Địa chỉ bind
+        port: Cổng bind
+        workers: Số worker process
+        log_level: Log level của uvicorn
+    """
+    import torch
+
+    # Process cha không được khởi tạo OpenMP thread pool trước khi fork
+    torch.set_num_threads(1)
+
+    import server
+
+    if not server.executor.torch_threads:
+        # Chia đều số core cho các worker nếu không cấu hình GOP_TORCH_THREADS
+        server.executor.torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    server.run_startup()
+    if not server.startup.ready:
+        sys.exit(f"Startup failed: {server.startup.error}")
+
+    sock = _bind_socket(host, port)
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(server, sock, log_level)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+        print(f"Started worker {slot} (pid {pid})")
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for slot in range(workers):
+        spawn(slot)
+    print(f"Serving on {host}:{port} with {workers} workers (pid {os.getpid()})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            print(f"Worker {slot} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(0.5)
+            spawn(slot)
+    sock.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prefork server: load model một lần, fork nhiều worker')
+    parser.add_argument('--host', default=os.getenv('GOP_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('GOP_PORT', '5005')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('GOP_PREFORK_WORKERS', '2')))
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.log_level)
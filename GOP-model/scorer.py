@@ -9,15 +9,44 @@ Module chính để chấm điểm phát âm:
 - Export kết quả ra JSON format
 """
 
-import nltk
+import io
 import re
-from typing import List, Dict, Tuple
-from g2p_en import G2p
+import threading
+import uuid
+from array import array
+from typing import Callable, List, Dict, Optional, Tuple, Union
+
+import torch
 
 from data_structures import PhonemeError, WordScore, PronunciationResult
 from phoneme_mapper import PhonemeMapper
 from alignment import PronunciationAligner
 from ctc_decoder import CTCDecoder
+from forced_alignment import assign_by_time
+from lexicon import PronunciationLexicon
+from caching import DiskCache, LRUCache, TieredCache
+from audio_io import AudioInput
+from metrics import stage_timer
+from serialization import HAS_ORJSON, dumps, encode_result
+from vad import kept_to_original_seconds
+
+
+# Model phoneme recognition mặc định trên HuggingFace Hub
+DEFAULT_MODEL_NAME = "mrrubino/wav2vec2-large-xlsr-53-l2-arctic-phoneme"
+
+# 'marker': theo ranh giới từ model sinh ra; 'alignment': chia đều rồi gộp;
+# 'forced': theo thời gian từ CTC forced alignment của phone script lên logits
+SEGMENTATION_POLICIES = ('alignment', 'marker', 'forced')
+
+
+def _serialize_logits_entry(entry: Dict) -> bytes:
+    buf = io.BytesIO()
+    torch.save(entry, buf)
+    return buf.getvalue()
+
+
+def _deserialize_logits_entry(data: bytes) -> Dict:
+    return torch.load(io.BytesIO(data), weights_only=True)
 
 
 class PronunciationScorer:
@@ -32,82 +61,337 @@ class PronunciationScorer:
     """
     # IPA normalization mapping is read from data/ipa_data.json via PhonemeMapper
     
-    def __init__(self, data_path: str = None):
+    def __init__(
+        self,
+        data_path: str = None,
+        lexicon_path: str = None,
+        target_cache_size: int = 4096,
+        g2p_cache_size: int = 16384,
+        logits_cache_size: int = 0,
+        logits_cache_dir: Optional[str] = None
+    ):
         """
         Khởi tạo PronunciationScorer
         
         Args:
             data_path: Đường dẫn đến thư mục data (mặc định là thư mục hiện tại)
+            lexicon_path: Đường dẫn file lexicon index (mặc định data/cmudict_ipa.idx)
+            target_cache_size: Số câu script tối đa được cache target phonemes (0 = tắt)
+            g2p_cache_size: Số từ ngoài từ điển tối đa được cache kết quả G2P (0 = tắt)
+            logits_cache_size: Số utterance tối đa được giữ logits (float16) để rescore (0 = tắt)
+            logits_cache_dir: Thư mục cho tầng đĩa của logits cache (None = chỉ bộ nhớ)
         """
         self.phoneme_mapper = PhonemeMapper(data_path or '.')
         self.aligner = PronunciationAligner(self.phoneme_mapper)
-        self.ctc_decoder = CTCDecoder()
-        self.g2p = G2p()  # Grapheme-to-phoneme converter
+        # Ký tự trong vocab của model là phần cố định còn lại của inventory phone
+        self.ctc_decoder = CTCDecoder(on_vocab_loaded=lambda vocab: self.phoneme_mapper.register_phones(vocab.output_chars()))
+        self._g2p = None  # Grapheme-to-phoneme converter, tạo khi gặp từ ngoài từ điển lần đầu
+        self._g2p_lock = threading.Lock()
         
-        # Đảm bảo CMUDict được download
-        self._ensure_cmudict()
-    
-    def _ensure_cmudict(self):
-        """Đảm bảo CMUDict đã được download từ NLTK"""
-        try:
-            from nltk.corpus import cmudict
-            cmudict.dict()
-        except:
-            print("Downloading CMUDict...")
-            nltk.download('cmudict', quiet=True)
+        # CMUDict đã biên dịch sẵn sang IPA (build lần đầu nếu chưa có index)
+        self.lexicon = PronunciationLexicon.load_or_build(self.phoneme_mapper, lexicon_path)
+
+        # Cache target phonemes theo script đã chuẩn hóa và kết quả G2P theo từng từ
+        self._target_cache = LRUCache(target_cache_size)
+        self._g2p_cache = LRUCache(g2p_cache_size)
+
+        # Logits theo utterance (float16) để rescore với thresholds / segmentation khác
+        # mà không chạy lại model
+        self._logits_cache = TieredCache(
+            LRUCache(logits_cache_size),
+            DiskCache(logits_cache_dir) if logits_cache_dir else None,
+            serialize=_serialize_logits_entry,
+            deserialize=_deserialize_logits_entry,
+        )
     
+    @property
+    def g2p(self):
+        """G2P model (g2p_en kéo theo nltk và inflect nên chỉ import khi cần)"""
+        if self._g2p is None:
+            with self._g2p_lock:
+                if self._g2p is None:
+                    from g2p_en import G2p
+                    self._g2p = G2p()
+        return self._g2p
+
     def score_pronunciation(
         self,
         script_text: str,
-        audio_path: str,
-        model_name: str = "mrrubino/wav2vec2-large-xlsr-53-l2-arctic-phoneme",
+        audio: AudioInput,
+        model_name: str = DEFAULT_MODEL_NAME,
         thresholds: Tuple[float, float] = (0.15, 0.35),
-        segmentation_policy: str = 'alignment'  # 'marker' or 'alignment'
+        segmentation_policy: str = 'alignment',  # 'marker', 'alignment' or 'forced'
+        sample_rate: Optional[int] = None,
+        vad: str = 'off',
+        keep_logits: bool = False,
+        beam_width: int = 1,
+        target_bias: float = 0.0,
+        logits_id: Optional[str] = None
     ) -> PronunciationResult:
         """
         Chấm điểm chất lượng phát âm
         
         Args:
             script_text: Văn bản mong đợi được đọc
-            audio_path: Đường dẫn file audio
+            audio: Đường dẫn file audio, bytes của file audio hoặc waveform tensor
+                (mono/stereo; sample rate cho bởi `sample_rate`)
             model_name: Tên model HuggingFace để sử dụng
             thresholds: (excellent_threshold, good_threshold) cho phân loại
+            segmentation_policy: Một trong SEGMENTATION_POLICIES; 'forced' thêm thời gian
+                (giây, theo audio gốc) của từng từ và từng phone vào kết quả
+            sample_rate: Sample rate của waveform tensor (mặc định 16kHz)
+            vad: Cắt khoảng lặng trước khi decode: 'off', 'trim' (đầu/cuối) hoặc 'pauses'
+                (cả khoảng nghỉ dài giữa câu); các đoạn được giữ ghi vào metadata['vad']
+            keep_logits: Lưu logits vào logits cache, id ghi vào metadata['logits_id'] (dùng cho `rescore`)
+            beam_width: Số beam của CTC prefix beam search (<= 1 là greedy)
+            target_bias: Bias của beam search về phone của script (0 = không bias)
+            logits_id: Id cho logits được lưu khi `keep_logits` (mặc định là id ngẫu nhiên);
+                cùng input nên cho cùng id, ví dụ key của result cache
         
         Returns:
             PronunciationResult: Kết quả chấm điểm đầy đủ
         """
         
-        # Bước 1: Decode audio thành predicted phonemes (flat)
-        predicted_tokens = self.ctc_decoder.decode_audio(audio_path, model_name)
-        # Build a single string from tokens, converting boundary markers to spaces so
+        timings: Dict[str, float] = {}
+
+        # Bước 1: Decode audio thành predicted tokens (sau VAD nếu bật)
+        with stage_timer(timings, 'decode'):
+            predicted_tokens, token_spans, regions, logits = self.ctc_decoder.decode_speech(
+                audio, model_name, sample_rate=sample_rate, vad=vad,
+                beam_width=beam_width, target_phones=self._bias_targets(script_text, beam_width, target_bias),
+                target_bias=target_bias, timings=timings,
+            )
+
+        vad_info = regions.to_dict() if vad != 'off' and regions is not None else None
+        result = self.score_tokens(
+            script_text, predicted_tokens, model_name, thresholds, segmentation_policy, timings,
+            logits=logits, token_spans=token_spans, frame_to_seconds=self._frame_clock(model_name, vad_info),
+        )
+        if vad_info is not None:
+            result.metadata['vad'] = vad_info
+        if beam_width > 1:
+            result.metadata['decoder'] = {'beam_width': beam_width, 'target_bias': target_bias}
+        if keep_logits and logits is not None and self._logits_cache.enabled:
+            logits_id = logits_id or uuid.uuid4().hex
+            self._logits_cache.put(logits_id, {
+                'model_name': model_name,
+                'script_text': script_text,
+                'logits': logits.detach().to(torch.float16).contiguous(),
+                'vad': result.metadata.get('vad'),
+            })
+            result.metadata['logits_id'] = logits_id
+        return result
+
+    @property
+    def keeps_logits(self) -> bool:
+        """Logits cache có bật không (kết quả với `keep_logits=True` có logits_id)"""
+        return self._logits_cache.enabled
+
+    def has_logits(self, logits_id: str) -> bool:
+        """Logits của `logits_id` còn trong logits cache không (hit ở đĩa được đưa lên bộ nhớ)"""
+        return self._logits_cache.get(logits_id)[0] is not None
+
+    def rescore(
+        self,
+        logits_id: str,
+        script_text: Optional[str] = None,
+        thresholds: Tuple[float, float] = (0.15, 0.35),
+        segmentation_policy: str = 'alignment',
+        beam_width: int = 1,
+        target_bias: float = 0.0
+    ) -> PronunciationResult:
+        """
+        Chấm điểm lại từ logits đã cache: chỉ chạy CTC decode, segment, align và tính điểm
+
+        Args:
+            logits_id: Id trả về trong metadata['logits_id'] của lần chấm trước
+            script_text: Script mới (mặc định là script của lần chấm trước)
+            thresholds: (excellent_threshold, good_threshold) cho phân loại
+            segmentation_policy: Một trong SEGMENTATION_POLICIES
+            beam_width: Số beam của CTC prefix beam search (<= 1 là greedy)
+            target_bias: Bias của beam search về phone của script (0 = không bias)
+
+        Returns:
+            PronunciationResult: Kết quả chấm điểm, metadata['rescored'] = True
+
+        Raises:
+            KeyError: nếu logits_id không có (hoặc đã bị loại khỏi cache)
+        """
+        entry, _ = self._logits_cache.get(logits_id)
+        if entry is None:
+            raise KeyError(logits_id)
+
+        timings: Dict[str, float] = {}
+        model_name = entry['model_name']
+        script_text = script_text or entry['script_text']
+        logits = entry['logits'].float()
+        with stage_timer(timings, 'decode'):
+            predicted_tokens, token_spans = self.ctc_decoder.decode_logits_with_frames(
+                logits, model_name, beam_width,
+                self._bias_targets(script_text, beam_width, target_bias), target_bias,
+            )
+
+        result = self.score_tokens(
+            script_text, predicted_tokens, model_name, thresholds, segmentation_policy, timings,
+            logits=logits, token_spans=token_spans, frame_to_seconds=self._frame_clock(model_name, entry.get('vad')),
+        )
+        if entry.get('vad'):
+            result.metadata['vad'] = entry['vad']
+        if beam_width > 1:
+            result.metadata['decoder'] = {'beam_width': beam_width, 'target_bias': target_bias}
+        result.metadata['logits_id'] = logits_id
+        result.metadata['rescored'] = True
+        return result
+
+    def _bias_targets(self, script_text: str, beam_width: int, target_bias: float) -> Optional[List[str]]:
+        """Chuỗi phone của script cho bias của beam search (None nếu không dùng bias)"""
+        if beam_width <= 1 or target_bias <= 0:
+            return None
+        _, target_phones_per_word = self.get_script_targets(script_text)
+        return [p for phones in target_phones_per_word for p in phones]
+
+    def _frame_clock(self, model_name: str, vad_info: Optional[Dict]) -> Callable[[int], float]:
+        """
+        Hàm frame logits -> giây trong audio gốc (bù phần đã bị VAD cắt); config của model
+        chỉ được đọc khi hàm được gọi (chỉ với segmentation 'forced')
+        """
+        segments = vad_info['segments'] if vad_info else None
+
+        def to_seconds(frame: int) -> float:
+            seconds = frame * self.ctc_decoder.seconds_per_frame(model_name)
+            return kept_to_original_seconds(seconds, segments) if segments else seconds
+        return to_seconds
+
+    def score_batch(
+        self,
+        items: List[Tuple[str, AudioInput]],
+        model_name: str = DEFAULT_MODEL_NAME,
+        thresholds: Tuple[float, float] = (0.15, 0.35),
+        segmentation_policy: str = 'alignment',
+        sample_rate: Optional[int] = None,
+        max_batch_size: int = 8
+    ) -> List[Union[PronunciationResult, Exception]]:
+        """
+        Chấm điểm nhiều cặp (script, audio) trong một lần gọi
+
+        Audio được decode bằng các forward pass theo batch; target phonemes của các
+        script được tính một lần và dùng chung qua cache. Lỗi của từng item được trả
+        về tại vị trí của item đó thay vì làm hỏng cả batch.
+
+        Args:
+            items: Danh sách (script_text, audio)
+            model_name: Tên model HuggingFace để sử dụng
+            thresholds: (excellent_threshold, good_threshold) cho phân loại
+            segmentation_policy: 'marker' hoặc 'alignment'
+            sample_rate: Sample rate của các waveform tensor (mặc định 16kHz)
+            max_batch_size: Số utterance tối đa mỗi forward pass
+
+        Returns:
+            List: PronunciationResult hoặc Exception cho từng item, theo đúng thứ tự
+        """
+        # Lexicon/G2P cho mỗi script khác nhau chỉ chạy một lần
+        self.warm_cache(list(dict.fromkeys(text for text, _ in items)))
+
+        decode_timings: Dict[str, float] = {}
+        with stage_timer(decode_timings, 'decode'):
+            decoded = self.ctc_decoder.decode_batch(
+                [audio for _, audio in items], model_name, sample_rate=sample_rate, max_batch_size=max_batch_size
+            )
+
+        results: List[Union[PronunciationResult, Exception]] = []
+        for (script_text, _), tokens in zip(items, decoded):
+            if isinstance(tokens, Exception):
+                results.append(tokens)
+                continue
+            try:
+                result = self.score_tokens(script_text, tokens, model_name, thresholds, segmentation_policy, dict(decode_timings))
+                result.metadata['batch_size'] = len(items)
+                results.append(result)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def score_tokens(
+        self,
+        script_text: str,
+        predicted_tokens: List[str],
+        model_name: str,
+        thresholds: Tuple[float, float] = (0.15, 0.35),
+        segmentation_policy: str = 'alignment',
+        timings: Optional[Dict[str, float]] = None,
+        logits: Optional[torch.Tensor] = None,
+        token_spans: Optional[List[Tuple[int, int]]] = None,
+        frame_to_seconds: Optional[Callable[[int], float]] = None
+    ) -> PronunciationResult:
+        """
+        Chạy các stage sau decode: tokenize, target, segment, align (một lần mỗi từ), tính điểm
+
+        Args:
+            script_text: Văn bản mong đợi được đọc
+            predicted_tokens: Tokens từ CTCDecoder
+            model_name: Tên model đã dùng để decode (ghi vào metadata)
+            thresholds: (excellent_threshold, good_threshold) cho phân loại
+            segmentation_policy: Một trong SEGMENTATION_POLICIES; 'forced' cần `logits` và
+                `token_spans`, nếu thiếu hoặc không căn được thì dùng 'alignment'
+            timings: Dict thời gian (ms) của các stage đã chạy trước đó, được bổ sung thêm
+            logits: Logits (frames, vocab) đã dùng để decode
+            token_spans: Khoảng frame [start, end) của từng predicted token
+            frame_to_seconds: Hàm đổi frame sang giây (mặc định: frame index)
+
+        Returns:
+            PronunciationResult: Kết quả chấm điểm; metadata['timings_ms'] chứa thời gian từng stage
+        """
+        timings = timings if timings is not None else {}
+
+        # Bước 2: Build a single string from tokens, converting boundary markers to spaces so
         # tokenizer can split properly when model emitted boundaries; otherwise just
         # join tokens with spaces.
-        token_str = ' '.join([t.replace('▁', ' ').replace('|', ' ').strip() for t in predicted_tokens if t is not None])
-        predicted_phones = self.phoneme_mapper.tokenize_ipa(token_str)
+        with stage_timer(timings, 'tokenize'):
+            token_str = ' '.join([t.replace('▁', ' ').replace('|', ' ').strip() for t in predicted_tokens if t is not None])
+            predicted_ids = self.phoneme_mapper.tokenize_ipa_ids(token_str)
 
-        # Bước 2: Chuyển text thành target phonemes
-        words = re.findall(r"\w+", script_text.lower())
-        target_phones_per_word = self._get_target_pronunciations(words)
+        # Bước 3: Chuyển text thành target phonemes (có cache theo script)
+        with stage_timer(timings, 'targets'):
+            words, target_phones_per_word, norm_target_per_word = self.get_script_target_ids(script_text)
 
-        # Bước 3: Segment predicted flat phonemes into per-word chunks using markers/tokens
-        predicted_chunks = self.segment_predicted_by_words(predicted_tokens, predicted_phones, target_phones_per_word, policy=segmentation_policy)
+        # Bước 4a: Forced alignment phone script lên logits -> khoảng frame từng phone / từ
+        phone_spans = None
+        if segmentation_policy == 'forced' and logits is not None and token_spans is not None:
+            with stage_timer(timings, 'force_align'):
+                flat_phones = [p for phones in target_phones_per_word for p in phones]
+                phone_spans = self.ctc_decoder.force_align(logits, model_name, flat_phones)
 
-        # Chuẩn hóa ký tự IPA (các biến thể phổ biến) cho cả target và predicted
-        norm_target_per_word = [self.phoneme_mapper.normalize_ipa_variants(phones) for phones in target_phones_per_word]
-        norm_predicted_chunks = [self.phoneme_mapper.normalize_ipa_variants(chunk) for chunk in predicted_chunks]
+        # Bước 4: Segment predicted flat phonemes into per-word chunks using markers/tokens
+        with stage_timer(timings, 'segment'):
+            if phone_spans is not None:
+                phone_spans_per_word = self._split_by_words(phone_spans, target_phones_per_word)
+                word_spans = [self._merge_spans(spans) for spans in phone_spans_per_word]
+                predicted_chunks = self.segment_predicted_ids_by_time(predicted_tokens, token_spans, word_spans)
+            else:
+                predicted_chunks = self.segment_predicted_ids_by_words(predicted_tokens, predicted_ids, len(words), policy=segmentation_policy)
+
+            # Chuẩn hóa ký tự IPA (các biến thể phổ biến) cho predicted; target đã chuẩn hóa sẵn trong cache
+            norm_predicted_chunks = [self.phoneme_mapper.normalize_ids(chunk) for chunk in predicted_chunks]
 
-        # Bước 4: So sánh từng chunk với nhau và tính lỗi
-        word_scores = self._calculate_word_scores_from_chunks(words, norm_target_per_word, norm_predicted_chunks, thresholds)
-        errors = []
-        for tphones, pchunk in zip(norm_target_per_word, norm_predicted_chunks):
-            errors.extend(self.aligner.align_with_errors(tphones, pchunk))
+        # Bước 5: Align mỗi cặp (target, predicted chunk) đúng một lần, cho cả câu trong một lời gọi
+        with stage_timer(timings, 'align'):
+            word_errors = self.aligner.align_ids_batch(
+                list(zip(norm_target_per_word, norm_predicted_chunks)),
+                [(phones, None) for phones in target_phones_per_word],
+            )
 
-        # Bước 5: Tính điểm tổng thể
-        flat_target = [p for word_phones in target_phones_per_word for p in word_phones]
-        total_errors = sum(error.severity for error in errors)
-        total_phonemes = len(flat_target)
-        accuracy = max(0.0, 1.0 - (total_errors / total_phonemes)) if total_phonemes > 0 else 0.0
-        overall_score = int(accuracy * 100)
+        # Bước 6: Điểm từng từ, lỗi toàn câu và điểm tổng thể đều lấy từ cùng kết quả alignment
+        with stage_timer(timings, 'score'):
+            word_scores = self.score_word_chunks(words, norm_target_per_word, norm_predicted_chunks, thresholds, word_errors, target_phones_per_word)
+            if phone_spans is not None:
+                self._attach_timestamps(word_scores, target_phones_per_word, phone_spans_per_word, word_spans, frame_to_seconds)
+            errors = [error for errs in word_errors for error in errs]
+
+            flat_target = [p for word_phones in target_phones_per_word for p in word_phones]
+            total_errors = sum(error.severity for error in errors)
+            total_phonemes = len(flat_target)
+            accuracy = max(0.0, 1.0 - (total_errors / total_phonemes)) if total_phonemes > 0 else 0.0
+            overall_score = int(accuracy * 100)
 
         return PronunciationResult(
             overall_score=overall_score,
@@ -115,15 +399,82 @@ class PronunciationScorer:
             words=word_scores,
             global_errors=errors,
             target_ipa=' '.join(flat_target),
-            predicted_ipa=' '.join([p for ch in predicted_chunks for p in ch]),
+            predicted_ipa=' '.join(self.phoneme_mapper.phones_from_ids([p for ch in predicted_chunks for p in ch])),
             metadata={
                 'model_used': model_name,
                 'thresholds': thresholds,
                 'total_phonemes': total_phonemes,
-                'error_count': len(errors)
+                'error_count': len(errors),
+                'segmentation': 'forced' if phone_spans is not None else ('marker' if segmentation_policy == 'marker' else 'alignment'),
+                'timings_ms': timings
             }
         )
     
+    def get_script_targets(self, script_text: str) -> Tuple[List[str], List[List[str]]]:
+        """
+        Tách script thành các từ và lấy target phonemes, dùng LRU cache theo script đã chuẩn hóa
+
+        Args:
+            script_text: Văn bản mong đợi được đọc
+
+        Returns:
+            Tuple: (words, target_phones_per_word)
+        """
+        words, phones, _ = self._cached_targets(script_text)
+        # Trả về bản sao dạng list để caller không làm thay đổi dữ liệu trong cache
+        return words, [list(p) for p in phones]
+
+    def get_script_target_ids(self, script_text: str) -> Tuple[List[str], List[List[str]], List[array]]:
+        """
+        Như get_script_targets, kèm id phone (đã qua normalize_ipa_variants) của từng từ
+
+        Returns:
+            Tuple: (words, target_phones_per_word, normalized_target_ids_per_word)
+        """
+        words, phones, ids = self._cached_targets(script_text)
+        return words, [list(p) for p in phones], [array('H', i) for i in ids]
+
+    def _cached_targets(self, script_text: str) -> Tuple[List[str], Tuple[Tuple[str, ...], ...], Tuple[array, ...]]:
+        """Entry của target cache: phone và id phone đã chuẩn hóa của từng từ (tính một lần mỗi script)"""
+        words = re.findall(r"\w+", script_text.lower())
+        key = ' '.join(words)
+        cached = self._target_cache.get(key)
+        if cached is None:
+            mapper = self.phoneme_mapper
+            phones = tuple(tuple(p) for p in self._get_target_pronunciations(words))
+            cached = (phones, tuple(mapper.normalize_ids(mapper.phone_ids(p)) for p in phones))
+            self._target_cache.put(key, cached)
+        return (words,) + cached
+
+    def warm_cache(self, scripts: List[str]) -> int:
+        """
+        Nạp sẵn target phonemes (và kết quả G2P) cho danh sách script bài học
+
+        Args:
+            scripts: Danh sách script
+
+        Returns:
+            int: Số script đã nạp vào cache
+        """
+        count = 0
+        for script in scripts:
+            if not script or not script.strip():
+                continue
+            try:
+                self.get_script_targets(script)
+                count += 1
+            except Exception as e:
+                print(f"Cache warmup failed for script {script[:40]!r}: {e}")
+        return count
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        """Thống kê hit / miss / eviction của các cache trong scorer"""
+        return {
+            'targets': self._target_cache.stats(),
+            'g2p': self._g2p_cache.stats(),
+            'logits': self._logits_cache.stats(),
+        }
+
     def _get_target_pronunciations(self, words: List[str]) -> List[List[str]]:
         """
         Lấy target pronunciations cho mỗi từ
@@ -134,54 +485,66 @@ class PronunciationScorer:
         Returns:
             List[List[str]]: Danh sách phonemes cho mỗi từ
         """
-        from nltk.corpus import cmudict
-        cmu_dict = cmudict.dict()
-        
         result = []
         for word in words:
             word_lower = word.lower()
             
-            if word_lower in cmu_dict:
-                # Sử dụng pronunciation đầu tiên từ CMUDict
-                arpabet = cmu_dict[word_lower][0]
-                ipa_phones = self.phoneme_mapper.arpabet_to_ipa_list(arpabet, ignore_stress=True)
-            else:
-                # Fallback sang G2P nếu không tìm thấy trong CMUDict
-                g2p_result = self.g2p(word_lower)
-                arpabet = [token for token in g2p_result if re.match(r"^[A-Z]+\d?$", token)]
-                if arpabet:
-                    ipa_phones = self.phoneme_mapper.arpabet_to_ipa_list(arpabet, ignore_stress=True)
-                else:
-                    # Phương án cuối cùng: giữ nguyên từ
-                    ipa_phones = [word_lower]
+            # Pronunciation đầu tiên từ CMUDict, đã chuyển sẵn sang IPA trong lexicon index
+            ipa_phones = self.lexicon.lookup(word_lower)
+            if ipa_phones is None:
+                # Fallback sang G2P nếu không tìm thấy trong CMUDict (có cache theo từ)
+                ipa_phones = list(self._g2p_cache.get_or_compute(word_lower, lambda: self._g2p_word(word_lower)))
                     
             result.append(ipa_phones)
         
         return result
+
+    def _g2p_word(self, word: str) -> Tuple[str, ...]:
+        """Chạy model G2P cho một từ ngoài từ điển, trả về tuple phoneme IPA"""
+        with stage_timer(None, 'g2p'):
+            g2p_result = self.g2p(word)
+        arpabet = [token for token in g2p_result if re.match(r"^[A-Z]+\d?$", token)]
+        if arpabet:
+            return tuple(self.phoneme_mapper.arpabet_to_ipa_list(arpabet, ignore_stress=True))
+        # Phương án cuối cùng: giữ nguyên từ
+        return (word,)
     # Note: legacy function `_calculate_word_scores` (aligning entire predicted sequence
     # to the flat target and distributing errors) has been removed in favor of the
-    # chunk-based flow implemented in `_calculate_word_scores_from_chunks`.
+    # chunk-based flow implemented in `score_word_chunks`.
 
-    def _calculate_word_scores_from_chunks(
+    def score_word_chunks(
         self,
         words: List[str],
-        target_per_word: List[List[str]],
-        predicted_chunks: List[List[str]],
-        thresholds: Tuple[float, float]
+        target_per_word: List[array],
+        predicted_chunks: List[array],
+        thresholds: Tuple[float, float],
+        word_errors: Optional[List[List[PhonemeError]]] = None,
+        target_phones: Optional[List[List[str]]] = None
     ) -> List[WordScore]:
         """
         Tính điểm khi predicted đã được chunked tương ứng với từng từ.
-        Mỗi predicted_chunks[i] tương ứng với target_per_word[i].
+        Mỗi predicted_chunks[i] (id phone) tương ứng với target_per_word[i] (id phone).
+        `word_errors[i]` là kết quả alignment có sẵn của cặp thứ i (nếu không truyền sẽ tự align).
+        `target_phones[i]` là phone gốc của từ thứ i, dùng để xuất các phone UNK_ID (ngoài inventory).
         """
+        if word_errors is None:
+            originals = [(phones, None) for phones in target_phones] if target_phones is not None else None
+            word_errors = self.aligner.align_ids_batch(list(zip(target_per_word, predicted_chunks)), originals)
+        phones_from_ids = self.phoneme_mapper.phones_from_ids
+
         word_scores = []
         for i, word in enumerate(words):
-            target_phones = target_per_word[i] if i < len(target_per_word) else []
-            predicted_phones = predicted_chunks[i] if i < len(predicted_chunks) else []
+            target_ids = target_per_word[i] if i < len(target_per_word) else array('H')
+            predicted_phones = predicted_chunks[i] if i < len(predicted_chunks) else array('H')
+            originals = target_phones[i] if target_phones is not None and i < len(target_phones) else None
 
-            # Align target_phones vs predicted_phones to compute errors
-            errors = self.aligner.align_with_errors(target_phones, predicted_phones)
+            # Lỗi của target_ids vs predicted_phones từ kết quả alignment
+            if i < len(word_errors):
+                errors = word_errors[i]
+            else:
+                errors = self.aligner.align_ids_batch([(target_ids, predicted_phones)], [(originals, None)])[0]
             total_error = sum(e.severity for e in errors)
-            total_phones = len(target_phones)
+            total_phones = len(target_ids)
 
             accuracy = max(0.0, 1.0 - (total_error / total_phones)) if total_phones > 0 else 1.0
             error_rate = total_error / total_phones if total_phones > 0 else 0.0
@@ -193,11 +556,11 @@ class PronunciationScorer:
                 label = 3
 
             # If there is no predicted phones for this word, use None so JSON emits null
-            predicted_ipa = ' '.join(predicted_phones) if predicted_phones else None
+            predicted_ipa = ' '.join(phones_from_ids(predicted_phones)) if predicted_phones else None
 
             word_scores.append(WordScore(
                 word=word,
-                target_ipa=' '.join(target_phones),
+                target_ipa=' '.join(phones_from_ids(target_ids, originals)),
                 predicted_ipa=predicted_ipa,
                 accuracy=accuracy,
                 label=label,
@@ -206,6 +569,69 @@ class PronunciationScorer:
 
         return word_scores
 
+    @staticmethod
+    def _split_by_words(items: List, target_per_word: List[List[str]]) -> List[List]:
+        """Chia list phẳng (theo từng target phone) thành list theo từng từ"""
+        result, offset = [], 0
+        for phones in target_per_word:
+            result.append(items[offset:offset + len(phones)])
+            offset += len(phones)
+        return result
+
+    @staticmethod
+    def _merge_spans(spans: List[Optional[Tuple[int, int]]]) -> Optional[Tuple[int, int]]:
+        """Khoảng frame của một từ: từ phone căn được đầu tiên đến phone căn được cuối cùng"""
+        timed = [span for span in spans if span is not None]
+        return (timed[0][0], timed[-1][1]) if timed else None
+
+    def _attach_timestamps(
+        self,
+        word_scores: List[WordScore],
+        target_per_word: List[List[str]],
+        phone_spans_per_word: List[List[Optional[Tuple[int, int]]]],
+        word_spans: List[Optional[Tuple[int, int]]],
+        frame_to_seconds: Optional[Callable[[int], float]]
+    ) -> None:
+        """Gắn thời gian (giây) của từ và từng target phone vào WordScore"""
+        to_seconds = frame_to_seconds or float
+        for word_score, phones, spans, word_span in zip(word_scores, target_per_word, phone_spans_per_word, word_spans):
+            if word_span is not None:
+                word_score.start, word_score.end = to_seconds(word_span[0]), to_seconds(word_span[1])
+            word_score.phones = [
+                (phone, to_seconds(span[0]), to_seconds(span[1])) if span is not None else (phone, None, None)
+                for phone, span in zip(phones, spans)
+            ]
+
+    def segment_predicted_by_time(
+        self,
+        predicted_tokens: List[str],
+        token_spans: List[Tuple[int, int]],
+        word_spans: List[Optional[Tuple[int, int]]]
+    ) -> List[List[str]]:
+        """
+        Chia predicted phonemes theo từ dựa trên thời gian: mỗi predicted token thuộc về từ
+        của script (khoảng frame từ forced alignment) gần nó nhất theo trục thời gian
+
+        Returns:
+            List[List[str]]: Phonemes của từng từ (độ dài == số từ)
+        """
+        chunks = self.segment_predicted_ids_by_time(predicted_tokens, token_spans, word_spans)
+        return [self.phoneme_mapper.phones_from_ids(chunk) for chunk in chunks]
+
+    def segment_predicted_ids_by_time(
+        self,
+        predicted_tokens: List[str],
+        token_spans: List[Tuple[int, int]],
+        word_spans: List[Optional[Tuple[int, int]]]
+    ) -> List[array]:
+        """Như segment_predicted_by_time nhưng trả về id phone của từng từ"""
+        chunks = [array('H') for _ in word_spans]
+        if not chunks:
+            return chunks
+        for token, slot in zip(predicted_tokens, assign_by_time(token_spans, word_spans)):
+            chunks[slot].extend(self.phoneme_mapper.tokenize_ipa_ids(token.replace('▁', ' ').replace('|', ' ').strip()))
+        return chunks
+
     def segment_predicted_by_words(self, predicted_tokens: List[str], predicted_phones: List[str], target_per_word: List[List[str]], policy: str = 'marker') -> List[List[str]]:
         """
         Segment predicted phonemes into exactly len(target_per_word) chunks corresponding
@@ -216,14 +642,21 @@ class PronunciationScorer:
 
         Returns a list of lists of phonemes (length == number of words).
         """
-        num_words = len(target_per_word)
+        mapper = self.phoneme_mapper
+        chunks = self.segment_predicted_ids_by_words(predicted_tokens, mapper.phone_ids(predicted_phones), len(target_per_word), policy)
+        return [mapper.phones_from_ids(chunk) for chunk in chunks]
 
-        # Helper: tokenize a token string into phonemes
-        def token_to_phones(tok: str) -> List[str]:
+    def segment_predicted_ids_by_words(self, predicted_tokens: List[str], predicted_ids: array, num_words: int, policy: str = 'marker') -> List[array]:
+        """
+        Same as segment_predicted_by_words, on phone ids: `predicted_ids` comes from
+        PhonemeMapper.tokenize_ipa_ids and each returned chunk is an array of phone ids
+        (length == num_words).
+        """
+        # Helper: tokenize a token string into phone ids
+        def token_to_phones(tok: str) -> array:
             s = tok.replace('|', '').replace('▁', ' ').strip()
-            # tokenize_ipa expects chunk(s) separated by spaces
-            phones = self.phoneme_mapper.tokenize_ipa(s)
-            return phones
+            # tokenize_ipa_ids expects chunk(s) separated by spaces
+            return self.phoneme_mapper.tokenize_ipa_ids(s)
 
         # Normalize predicted_tokens: expand tokens that contain spaces into atomic tokens
         # while preserving leading markers like '▁' or '|'. This keeps behavior
@@ -259,7 +692,7 @@ class PronunciationScorer:
                     # start new chunk
                     if current:
                         # flatten current tokens into phones
-                        phones = []
+                        phones = array('H')
                         for tok in current:
                             phones.extend(token_to_phones(tok))
                         chunks.append(phones)
@@ -267,7 +700,7 @@ class PronunciationScorer:
                 else:
                     current.append(clean)
             if current:
-                phones = []
+                phones = array('H')
                 for tok in current:
                     phones.extend(token_to_phones(tok))
                 chunks.append(phones)
@@ -275,18 +708,18 @@ class PronunciationScorer:
             # No markers: fallback to splitting predicted_phones evenly
             if num_words == 0:
                 return []
-            L = len(predicted_phones)
+            L = len(predicted_ids)
             if L == 0:
-                return [[] for _ in range(num_words)]
+                return [array('H') for _ in range(num_words)]
             base = L // num_words
             rem = L % num_words
             idx = 0
             for i in range(num_words):
                 sz = base + (1 if i < rem else 0)
                 if sz > 0:
-                    chunks.append(predicted_phones[idx:idx+sz])
+                    chunks.append(predicted_ids[idx:idx+sz])
                 else:
-                    chunks.append([])
+                    chunks.append(array('H'))
                 idx += sz
 
         # Now adjust chunks to have exactly num_words
@@ -309,12 +742,12 @@ class PronunciationScorer:
         # append empty chunks so the remaining target words receive no predicted
         # phones (they will be reported as null predicted_ipa).
         if len(chunks) < num_words:
-            chunks.extend([[] for _ in range(num_words - len(chunks))])
+            chunks.extend([array('H') for _ in range(num_words - len(chunks))])
 
         # Finally, ensure length == num_words
         if len(chunks) != num_words:
             # if still mismatch, normalize by merging/slicing into exactly num_words
-            flat = [p for ch in chunks for p in ch]
+            flat = array('H', [p for ch in chunks for p in ch])
             L = len(flat)
             base = L // num_words if num_words else 0
             rem = L % num_words if num_words else 0
@@ -325,46 +758,82 @@ class PronunciationScorer:
                 if sz > 0:
                     new_chunks.append(flat[idx:idx+sz])
                 else:
-                    new_chunks.append([])
+                    new_chunks.append(array('H'))
                 idx += sz
             chunks = new_chunks
 
         return chunks
 
-    def to_json(self, result: PronunciationResult) -> dict:
+    def to_json(self, result: PronunciationResult, include_timings: bool = False) -> dict:
         """
         Chuyển đổi kết quả thành format JSON có thể serialize
         
         Args:
             result: PronunciationResult cần chuyển đổi
+            include_timings: Thêm thời gian (ms) từng stage từ metadata['timings_ms']
             
         Returns:
             dict: Dictionary có thể serialize thành JSON
         """
-        return {
+        body = {
             "overall_score": result.overall_score,
             "accuracy": round(result.accuracy, 3),
             "target_ipa": result.target_ipa,
             "predicted_ipa": result.predicted_ipa,
-            "words": [
+            "words": [self.word_to_json(word) for word in result.words],
+        }
+        if 'logits_id' in result.metadata:
+            # Dùng với /rescore để chấm lại với thresholds / segmentation khác
+            body["logits_id"] = result.metadata['logits_id']
+        if 'vad' in result.metadata:
+            # Các đoạn (giây) của audio gốc đã được chấm, để client map timestamp
+            body["vad"] = result.metadata['vad']
+        if include_timings and 'timings_ms' in result.metadata:
+            body["timings_ms"] = result.metadata['timings_ms']
+        return body
+
+    def to_json_bytes(self, result: PronunciationResult, include_timings: bool = False) -> bytes:
+        """
+        Như to_json nhưng trả về body JSON (UTF-8) sẵn sàng gửi đi
+
+        Dùng orjson trên dict của to_json nếu có, ngược lại ghi thẳng từ dataclass trong
+        một lượt (encode_result) thay vì qua json của thư viện chuẩn.
+        """
+        if HAS_ORJSON:
+            return dumps(self.to_json(result, include_timings))
+        return encode_result(result, include_timings)
+
+    def word_to_json(self, word: WordScore) -> dict:
+        """Chuyển một WordScore thành dict có thể serialize (dùng chung cho to_json và streaming)"""
+        body = {
+            "word": word.word,
+            "target_ipa": word.target_ipa,
+            "predicted_ipa": word.predicted_ipa,
+            "accuracy": round(word.accuracy, 3),
+            "label": word.label,
+            "error_count": len(word.errors),
+            "errors": [
+                {
+                    "type": error.type,
+                    "position": error.position,
+                    "expected": error.expected,
+                    "actual": error.actual,
+                    "severity": round(error.severity, 2)
+                }
+                for error in word.errors
+            ]
+        }
+        if word.start is not None:
+            body["start"] = round(word.start, 3)
+            body["end"] = round(word.end, 3)
+        if word.phones is not None:
+            # Thời gian của từng target phone (null nếu phone không căn được)
+            body["phones"] = [
                 {
-                    "word": word.word,
-                    "target_ipa": word.target_ipa,
-                    "predicted_ipa": word.predicted_ipa,
-                    "accuracy": round(word.accuracy, 3),
-                    "label": word.label,
-                    "error_count": len(word.errors),
-                    "errors": [
-                        {
-                            "type": error.type,
-                            "position": error.position,
-                            "expected": error.expected,
-                            "actual": error.actual,
-                            "severity": round(error.severity, 2)
-                        }
-                        for error in word.errors
-                    ]
+                    "phone": phone,
+                    "start": round(start, 3) if start is not None else None,
+                    "end": round(end, 3) if end is not None else None,
                 }
-                for word in result.words
-            ],
-        }
\ No newline at end of file
+                for phone, start, end in word.phones
+            ]
+        return body
@@ -0,0 +1,121 @@
+"""
+JSON Serialization Module
+=========================
+
+Ghi response JSON thẳng ra bytes:
+- `dumps`: dùng orjson nếu đã cài, ngược lại json của thư viện chuẩn; cùng format với
+  JSONResponse (UTF-8, không escape ký tự IPA, không khoảng trắng)
+- `encode_result`: ghi PronunciationResult thành bytes trong một lượt, không tạo các
+  dict / list trung gian như `PronunciationScorer.to_json` (cùng schema và thứ tự key);
+  dùng khi không có orjson (orjson trên dict của to_json vẫn nhanh hơn)
+- `add_field` / `add_raw_field`: thêm một key vào cuối object JSON đã ghi (ví dụ
+  timings_ms cho kết quả lấy từ cache, hoặc bọc một kết quả đã serialize)
+"""
+
+import json
+from functools import lru_cache
+from json.encoder import encode_basestring
+from typing import Any
+
+from data_structures import PhonemeError, PronunciationResult, WordScore
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, fallback sang json của thư viện chuẩn
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+MEDIA_TYPE = 'application/json'
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize một giá trị JSON thành bytes UTF-8 (orjson nếu có)"""
+    if HAS_ORJSON:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def add_field(body: bytes, key: str, value: Any) -> bytes:
+    """Thêm `key: value` vào cuối object JSON `body` (object không rỗng)"""
+    return add_raw_field(body, key, dumps(value))
+
+
+def add_raw_field(body: bytes, key: str, raw: bytes) -> bytes:
+    """Thêm `key` với giá trị là JSON đã serialize `raw` vào cuối object JSON `body` (object không rỗng)"""
+    return body[:-1] + b',' + dumps(key) + b':' + raw + b'}'
+
+
+def _string(value) -> str:
+    return 'null' if value is None else encode_basestring(value)
+
+
+def _rounded(value, digits: int) -> str:
+    return 'null' if value is None else repr(round(value, digits))
+
+
+# Phone, loại lỗi và severity lặp lại rất nhiều trong một kết quả: giữ sẵn dạng đã encode
+_token = lru_cache(maxsize=4096)(_string)
+_severity = lru_cache(maxsize=4096, typed=True)(lambda value: repr(round(value, 2)))
+
+
+def _error(error: PhonemeError) -> str:
+    return (
+        f'{{"type":{_token(error.type)},"position":{error.position},'
+        f'"expected":{_token(error.expected)},"actual":{_token(error.actual)},'
+        f'"severity":{_severity(error.severity)}}}'
+    )
+
+
+def _encode_word(word: WordScore, parts: list) -> None:
+    """Ghi một WordScore (cùng schema với `PronunciationScorer.word_to_json`) vào `parts`"""
+    errors = word.errors
+    parts.append(
+        f'{{"word":{encode_basestring(word.word)},"target_ipa":{encode_basestring(word.target_ipa)},'
+        f'"predicted_ipa":{_string(word.predicted_ipa)},"accuracy":{repr(round(word.accuracy, 3))},'
+        f'"label":{word.label},"error_count":{len(errors)},"errors":['
+    )
+    parts.append(','.join([_error(error) for error in errors]))
+    parts.append(']')
+    if word.start is not None:
+        parts.append(f',"start":{repr(round(word.start, 3))},"end":{_rounded(word.end, 3)}')
+    if word.phones is not None:
+        parts.append(',"phones":[')
+        parts.append(','.join([
+            f'{{"phone":{_token(phone)},"start":{_rounded(start, 3)},"end":{_rounded(end, 3)}}}'
+            for phone, start, end in word.phones
+        ]))
+        parts.append(']')
+    parts.append('}')
+
+
+def encode_result(result: PronunciationResult, include_timings: bool = False) -> bytes:
+    """
+    Ghi PronunciationResult thành JSON bytes, cùng nội dung với
+    `dumps(PronunciationScorer.to_json(result, include_timings))`
+
+    Args:
+        result: Kết quả chấm điểm
+        include_timings: Thêm thời gian (ms) từng stage từ metadata['timings_ms']
+
+    Returns:
+        bytes: JSON UTF-8
+    """
+    parts = [
+        f'{{"overall_score":{result.overall_score},"accuracy":{repr(round(result.accuracy, 3))},'
+        f'"target_ipa":{encode_basestring(result.target_ipa)},"predicted_ipa":{encode_basestring(result.predicted_ipa)},'
+        f'"words":['
+    ]
+    for i, word in enumerate(result.words):
+        if i:
+            parts.append(',')
+        _encode_word(word, parts)
+    parts.append(']')
+    metadata = result.metadata
+    if 'logits_id' in metadata:
+        parts.append(',"logits_id":' + encode_basestring(metadata['logits_id']))
+    if 'vad' in metadata:
+        parts.append(',"vad":' + json.dumps(metadata['vad'], ensure_ascii=False, separators=(',', ':')))
+    if include_timings and 'timings_ms' in metadata:
+        parts.append(',"timings_ms":' + json.dumps(metadata['timings_ms'], ensure_ascii=False, separators=(',', ':')))
+    parts.append('}')
+    return ''.join(parts).encode('utf-8')
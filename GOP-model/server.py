@@ -1,15 +1,82 @@
-import tempfile
-import shutil
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import asyncio
+import json
 import os
-import torchaudio
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import JSONResponse
-from typing import Optional
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+from typing import List, Optional, Tuple
 
-from scorer import PronunciationScorer
+from scorer import PronunciationScorer, DEFAULT_MODEL_NAME, SEGMENTATION_POLICIES
+from streaming import StreamingSession
+from executor import ScoringExecutor, QueueFullError
+from audio_io import AudioDecodeError, load_audio
+from caching import DiskCache, LRUCache, TieredCache, content_key, is_cache_key
+from vad import VAD_MODES
+from metrics import AUDIO_SECONDS, CONTENT_TYPE, REAL_TIME_FACTOR, REGISTRY, REQUEST_SECONDS, cache_families, stage_timer
+from serialization import MEDIA_TYPE, add_field, add_raw_field, dumps
+from startup import StartupReport, parse_seconds, resolve_model_name, warmup
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Pronunciation Scoring API")
+startup = StartupReport()
+startup.record('imports', time.perf_counter() - _IMPORT_START)
+
+
+def run_startup():
+    """
+    Các phase nặng của khởi động: load model, tạo inference backend, warmup.
+    Chạy trên background thread (xem `lifespan`) để /health phản hồi ngay, /ready chỉ
+    chuyển sang ready khi xong.
+    """
+    try:
+        with startup.phase('model_load'):
+            scorer.ctc_decoder.get_model_components(MODEL_NAME)
+        with startup.phase('backend'):
+            scorer.ctc_decoder.get_backend(MODEL_NAME)
+        with startup.phase('warmup'):
+            warmup(scorer, MODEL_NAME, WARMUP_AUDIO_SECONDS)
+        if WARMUP_SCRIPTS_PATH:
+            # Nạp sẵn target phonemes cho các script bài học (file text mỗi dòng một script, hoặc JSON list)
+            with startup.phase('warm_scripts'):
+                with open(WARMUP_SCRIPTS_PATH, 'r', encoding='utf-8') as f:
+                    raw = f.read()
+                scripts = json.loads(raw) if raw.lstrip().startswith('[') else raw.splitlines()
+                print(f"Warmed target cache with {scorer.warm_cache(scripts)} scripts")
+        startup.mark_ready()
+    except Exception as e:
+        print(f"Startup failed: {e}")
+    print(startup.summary())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if startup.state == 'starting':
+        threading.Thread(target=run_startup, name='gop-startup', daemon=True).start()
+    yield
+
+
+app = FastAPI(title="Pronunciation Scoring API", lifespan=lifespan)
+
+
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+    """Latency của từng request theo route (không theo path thật để giữ số label nhỏ)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=getattr(route, 'path', 'unmatched'), status=str(status),
+        )
 
 
 # Thêm CORS Middleware
@@ -21,61 +88,426 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Khởi tạo scorer dùng lại cho tất cả request
-scorer = PronunciationScorer()
+# Model: thư mục đã bake sẵn (GOP_MODEL_DIR, không truy cập Hub) hoặc tên model (GOP_MODEL_NAME)
+MODEL_NAME = resolve_model_name(DEFAULT_MODEL_NAME)
+
+# Độ dài audio giả (giây) cho warmup forward pass trước khi ready; chuỗi rỗng để tắt
+WARMUP_AUDIO_SECONDS = parse_seconds(os.getenv('GOP_WARMUP_AUDIO_SECONDS', '1,4'))
+WARMUP_SCRIPTS_PATH = os.getenv('GOP_WARMUP_SCRIPTS')
+
+LOGITS_CACHE_DIR = os.getenv('GOP_LOGITS_CACHE_DIR')
+
+# Khởi tạo scorer dùng lại cho tất cả request (model được load trong run_startup)
+with startup.phase('scorer'):
+    scorer = PronunciationScorer(
+        target_cache_size=int(os.getenv('GOP_TARGET_CACHE_SIZE', '4096')),
+        g2p_cache_size=int(os.getenv('GOP_G2P_CACHE_SIZE', '16384')),
+        # Logits (float16) của các utterance gần đây để /rescore không phải chạy lại model;
+        # với prefork nên đặt GOP_LOGITS_CACHE_DIR để các worker dùng chung
+        logits_cache_size=int(os.getenv('GOP_LOGITS_CACHE_SIZE', '256')),
+        logits_cache_dir=LOGITS_CACHE_DIR,
+    )
+
+# Inference backend của model: torch (fp32), int8 (dynamic quantization) hoặc onnx (ONNX Runtime)
+scorer.ctc_decoder.set_backend(MODEL_NAME, os.getenv('GOP_BACKEND', 'torch'))
+
+# Dynamic micro-batching cho forward pass của CTC model (GOP_BATCH_MAX_SIZE <= 1 để tắt)
+# Request được chia lane theo độ dài audio (GOP_BATCH_BUCKETS, giây), mỗi lane gom batch riêng
+scorer.ctc_decoder.enable_batching(
+    max_batch_size=int(os.getenv('GOP_BATCH_MAX_SIZE', '1')),
+    max_wait_ms=float(os.getenv('GOP_BATCH_MAX_WAIT_MS', '10')),
+    bucket_seconds=parse_seconds(os.getenv('GOP_BATCH_BUCKETS', '4,10')),
+)
+
+# Audio dài hơn GOP_CHUNK_SECONDS chạy theo cửa sổ chồng lấn GOP_CHUNK_OVERLAP_SECONDS (0 để tắt)
+scorer.ctc_decoder.set_chunking(
+    chunk_seconds=float(os.getenv('GOP_CHUNK_SECONDS', '20')),
+    overlap_seconds=float(os.getenv('GOP_CHUNK_OVERLAP_SECONDS', '2')),
+)
+
+# Worker pool cho các tác vụ CPU-bound, giúp event loop không bị block khi đang chấm điểm
+executor = ScoringExecutor(
+    max_workers=int(os.getenv('GOP_WORKERS', '2')),
+    max_queue=int(os.getenv('GOP_MAX_QUEUE', '8')),
+    torch_threads=int(os.getenv('GOP_TORCH_THREADS', '0')),
+)
+RETRY_AFTER_SECONDS = int(os.getenv('GOP_RETRY_AFTER', '1'))
+
+# Giới hạn của /score/batch: số item mỗi request và số utterance mỗi forward pass
+MAX_BATCH_ITEMS = int(os.getenv('GOP_MAX_BATCH_ITEMS', '32'))
+BATCH_FORWARD_SIZE = int(os.getenv('GOP_BATCH_FORWARD_SIZE', '8'))
+
+# VAD mặc định khi request không gửi field 'vad': off, trim hoặc pauses
+DEFAULT_VAD = os.getenv('GOP_VAD', 'off')
+
+# Cách chia phone dự đoán theo từ khi request không gửi 'segmentation_policy':
+# alignment, marker hoặc forced (forced alignment, kèm thời gian từng từ / phone)
+DEFAULT_SEGMENTATION = os.getenv('GOP_SEGMENTATION', 'alignment')
+
+# CTC decoding: beam width mặc định khi request không gửi 'beam_width' (1 = greedy, xem
+# benchmarks/bench_beam_search.py để chọn), giới hạn trên cho mỗi request và bias về
+# phone của script (0 = không bias; bias lớn che mất lỗi phát âm thật)
+DEFAULT_BEAM_WIDTH = int(os.getenv('GOP_BEAM_WIDTH', '1'))
+MAX_BEAM_WIDTH = int(os.getenv('GOP_MAX_BEAM_WIDTH', '64'))
+BEAM_TARGET_BIAS = float(os.getenv('GOP_BEAM_TARGET_BIAS', '0'))
+
+# Thêm bảng thời gian từng stage (timings_ms) vào response của /score (request có thể
+# ghi đè bằng field 'timings'); không áp dụng cho kết quả lấy từ cache
+RESPONSE_TIMINGS = os.getenv('GOP_RESPONSE_TIMINGS', '0').lower() in ('1', 'true', 'yes')
+
+# Cache kết quả theo nội dung (audio bytes + script + model + tham số): bộ nhớ LRU/TTL,
+# thêm tầng đĩa nếu đặt GOP_RESULT_CACHE_DIR (dùng chung được giữa các prefork worker).
+# Giá trị là body JSON đã serialize, trả thẳng cho client khi hit
+RESULT_CACHE_TTL = float(os.getenv('GOP_RESULT_CACHE_TTL', '3600'))
+RESULT_CACHE_DIR = os.getenv('GOP_RESULT_CACHE_DIR')
+result_cache = TieredCache(
+    LRUCache(int(os.getenv('GOP_RESULT_CACHE_SIZE', '1024')), ttl=RESULT_CACHE_TTL),
+    DiskCache(
+        RESULT_CACHE_DIR,
+        max_bytes=int(float(os.getenv('GOP_RESULT_CACHE_DISK_MB', '512')) * 1024 * 1024),
+        ttl=RESULT_CACHE_TTL,
+    ) if RESULT_CACHE_DIR else None,
+    serialize=bytes,
+    deserialize=bytes,
+)
+
+# Streaming qua WebSocket: lượng audio mới cho mỗi lần cập nhật và độ dài tối đa một phiên
+STREAM_HOP_SECONDS = float(os.getenv('GOP_STREAM_HOP_SECONDS', '1.0'))
+STREAM_MAX_SECONDS = float(os.getenv('GOP_STREAM_MAX_SECONDS', '60'))
+
+
+def _score_upload(text: str, content: bytes, preprocessed: bool, vad: str = 'off', beam_width: int = 1, segmentation_policy: str = 'alignment', timings: Optional[dict] = None, logits_id: Optional[str] = None) -> Tuple[bytes, dict]:
+    """Chạy toàn bộ pipeline chấm điểm (đồng bộ) trên một worker thread; trả về (body JSON, timings_ms)"""
+    timings = dict(timings or {})
+    start = time.perf_counter()
+    # Decode upload trực tiếp từ bộ nhớ, chuyển mono + resample về 16k đúng một lần
+    # (audio preprocessed đã là 16k mono thì bỏ qua bước chuyển đổi)
+    with stage_timer(timings, 'resample'):
+        wav = load_audio(content, target_sr=16000, preprocessed=preprocessed)
+    result = scorer.score_pronunciation(
+        text, wav, model_name=MODEL_NAME, segmentation_policy=segmentation_policy, vad=vad, keep_logits=True,
+        beam_width=beam_width, target_bias=BEAM_TARGET_BIAS, logits_id=logits_id,
+    )
+    audio_seconds = wav.shape[-1] / 16000
+    AUDIO_SECONDS.observe(audio_seconds)
+    if audio_seconds > 0:
+        REAL_TIME_FACTOR.observe((time.perf_counter() - start) / audio_seconds)
+    # Body được serialize ngay trên worker thread; timings_ms để riêng vì body được cache
+    timings.update(result.metadata['timings_ms'])
+    with stage_timer(timings, 'serialize'):
+        body = scorer.to_json_bytes(result)
+    return body, timings
+
+
+def _rescore(logits_id: str, text: Optional[str], thresholds: Tuple[float, float], segmentation_policy: str, beam_width: int = 1) -> bytes:
+    """Chấm lại từ logits đã cache (đồng bộ, chạy trên worker thread)"""
+    result = scorer.rescore(
+        logits_id, text, thresholds=thresholds, segmentation_policy=segmentation_policy,
+        beam_width=beam_width, target_bias=BEAM_TARGET_BIAS,
+    )
+    return scorer.to_json_bytes(result, include_timings=RESPONSE_TIMINGS)
+
+
+def _score_upload_batch(texts: List[str], contents: List[bytes]) -> bytes:
+    """Chấm điểm nhiều upload trên một worker thread; lỗi của từng item được trả riêng"""
+    results: List[Optional[bytes]] = [None] * len(texts)
+    items, positions = [], []
+    for i, (text, content) in enumerate(zip(texts, contents)):
+        try:
+            items.append((text, load_audio(content, target_sr=16000)))
+            positions.append(i)
+        except Exception as e:
+            results[i] = dumps({"index": i, "status": "error", "error": f"Cannot decode audio: {e}"})
+
+    for i, result in zip(positions, scorer.score_batch(items, model_name=MODEL_NAME, max_batch_size=BATCH_FORWARD_SIZE)):
+        if isinstance(result, Exception):
+            results[i] = dumps({"index": i, "status": "error", "error": str(result)})
+        else:
+            results[i] = add_raw_field(dumps({"index": i, "status": "ok"}), "result", scorer.to_json_bytes(result))
+    return b'{"count":%d,"results":[%s]}' % (len(results), b','.join(results))
+
+
+def _starting_response() -> JSONResponse:
+    """503 kèm Retry-After khi model chưa load / warmup xong"""
+    return JSONResponse(
+        {"message": "Server is starting, please retry later", "startup": startup.to_dict()},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+def _segmentation_error() -> JSONResponse:
+    return JSONResponse({"message": f"segmentation_policy must be one of {list(SEGMENTATION_POLICIES)}"}, status_code=400)
+
+
+def _beam_width_error() -> JSONResponse:
+    return JSONResponse({"message": f"beam_width must be between 1 and {MAX_BEAM_WIDTH}"}, status_code=400)
+
+
+def _busy_response() -> JSONResponse:
+    """503 kèm Retry-After khi hàng đợi chấm điểm đã đầy"""
+    return JSONResponse(
+        {"message": "Scoring queue is full, please retry later", **executor.stats()},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
 
 
 @app.post('/score')
-async def score_endpoint(text: str = Form(...), audio: UploadFile = File(...), beam_width: Optional[int] = Form(50), ignore_stress: Optional[bool] = Form(True), preprocessed: Optional[bool] = Form(False)):
+async def score_endpoint(request: Request, text: str = Form(...), audio: UploadFile = File(...), beam_width: Optional[int] = Form(None), ignore_stress: Optional[bool] = Form(True), preprocessed: Optional[bool] = Form(False), vad: Optional[str] = Form(None), segmentation_policy: Optional[str] = Form(None), timings: Optional[bool] = Form(None)):
     """Accepts form-data: 'text' (script) and 'audio' (wav file). Returns scoring JSON.
     Query params/form fields:
     - text: reference script
     - audio: uploaded wav file
-    - beam_width: beam size for rescoring
+    - beam_width: beam size của CTC prefix beam search (1 = greedy; mặc định theo GOP_BEAM_WIDTH)
     - ignore_stress: whether to strip stress digits from ARPAbet
+    - preprocessed: audio đã là 16 kHz mono, bỏ qua bước chuyển mono / resample (file khác
+      định dạng đó vẫn được chuyển đổi)
+    - vad: cắt khoảng lặng trước khi decode ('off', 'trim', 'pauses'; mặc định theo GOP_VAD)
+    - segmentation_policy: 'alignment', 'marker' hoặc 'forced' (mặc định theo GOP_SEGMENTATION);
+      'forced' thêm start/end (giây) cho từng từ và từng phone
+    - timings: thêm `timings_ms` (thời gian từng stage) vào response (mặc định theo GOP_RESPONSE_TIMINGS);
+      với HIT chỉ gồm upload và cache_lookup
+
+    Việc chấm điểm chạy trên worker pool; trả 503 + Retry-After khi hàng đợi đầy.
+    Response có `logits_id` (khi logits cache bật; cố định theo nội dung request, kể cả khi
+    HIT) để chấm lại qua /rescore.
+    Kết quả được cache theo nội dung: header X-Cache là HIT (kèm X-Cache-Tier), MISS
+    hoặc BYPASS (khi client gửi `Cache-Control: no-cache`, kết quả mới vẫn được lưu lại).
     """
-    # Save uploaded audio to a temporary file
-    suffix = '.wav'
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp_path = tmp.name
+    if not startup.ready:
+        return _starting_response()
+    vad = vad or DEFAULT_VAD
+    if vad not in VAD_MODES:
+        return JSONResponse({"message": f"vad must be one of {list(VAD_MODES)}"}, status_code=400)
+    segmentation_policy = segmentation_policy or DEFAULT_SEGMENTATION
+    if segmentation_policy not in SEGMENTATION_POLICIES:
+        return _segmentation_error()
+    beam_width = beam_width or DEFAULT_BEAM_WIDTH
+    if not 1 <= beam_width <= MAX_BEAM_WIDTH:
+        return _beam_width_error()
+    upload_timings = {}
+    with stage_timer(upload_timings, 'upload'):
         content = await audio.read()
-        tmp.write(content)
+
+    cache_key = content_key(
+        content, text, MODEL_NAME, scorer.ctc_decoder.backend_kind(MODEL_NAME),
+        json.dumps({"preprocessed": preprocessed, "vad": vad, "beam_width": beam_width, "target_bias": BEAM_TARGET_BIAS, "segmentation_policy": segmentation_policy, "ignore_stress": ignore_stress}, sort_keys=True),
+    )
+    include_timings = RESPONSE_TIMINGS if timings is None else timings
+    bypass = 'no-cache' in request.headers.get('cache-control', '').lower()
+    if not bypass:
+        with stage_timer(upload_timings, 'cache_lookup'):
+            cached, tier = result_cache.get(cache_key)
+            # logits_id trong body cache là cache_key; nếu logits đã bị loại khỏi logits cache
+            # thì chấm lại như MISS để /rescore với id đó vẫn dùng được
+            if cached is not None and scorer.keeps_logits:
+                if LOGITS_CACHE_DIR:
+                    logits_ok = await asyncio.to_thread(scorer.has_logits, cache_key)  # đọc file ngoài event loop
+                else:
+                    logits_ok = scorer.has_logits(cache_key)
+                if not logits_ok:
+                    cached = None
+        if cached is not None:
+            if include_timings:
+                cached = add_field(cached, "timings_ms", upload_timings)
+            return Response(cached, media_type=MEDIA_TYPE, headers={"X-Cache": "HIT", "X-Cache-Tier": tier})
+
+    try:
+        body, stage_timings = await executor.run(_score_upload, text, content, preprocessed, vad, beam_width, segmentation_policy, upload_timings, cache_key)
+    except QueueFullError:
+        return _busy_response()
+    except AudioDecodeError as e:
+        return JSONResponse({"message": f"Cannot decode audio: {e}"}, status_code=400)
+    if result_cache.disk is not None:
+        await asyncio.to_thread(result_cache.put, cache_key, body)  # ghi file ngoài event loop
+    else:
+        result_cache.put(cache_key, body)
+    if include_timings:
+        body = add_field(body, "timings_ms", stage_timings)
+    return Response(body, media_type=MEDIA_TYPE, headers={"X-Cache": "BYPASS" if bypass else "MISS"})
+
+
+@app.post('/rescore')
+async def rescore_endpoint(logits_id: str = Form(...), text: Optional[str] = Form(None), excellent_threshold: float = Form(0.15), good_threshold: float = Form(0.35), segmentation_policy: Optional[str] = Form(None), beam_width: Optional[int] = Form(None)):
+    """Chấm lại một utterance đã chấm qua /score mà không chạy lại model.
+    Form fields:
+    - logits_id: id trong response của /score
+    - text: script mới (mặc định là script của lần chấm trước)
+    - excellent_threshold, good_threshold: ngưỡng phân loại phoneme
+    - segmentation_policy: 'alignment', 'marker' hoặc 'forced' (mặc định theo GOP_SEGMENTATION)
+    - beam_width: beam size của CTC decode (mặc định theo GOP_BEAM_WIDTH)
+
+    Chỉ chạy CTC decode, segment, align và tính điểm từ logits đã cache. Trả 400 nếu
+    logits_id không đúng dạng (32 ký tự hex), 404 nếu logits_id không còn trong cache
+    (gửi lại /score với `Cache-Control: no-cache`).
+    """
+    if not startup.ready:
+        return _starting_response()
+    if not is_cache_key(logits_id):
+        return JSONResponse({"message": "logits_id must be 32 lowercase hex characters"}, status_code=400)
+    segmentation_policy = segmentation_policy or DEFAULT_SEGMENTATION
+    if segmentation_policy not in SEGMENTATION_POLICIES:
+        return _segmentation_error()
+    beam_width = beam_width or DEFAULT_BEAM_WIDTH
+    if not 1 <= beam_width <= MAX_BEAM_WIDTH:
+        return _beam_width_error()
     try:
-        # call scoring method (synchronous) trên instance scorer
-        # Note: scorer.score_pronunciation signature: (script_text, audio_path, model_name=..., thresholds=...)
-        # If the uploaded audio is not preprocessed, normalize to 16k mono
-        norm_tmp_path = None
+        resp = await executor.run(_rescore, logits_id, text, (excellent_threshold, good_threshold), segmentation_policy, beam_width)
+    except QueueFullError:
+        return _busy_response()
+    except KeyError:
+        return JSONResponse({"message": f"Unknown or expired logits_id {logits_id!r}"}, status_code=404)
+    return Response(resp, media_type=MEDIA_TYPE)
+
+
+@app.post('/score/batch')
+async def score_batch_endpoint(texts: List[str] = Form(...), audios: List[UploadFile] = File(...)):
+    """Chấm điểm nhiều cặp (text, audio) trong một request.
+    Form fields (lặp lại theo thứ tự, text thứ i đi với audio thứ i):
+    - texts: reference scripts
+    - audios: uploaded audio files
+
+    Trả về {"count", "results": [{"index", "status": "ok", "result"} | {"index", "status": "error", "error"}]}.
+    """
+    if not startup.ready:
+        return _starting_response()
+    if len(texts) != len(audios):
+        return JSONResponse({"message": f"Got {len(texts)} texts but {len(audios)} audios"}, status_code=400)
+    if len(texts) > MAX_BATCH_ITEMS:
+        return JSONResponse({"message": f"At most {MAX_BATCH_ITEMS} items per batch"}, status_code=413)
+
+    contents = [await audio.read() for audio in audios]
+    try:
+        resp = await executor.run(_score_upload_batch, texts, contents)
+    except QueueFullError:
+        return _busy_response()
+    return Response(resp, media_type=MEDIA_TYPE)
+
+
+async def _run_with_retry(fn, *args):
+    """Chạy trên worker pool, chờ rồi thử lại khi hàng đợi đầy (dùng cho WebSocket, không có 503)"""
+    while True:
         try:
-            if not preprocessed:
-                # normalize and produce a new temp file
-                norm_tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-                norm_tmp_path = norm_tmp.name
-                norm_tmp.close()
-                # load, convert to mono and 16k, then save
-                wav, sr = torchaudio.load(tmp_path)
-                if wav.dim() == 2 and wav.size(0) > 1:
-                    wav = wav.mean(dim=0, keepdim=True)
-                if sr != 16000:
-                    wav = torchaudio.functional.resample(wav, sr, 16000)
-                torchaudio.save(norm_tmp_path, wav, 16000)
-
-            use_path = norm_tmp_path if norm_tmp_path else tmp_path
-            result = scorer.score_pronunciation(text, use_path)
-            # score_pronunciation trả về dataclass PronunciationResult -> chuyển sang dict để JSONResponse serialize được
-            resp = scorer.to_json(result)
-            return JSONResponse(resp)
-        finally:
-            # remove normalized temp file if created
-            if norm_tmp_path:
-                try:
-                    os.remove(norm_tmp_path)
-                except Exception:
-                    pass
-    finally:
+            return await executor.run(fn, *args)
+        except QueueFullError:
+            await asyncio.sleep(RETRY_AFTER_SECONDS)
+
+
+def _control_event(text: str) -> Optional[str]:
+    """Giá trị 'event' của một frame điều khiển JSON, None nếu frame không hợp lệ"""
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return None
+    return payload.get('event') if isinstance(payload, dict) else None
+
+
+@app.websocket('/score/stream')
+async def score_stream_endpoint(websocket: WebSocket):
+    """Chấm điểm tăng dần trong khi người học đang nói (shadowing).
+    Giao thức:
+    - client gửi JSON đầu tiên: {"text": script, "sample_rate": 16000}
+    - sau đó gửi các frame nhị phân PCM 16-bit little-endian mono
+    - gửi {"event": "end"} khi nói xong
+    Server trả về {"type": "ready"}, các {"type": "partial", "words": [...]} cho những từ
+    vừa nói xong, cuối cùng là {"type": "final", "result": ...} rồi đóng kết nối.
+    Lỗi được trả dạng {"type": "error", "message": ...}.
+    """
+    await websocket.accept()
+    if not startup.ready:
+        await websocket.send_json({"type": "error", "message": "Server is starting, please retry later"})
+        await websocket.close(code=1013)
+        return
+    try:
+        try:
+            config = json.loads(await websocket.receive_text())
+            session = await _run_with_retry(
+                lambda: StreamingSession(
+                    scorer, config['text'], MODEL_NAME,
+                    sample_rate=int(config.get('sample_rate', 16000)),
+                    hop_seconds=STREAM_HOP_SECONDS,
+                )
+            )
+        except Exception as e:
+            await websocket.send_json({"type": "error", "message": f"Invalid stream config: {e}"})
+            await websocket.close(code=1003)
+            return
+        await websocket.send_json({"type": "ready", "words": session.words})
+
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            if message.get('bytes') is not None:
+                update = await _run_with_retry(session.add_pcm, message['bytes'])
+                if update is not None:
+                    await websocket.send_json(update)
+                if session.audio_seconds > STREAM_MAX_SECONDS:
+                    await websocket.send_json({"type": "error", "message": f"Stream longer than {STREAM_MAX_SECONDS}s, finishing"})
+                    break
+            elif message.get('text') is not None:
+                event = _control_event(message['text'])
+                if event == 'end':
+                    break
+                # Frame điều khiển không hợp lệ chỉ bị bỏ qua, phiên vẫn tiếp tục
+                await websocket.send_json({"type": "error", "message": 'Unknown control frame, expected {"event": "end"}'})
+
+        result = await _run_with_retry(session.finish)
+        await websocket.send_text(add_raw_field(b'{"type":"final"}', "result", scorer.to_json_bytes(result)).decode('utf-8'))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        # Lỗi khi chấm (add_pcm / finish): báo cho client trước khi đóng với 1011
         try:
-            shutil.os.remove(tmp_path)
+            await websocket.send_json({"type": "error", "message": f"Streaming failed: {e}"})
+            await websocket.close(code=1011)
         except Exception:
-            pass
+            pass  # kết nối đã đóng
+
+
+def _collect_server_metrics():
+    """Số liệu tại thời điểm scrape: hàng đợi, trạng thái startup, thống kê cache"""
+    stats = executor.stats()
+    return [
+        ('gop_ready', 'gauge', 'Model loaded and warmed up', [({}, 1 if startup.ready else 0)]),
+        ('gop_queue_running', 'gauge', 'Scoring tasks currently running', [({}, stats['running'])]),
+        ('gop_queue_depth', 'gauge', 'Scoring tasks waiting for a worker', [({}, stats['queue_depth'])]),
+        ('gop_queue_rejected_total', 'counter', 'Requests rejected because the queue was full', [({}, stats['rejected'])]),
+        *cache_families({**scorer.cache_stats(), "results": result_cache.stats()}),
+    ]
+
+
+REGISTRY.register_collector(_collect_server_metrics)
+
+
+@app.get('/metrics')
+async def metrics_endpoint():
+    """Metrics theo Prometheus text format (latency theo stage / endpoint, audio, RTF, cache, hàng đợi)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get('/health')
+async def health_endpoint():
+    """Liveness: process còn sống và event loop còn phản hồi"""
+    return {"status": "ok", "startup": startup.state, "queue": executor.stats()}
+
+
+@app.get('/ready')
+async def ready_endpoint():
+    """Readiness: đã load + warmup model xong và còn chỗ trong hàng đợi để nhận thêm request"""
+    stats = executor.stats()
+    ready = startup.ready and stats['running'] + stats['queue_depth'] < stats['capacity']
+    body = {
+        "status": "ready" if ready else ("busy" if startup.ready else startup.state),
+        "startup": startup.to_dict(),
+        "queue": stats,
+        "batching": scorer.ctc_decoder.batching_stats(),
+        "backends": scorer.ctc_decoder.backend_names(),
+        "caches": {**scorer.cache_stats(), "results": result_cache.stats()},
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
 
 
 if __name__ == '__main__':
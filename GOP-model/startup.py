@@ -0,0 +1,159 @@
+"""
+Startup Module
+==============
+
+Module khởi động nhanh và có thể dự đoán cho server:
+- Đo thời gian từng phase khởi động (import, scorer, load model, backend, warmup...)
+- Chọn model từ thư mục đã bake sẵn (GOP_MODEL_DIR) để không truy cập HuggingFace Hub
+- Warmup forward pass trên audio giả với các độ dài cấu hình được trước khi báo ready
+- CLI bake model: tải model một lần và lưu thành thư mục local (dùng khi build image)
+
+Ví dụ:
+    python startup.py --bake data/model
+    python startup.py --bake /app/model --model mrrubino/wav2vec2-large-xlsr-53-l2-arctic-phoneme
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'model')
+
+
+class StartupReport:
+    """
+    Trạng thái khởi động và thời gian (ms) của từng phase
+
+    state: 'starting' -> 'ready', hoặc 'failed' (kèm error) nếu một phase lỗi.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.state = 'starting'
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._ready_event = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == 'ready'
+
+    def record(self, phase: str, seconds: float):
+        """Ghi thời gian của một phase đã đo ở nơi khác"""
+        self.phases[phase] = round(seconds * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Đo thời gian một phase; lỗi trong phase chuyển state sang 'failed'"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.state = 'failed'
+            self.error = f"{name}: {e}"
+            self._ready_event.set()
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self):
+        self.record('total', time.perf_counter() - self._started)
+        self.state = 'ready'
+        self._ready_event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Chờ đến khi khởi động xong (ready hoặc failed)"""
+        self._ready_event.wait(timeout)
+        return self.ready
+
+    def to_dict(self) -> Dict:
+        body = {'state': self.state, 'phases_ms': dict(self.phases)}
+        if self.error:
+            body['error'] = self.error
+        return body
+
+    def summary(self) -> str:
+        parts = ', '.join(f"{name}={ms:.0f}ms" for name, ms in self.phases.items())
+        return f"Startup {self.state}: {parts}"
+
+
+def resolve_model_name(default_model: str) -> str:
+    """
+    Chọn model để load: GOP_MODEL_DIR (thư mục đã bake) nếu có, ngược lại GOP_MODEL_NAME
+
+    Thư mục data/model (mặc định của `--bake`) cũng được dùng nếu tồn tại.
+    """
+    model_dir = os.getenv('GOP_MODEL_DIR')
+    if model_dir:
+        if not os.path.isdir(model_dir):
+            raise FileNotFoundError(f"GOP_MODEL_DIR={model_dir} is not a directory")
+        return model_dir
+    model_name = os.getenv('GOP_MODEL_NAME')
+    if model_name:
+        return model_name
+    if os.path.isfile(os.path.join(DEFAULT_MODEL_DIR, 'config.json')):
+        return DEFAULT_MODEL_DIR
+    return default_model
+
+
+def parse_seconds(text: Optional[str]) -> List[float]:
+    """'1,4' -> [1.0, 4.0]; chuỗi rỗng -> [] (tắt warmup)"""
+    if not text:
+        return []
+    return [float(part) for part in text.split(',') if part.strip()]
+
+
+def warmup(scorer, model_name: str, seconds: Sequence[float], target_sr: int = 16000):
+    """
+    Chạy forward pass + decode + các stage chấm điểm trên audio giả
+
+    Lần forward đầu tiên với mỗi shape mới chậm hơn nhiều (khởi tạo kernel, cấp phát
+    bộ nhớ, lazy init của backend), nên chạy trước ở vài độ dài điển hình.
+
+    Args:
+        scorer: PronunciationScorer
+        model_name: Tên model đã load
+        seconds: Danh sách độ dài audio (giây)
+        target_sr: Sample rate của model
+    """
+    import torch
+
+    gen = torch.Generator().manual_seed(0)
+    decoder = scorer.ctc_decoder
+    for length in seconds:
+        wav = torch.randn(max(1, int(length * target_sr)), generator=gen) * 0.05
+        logits = decoder.forward_batch([wav], model_name, target_sr)[0]
+        tokens = decoder.decode_logits(logits, model_name)
+        # Warm tokenizer / aligner (bỏ qua lỗi target, ví dụ thiếu dữ liệu G2P)
+        try:
+            scorer.score_tokens("warm up", tokens, model_name)
+        except Exception:
+            pass
+
+
+def bake_model(model_name: str, output_dir: str):
+    """Tải processor + model và lưu thành thư mục local để load không cần mạng"""
+    from transformers import AutoProcessor, AutoModelForCTC
+
+    processor = AutoProcessor.from_pretrained(model_name)
+    model = AutoModelForCTC.from_pretrained(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    processor.save_pretrained(output_dir)
+    model.save_pretrained(output_dir)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from scorer import DEFAULT_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description='Bake model thành thư mục local cho server')
+    parser.add_argument('--bake', default=DEFAULT_MODEL_DIR, help='Thư mục output')
+    parser.add_argument('--model', default=DEFAULT_MODEL_NAME, help='Tên model trên HuggingFace Hub')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bake_model(args.model, args.bake)
+    print(f"Baked {args.model} into {args.bake} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,233 @@
+"""
+Streaming Scoring Module
+========================
+
+Module chấm điểm tăng dần khi người học đang nói (dùng cho WebSocket):
+- Nhận từng chunk PCM 16-bit, chạy CTC model theo cửa sổ trượt có left context
+- Logits của các frame đã chốt được giữ lại, audio cũ không bao giờ chạy lại qua model
+- Phát hiện các từ đã nói xong và trả điểm từng từ ngay khi có
+- Khi kết thúc stream, chạy các stage còn lại trên toàn bộ logits để ra PronunciationResult
+"""
+
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+from audio_io import get_resampler
+from data_structures import PronunciationResult
+from scorer import PronunciationScorer
+
+
+class StreamingSession:
+    """
+    Một phiên chấm điểm streaming cho một script
+
+    Mỗi lần cập nhật, model chạy trên đoạn audio `[committed - left_context, hiện tại]`.
+    Các frame ứng với left context bị bỏ (đã có từ lần trước), các frame trong khoảng
+    `right_guard` cuối cùng chưa được chốt vì còn thiếu context bên phải và sẽ được
+    tính lại ở lần sau. wav2vec2 không có state hồi quy, nên thứ được cache giữa các
+    lần cập nhật là logits của các frame đã chốt.
+    """
+
+    def __init__(
+        self,
+        scorer: PronunciationScorer,
+        script_text: str,
+        model_name: str,
+        sample_rate: int = 16000,
+        thresholds: Tuple[float, float] = (0.15, 0.35),
+        segmentation_policy: str = 'alignment',
+        hop_seconds: float = 1.0,
+        left_context_seconds: float = 1.0,
+        right_guard_seconds: float = 0.5,
+        target_sr: int = 16000
+    ):
+        """
+        Khởi tạo StreamingSession
+
+        Args:
+            scorer: PronunciationScorer dùng chung
+            script_text: Văn bản mong đợi được đọc
+            model_name: Tên model để sử dụng
+            sample_rate: Sample rate của PCM client gửi lên
+            thresholds: (excellent_threshold, good_threshold) cho phân loại
+            segmentation_policy: Policy segment dùng cho kết quả cuối
+            hop_seconds: Lượng audio mới tối thiểu để chạy một lần cập nhật
+            left_context_seconds: Độ dài audio đã chốt được đưa lại làm context bên trái
+            right_guard_seconds: Độ dài audio cuối chưa được chốt (thiếu context bên phải)
+            target_sr: Sample rate của model
+        """
+        self.scorer = scorer
+        self.script_text = script_text
+        self.model_name = model_name
+        self.sample_rate = int(sample_rate)
+        self.thresholds = thresholds
+        self.segmentation_policy = segmentation_policy
+        self.target_sr = target_sr
+
+        _, model = scorer.ctc_decoder.get_model_components(model_name)
+        self.frame_samples = int(getattr(model.config, 'inputs_to_logits_ratio', 320))
+        self.hop = self._to_frames(hop_seconds) * self.frame_samples
+        self.left_context = self._to_frames(left_context_seconds) * self.frame_samples
+        self.right_guard = self._to_frames(right_guard_seconds) * self.frame_samples
+
+        self.words, self.target_per_word, self._norm_targets = scorer.get_script_target_ids(script_text)
+
+        self._buffer = torch.zeros(0)  # audio từ sample `_buffer_start` đến hiện tại
+        self._buffer_start = 0
+        self._total = 0                # tổng số sample đã nhận (ở target_sr)
+        self._committed = 0            # số sample đã có logits được chốt
+        self._logits: List[torch.Tensor] = []
+        self._carry = b''              # byte lẻ cuối chunk trước (nửa sample int16)
+        self._emitted_words = 0
+        self._committed_ids = array('H')  # predicted phone (đã chuẩn hóa) thuộc các từ đã trả về
+        self.closed = False
+
+    def _to_frames(self, seconds: float) -> int:
+        return max(0, int(round(seconds * self.target_sr / self.frame_samples)))
+
+    @property
+    def audio_seconds(self) -> float:
+        return self._total / self.target_sr
+
+    def add_pcm(self, data: bytes) -> Optional[Dict]:
+        """
+        Thêm một chunk PCM 16-bit little-endian mono
+
+        Chunk không cần chứa số byte chẵn: byte lẻ cuối cùng được giữ lại và ghép vào
+        đầu chunk sau để các sample không bị lệch.
+
+        Returns:
+            Optional[Dict]: Bản cập nhật partial nếu đã đủ audio mới để chạy model, ngược lại None
+        """
+        data = self._carry + bytes(data)
+        if len(data) % 2:
+            data, self._carry = data[:-1], data[-1:]
+        else:
+            self._carry = b''
+        if not data:
+            return None
+        chunk = torch.frombuffer(bytearray(data), dtype=torch.int16).to(torch.float32) / 32768.0
+        return self.add_waveform(chunk)
+
+    def add_waveform(self, chunk: torch.Tensor) -> Optional[Dict]:
+        """Thêm một đoạn waveform float 1-D ở `sample_rate` của session"""
+        if self.sample_rate != self.target_sr:
+            with torch.no_grad():
+                chunk = get_resampler(self.sample_rate, self.target_sr)(chunk)
+        self._buffer = torch.cat([self._buffer, chunk])
+        self._total += chunk.shape[-1]
+
+        if self._total - self._committed < self.hop + self.right_guard:
+            return None
+        self._advance(final=False)
+        return self._partial_update()
+
+    def finish(self) -> PronunciationResult:
+        """Chốt phần audio còn lại và chạy toàn bộ các stage sau decode"""
+        self._advance(final=True)
+        self.closed = True
+        tokens = self._tokens()
+        result = self.scorer.score_tokens(
+            self.script_text, tokens, self.model_name, self.thresholds, self.segmentation_policy
+        )
+        result.metadata['streaming'] = True
+        result.metadata['audio_seconds'] = round(self.audio_seconds, 3)
+        return result
+
+    def _advance(self, final: bool):
+        """Chạy model trên cửa sổ mới nhất và chốt các frame đã đủ context"""
+        commit_end = self._total if final else self._total - self.right_guard
+        commit_end -= (commit_end - self._committed) % self.frame_samples if not final else 0
+        if commit_end <= self._committed:
+            return
+
+        start = max(0, self._committed - self.left_context)
+        window = self._buffer[start - self._buffer_start:]
+        if window.shape[-1] == 0:
+            return
+        logits = self.scorer.ctc_decoder.infer_logits(window, self.model_name, self.target_sr)
+
+        skip = (self._committed - start) // self.frame_samples
+        if final:
+            new_frames = logits[skip:]
+        else:
+            new_frames = logits[skip:skip + (commit_end - self._committed) // self.frame_samples]
+        if new_frames.shape[0]:
+            self._logits.append(new_frames)
+        self._committed = commit_end
+
+        # Bỏ audio không còn cần làm left context
+        keep_from = max(0, self._committed - self.left_context)
+        if keep_from > self._buffer_start:
+            self._buffer = self._buffer[keep_from - self._buffer_start:]
+            self._buffer_start = keep_from
+
+    def _tokens(self) -> List[str]:
+        """Greedy decode toàn bộ logits đã chốt"""
+        if not self._logits:
+            return []
+        return self.scorer.ctc_decoder.decode_logits(torch.cat(self._logits), self.model_name)
+
+    def _partial_update(self) -> Dict:
+        """
+        Tìm các từ đã nói xong và chấm điểm chúng
+
+        Chỉ phần predicted phones sau các từ đã trả về được align với target (nối các từ)
+        của những từ chưa trả về, nên mỗi lần cập nhật không phải align lại cả câu. Từ
+        thứ i được coi là đã xong khi đã có phone được match/substitute vào một từ phía sau nó.
+        Phone của các từ đã trả về được giữ lại để tìm lại ranh giới trong chuỗi mới (xem
+        `_committed_end`).
+        """
+        mapper = self.scorer.phoneme_mapper
+        tokens = self._tokens()
+        token_str = ' '.join(t.replace('▁', ' ').replace('|', ' ').strip() for t in tokens)
+        predicted = mapper.normalize_ids(mapper.tokenize_ipa_ids(token_str))
+
+        first = self._emitted_words
+        start = self._committed_end(predicted)
+        chunks, reached = self.scorer.aligner.assign_to_words(self._norm_targets[first:], predicted[start:])
+
+        finished = max(first, first + reached)
+        new_words = range(first, finished)
+        word_scores = self.scorer.score_word_chunks(
+            [self.words[i] for i in new_words],
+            [self._norm_targets[i] for i in new_words],
+            [chunks[i - first] for i in new_words],
+            self.thresholds,
+            target_phones=[self.target_per_word[i] for i in new_words],
+        )
+        self._emitted_words = finished
+        committed = predicted[:start]
+        for i in new_words:
+            committed.extend(chunks[i - first])
+        self._committed_ids = committed
+
+        return {
+            'type': 'partial',
+            'audio_seconds': round(self.audio_seconds, 3),
+            'predicted_ipa': ' '.join(mapper.phones_from_ids(predicted)),
+            'words_finished': finished,
+            'words': [
+                dict(self.scorer.word_to_json(ws), index=i)
+                for i, ws in zip(new_words, word_scores)
+            ],
+        }
+
+    def _committed_end(self, predicted: array) -> int:
+        """
+        Vị trí trong `predicted` ngay sau các phone thuộc về những từ đã trả về
+
+        Logits đã chốt không đổi nên phần đầu của chuỗi phone thường giữ nguyên, nhưng
+        tokenize_ipa_ids ghép cặp (merge / equiv) có thể nối phone cuối đã trả về với phone
+        mới đến sau nó (ví dụ 't' + 'ʃ' -> 'tʃ'). Vì vậy đi song song theo id với các phone
+        đã trả về: chỗ khác nhau là một phone ghép từ hai phone (phone ghép thuộc về từ đã
+        trả về), thay vì giả định số phone đã trả về không đổi.
+        """
+        committed = self._committed_ids
+        i = j = 0
+        while i < len(committed) and j < len(predicted):
+            i += 1 if committed[i] == predicted[j] else 2
+            j += 1
+        return j
@@ -0,0 +1,80 @@
+"""
+Kiểm tra cập nhật partial của StreamingSession
+==============================================
+
+Decoder được thay bằng stub, chuỗi token của từng lần cập nhật do test quy định, nên
+không cần model.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scorer import PronunciationScorer  # noqa: E402
+from streaming import StreamingSession  # noqa: E402
+
+
+class StubDecoder:
+    """Chỉ đủ cho StreamingSession.__init__ (frame = 320 sample)"""
+
+    def get_model_components(self, model_name):
+        return None, SimpleNamespace(config=SimpleNamespace(inputs_to_logits_ratio=320))
+
+
+@pytest.fixture(scope='module')
+def scorer():
+    scorer = PronunciationScorer()
+    scorer.ctc_decoder = StubDecoder()
+    return scorer
+
+
+def run_updates(scorer, script, token_updates):
+    """Chạy `_partial_update` với chuỗi token cho trước ở mỗi lần, trả về các bản cập nhật"""
+    session = StreamingSession(scorer, script, 'stub')
+    updates = []
+    for tokens in token_updates:
+        session._tokens = lambda tokens=tokens: tokens
+        updates.append(session._partial_update())
+    return session, updates
+
+
+def test_merge_across_commit_boundary(scorer):
+    # Lần 1: 'kæt' + 'ɪ' -> từ 'catch' (k æ tʃ) xong với phone cuối 't'.
+    # Lần 2: 'ʃ' đến sau đó, tokenizer ghép 't' + 'ʃ' -> 'tʃ' ngay tại ranh giới đã trả về
+    session, updates = run_updates(scorer, 'catch it', [
+        ['▁kæt', '▁ɪ'],
+        ['▁kæt', 'ʃ', '▁ɪt', '▁ə'],
+    ])
+
+    assert updates[0]['words_finished'] == 1
+    assert [w['word'] for w in updates[0]['words']] == ['catch']
+    assert updates[0]['words'][0]['predicted_ipa'] == 'k æ t'
+
+    # Phone ghép thuộc về từ đã trả về; 'it' chỉ nhận các phone sau nó
+    assert updates[1]['predicted_ipa'] == 'k æ tʃ ɪ t ə'
+    assert updates[1]['words_finished'] == 1
+    assert updates[1]['words'] == []
+
+    mapper = scorer.phoneme_mapper
+    assert mapper.phones_from_ids(session._committed_ids) == ['k', 'æ', 'tʃ']
+
+
+def test_committed_phones_stay_a_prefix(scorer):
+    session, updates = run_updates(scorer, 'catch it now', [
+        ['▁kæt', '▁ɪt'],
+        ['▁kæt', 'ʃ', '▁ɪt', '▁n'],
+        ['▁kæt', 'ʃ', '▁ɪt', '▁naʊ'],
+    ])
+
+    assert [w['index'] for u in updates for w in u['words']] == [0, 1]
+    assert updates[1]['words'][0]['word'] == 'it'
+    assert updates[1]['words'][0]['predicted_ipa'] == 'ɪ t'
+    assert updates[1]['words'][0]['accuracy'] == 1.0
+
+    predicted = updates[-1]['predicted_ipa'].split()
+    committed = scorer.phoneme_mapper.phones_from_ids(session._committed_ids)
+    assert predicted[:len(committed)] == committed == ['k', 'æ', 'tʃ', 'ɪ', 't']
@@ -0,0 +1,177 @@
+"""
+Voice Activity Detection Module
+===============================
+
+Bước tiền xử lý audio trước CTC model, dựa trên năng lượng từng frame (không cần model):
+- 'trim': cắt khoảng lặng ở đầu và cuối bản ghi
+- 'pauses': cắt thêm các khoảng nghỉ dài giữa câu (giữ lại một đoạn đệm ở hai bên)
+- Giữ danh sách đoạn (start, end) theo sample của audio gốc để map timestamp ngược lại
+
+Ngưỡng năng lượng thích nghi theo bản ghi: lấy theo noise floor (percentile thấp)
+cộng thêm một biên, nhưng không vượt quá peak trừ đi SNR tối thiểu.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import torch
+
+VAD_MODES = ('off', 'trim', 'pauses')
+
+
+@dataclass
+class SpeechRegions:
+    """
+    Kết quả VAD
+
+    Attributes:
+        waveform: Audio sau khi bỏ các khoảng lặng (nối các đoạn được giữ)
+        segments: Các đoạn (start, end) được giữ, tính theo sample của audio gốc
+        original_samples: Số sample của audio gốc
+        sample_rate: Sample rate (Hz)
+        mode: Chế độ VAD đã dùng
+    """
+    waveform: torch.Tensor
+    segments: List[Tuple[int, int]]
+    original_samples: int
+    sample_rate: int
+    mode: str
+
+    @property
+    def kept_samples(self) -> int:
+        return sum(end - start for start, end in self.segments)
+
+    def to_original(self, sample: int) -> int:
+        """Map vị trí sample trong audio đã cắt về vị trí trong audio gốc"""
+        offset = 0
+        for start, end in self.segments:
+            length = end - start
+            if sample < offset + length:
+                return start + (sample - offset)
+            offset += length
+        return self.segments[-1][1] if self.segments else sample
+
+    def to_dict(self) -> Dict:
+        sr = float(self.sample_rate)
+        return {
+            'mode': self.mode,
+            'original_seconds': round(self.original_samples / sr, 3),
+            'kept_seconds': round(self.kept_samples / sr, 3),
+            'segments': [[round(start / sr, 3), round(end / sr, 3)] for start, end in self.segments],
+        }
+
+
+def kept_to_original_seconds(seconds: float, segments: List[List[float]]) -> float:
+    """
+    Map thời điểm (giây) trong audio đã cắt về audio gốc, theo `segments` (giây) của
+    `SpeechRegions.to_dict()`
+    """
+    offset = 0.0
+    for start, end in segments:
+        length = end - start
+        if seconds <= offset + length:
+            return start + (seconds - offset)
+        offset += length
+    return segments[-1][1] if segments else seconds
+
+
+def frame_energy_db(wav: torch.Tensor, frame: int, hop: int) -> torch.Tensor:
+    """Năng lượng RMS (dB) của từng frame"""
+    if wav.shape[-1] < frame:
+        wav = torch.nn.functional.pad(wav, (0, frame - wav.shape[-1]))
+    frames = wav.unfold(0, frame, hop)
+    rms = frames.pow(2).mean(dim=-1).add(1e-12).sqrt()
+    return 20.0 * torch.log10(rms)
+
+
+def _runs(mask: List[bool]) -> List[Tuple[int, int]]:
+    """Các đoạn liên tiếp True trong mask: [(start, end)]"""
+    runs, start = [], None
+    for i, value in enumerate(mask):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(mask)))
+    return runs
+
+
+def detect_speech(
+    wav: torch.Tensor,
+    sample_rate: int = 16000,
+    mode: str = 'trim',
+    frame_ms: float = 20.0,
+    padding_ms: float = 150.0,
+    min_speech_ms: float = 60.0,
+    max_pause_ms: float = 500.0,
+    floor_db: float = -55.0,
+    margin_db: float = 8.0,
+    min_snr_db: float = 10.0,
+) -> SpeechRegions:
+    """
+    Tìm vùng có tiếng nói và cắt bỏ khoảng lặng
+
+    Args:
+        wav: Waveform 1-D
+        sample_rate: Sample rate (Hz)
+        mode: 'off', 'trim' (chỉ cắt đầu/cuối) hoặc 'pauses' (cắt thêm khoảng nghỉ dài)
+        frame_ms: Độ dài frame tính năng lượng (ms), hop = frame / 2
+        padding_ms: Đệm thêm ở hai bên mỗi vùng tiếng nói (ms)
+        min_speech_ms: Vùng có năng lượng ngắn hơn ngưỡng này bị coi là nhiễu (click, pop)
+        max_pause_ms: Với mode 'pauses', khoảng nghỉ dài hơn ngưỡng này bị cắt (sau khi đệm)
+        floor_db: Ngưỡng năng lượng tuyệt đối thấp nhất (dBFS)
+        margin_db: Biên trên noise floor
+        min_snr_db: Ngưỡng không cao hơn peak - min_snr_db
+
+    Returns:
+        SpeechRegions: Audio đã cắt và các đoạn được giữ. Không tìm thấy tiếng nói
+        (hoặc mode 'off') thì giữ nguyên toàn bộ audio.
+    """
+    if mode not in VAD_MODES:
+        raise ValueError(f"Unknown VAD mode {mode!r}, expected one of {VAD_MODES}")
+    n = wav.shape[-1]
+    keep_all = SpeechRegions(wav, [(0, n)] if n else [], n, sample_rate, mode)
+    if mode == 'off' or n == 0:
+        return keep_all
+
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    hop = max(1, frame // 2)
+    energy = frame_energy_db(wav, frame, hop)
+
+    peak_db = float(energy.max())
+    noise_db = float(torch.quantile(energy, 0.1))
+    threshold = max(floor_db, min(noise_db + margin_db, peak_db - min_snr_db))
+
+    min_frames = max(1, int(round(min_speech_ms / 1000 * sample_rate / hop)))
+    speech = [(s, e) for s, e in _runs((energy > threshold).tolist()) if e - s >= min_frames]
+    if not speech:
+        return keep_all
+
+    # Frame -> sample, đệm hai bên và gộp các vùng chồng nhau
+    pad = int(sample_rate * padding_ms / 1000)
+    spans = []
+    for s, e in speech:
+        start = max(0, s * hop - pad)
+        end = min(n, e * hop + frame + pad)
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+
+    if mode == 'trim':
+        segments = [(spans[0][0], spans[-1][1])]
+    else:
+        max_pause = int(sample_rate * max_pause_ms / 1000)
+        segments = [spans[0]]
+        for start, end in spans[1:]:
+            if start - segments[-1][1] <= max_pause:
+                segments[-1] = (segments[-1][0], end)
+            else:
+                segments.append((start, end))
+
+    if segments == [(0, n)]:
+        return keep_all
+    waveform = torch.cat([wav[start:end] for start, end in segments]) if len(segments) > 1 else wav[segments[0][0]:segments[0][1]]
+    return SpeechRegions(waveform, segments, n, sample_rate, mode)